@@ -0,0 +1,164 @@
+"""
+Async versions of the read-heavy progress endpoints, for ASGI deployments
+(ASYNC_PROGRESS_VIEWS=True). They return the same bodies as their APIView
+counterparts in views.py but wait on the database without holding a worker.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, PermissionDenied
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from .content_cache import get_content_tree
+from .models import Activity, UserActivity, UserBatch, UserCard, Answer
+from .permissions import IsAuthenticatedVerifiedActive, IsAdminOrOrganizer, IsAdminOrOrganizerOrUser
+from .progress_responses import activity_progress_data, card_progress_data
+from .serializers import UserBatchSerializer
+
+
+class AsyncAPIView(View):
+    """
+    Read-only async view with APIView's authentication, permission checks,
+    error bodies and JSON rendering.
+    """
+    permission_classes = []
+
+    def json_response(self, data, status=status.HTTP_200_OK, headers=None):
+        response = HttpResponse(
+            JSONRenderer().render(data), status=status, content_type='application/json')
+        for name, value in (headers or {}).items():
+            response[name] = value
+        return response
+
+    async def authenticate(self, request):
+        self.authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+        for authenticator in self.authenticators:
+            # May hit the cache or the database for the user
+            user_auth = await sync_to_async(authenticator.authenticate)(request)
+            if user_auth is not None:
+                return user_auth[0]
+        return AnonymousUser()
+
+    def check_permissions(self, request):
+        for permission in [permission() for permission in self.permission_classes]:
+            if not permission.has_permission(request, self):
+                if not request.user.is_authenticated:
+                    raise NotAuthenticated()
+                raise PermissionDenied(getattr(permission, 'message', None))
+
+    def handle_exception(self, request, exc):
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            exc.auth_header = self.authenticators[0].authenticate_header(request)
+        response = exception_handler(exc, {'view': self, 'request': request})
+        headers = {'WWW-Authenticate': exc.auth_header} if getattr(exc, 'auth_header', None) else None
+        return self.json_response(response.data, response.status_code, headers)
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await self.authenticate(request)
+            self.check_permissions(request)
+        except APIException as exc:
+            return self.handle_exception(request, exc)
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncBatchUserListView(AsyncAPIView):
+
+    permission_classes = [IsAuthenticatedVerifiedActive, IsAdminOrOrganizer]
+
+    async def get(self, request, *args, **kwargs):
+        batch_id = request.GET.get('batch_id')
+        user_id = request.GET.get('user_id')
+
+        if batch_id and user_id:
+            return self.json_response(
+                {
+                    'error': 'Only one of batch_id or user_id should be provided'},
+                status=status.HTTP_400_BAD_REQUEST)
+        elif not batch_id and not user_id:
+            return self.json_response({'error': 'Either batch_id or user_id must be provided'},
+                                      status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            if batch_id:
+                user_batches = UserBatch.objects.filter(batch_id=batch_id)
+            else:
+                user_batches = UserBatch.objects.filter(user_id=user_id)
+            user_batches = [user_batch async for user_batch in user_batches]
+            serializer = UserBatchSerializer(user_batches, many=True)
+            return self.json_response(serializer.data)
+        except Exception as e:
+            return self.json_response({'error': str(e)},
+                                      status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AsyncUserCardQuestionProgress(AsyncAPIView):
+
+    permission_classes = [IsAuthenticatedVerifiedActive, IsAdminOrOrganizerOrUser]
+
+    async def get(self, request, user_id, activity_id):
+        try:
+            latest_user_card_id = await UserCard.objects.filter(
+                user_id=user_id, card__activity_id=activity_id).order_by('-updated_at').values_list(
+                'card_id', flat=True).afirst()
+            # Shared, cached cards -> questions -> options structure
+            content_tree = await sync_to_async(get_content_tree)(activity_id)
+
+            user_cards = []
+            answers = []
+            if latest_user_card_id or content_tree['first_card_id']:
+                user_cards = [
+                    user_card async for user_card in UserCard.objects.filter(
+                        card__activity_id=activity_id, user_id=user_id)]
+                answers = [
+                    answer async for answer in Answer.objects.filter(
+                        user_id=user_id, question__card__activity_id=activity_id)]
+
+            # Overlay this user's progress and answers onto the tree
+            response_data = card_progress_data(
+                latest_user_card_id, content_tree, user_cards, answers)
+
+            if response_data is None:
+                return self.json_response(
+                    {'error': 'No UserCard found for the user'}, status=status.HTTP_404_NOT_FOUND)
+
+            return self.json_response(response_data)
+
+        except Exception as e:
+            return self.json_response({'error': str(e)},
+                                      status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AsyncUserActivityProgressList(AsyncAPIView):
+
+    permission_classes = [IsAuthenticatedVerifiedActive, IsAdminOrOrganizerOrUser]
+
+    async def get(self, request, user_id, batch_id):
+        try:
+            if (request.user.id != user_id):
+                return self.json_response(
+                    {'error': 'Invalid Authentication Credentials'}
+                )
+
+            activities = [
+                activity async for activity in Activity.objects.filter(
+                    batch_id=batch_id).prefetch_related(
+                    Prefetch(
+                        'useractivity_set',
+                        queryset=UserActivity.objects.filter(user_id=user_id),
+                        to_attr='user_progress'))]
+
+            response_data = activity_progress_data(activities)
+            if response_data is None:
+                return self.json_response(
+                    {'error': 'No UserActivity found for the user'}, status=status.HTTP_404_NOT_FOUND)
+
+            return self.json_response(response_data)
+        except Exception as e:
+            return self.json_response({'error': str(e)},
+                                      status=status.HTTP_500_INTERNAL_SERVER_ERROR)
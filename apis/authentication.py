@@ -0,0 +1,79 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def _version_key(user_id):
+    return f'auth-user-version:{user_id}'
+
+
+def _user_key(user_id, version):
+    return f'auth-user:{user_id}:{version}'
+
+
+def _user_version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # A timestamp, so an evicted version never resurrects an older entry
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_cached_user(user_id):
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps the authenticated User in the cache for
+    AUTH_USER_CACHE_TIMEOUT seconds instead of fetching it on every request.
+
+    Entries are keyed by user id and a version that User saves and deletes
+    bump (see signals). The cache is shared by every process (settings
+    refuse a per-process one), so deactivation, verification, role and
+    password changes apply on the next request anywhere; the timeout bounds
+    staleness after writes that bypass signals.
+    """
+
+    def get_user(self, validated_token):
+        timeout = getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60)
+        if not timeout:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        key = _user_key(user_id, _user_version(user_id))
+        user = cache.get(key)
+        if user is None:
+            # Also runs the active and revocation checks
+            user = super().get_user(validated_token)
+            cache.set(key, user, timeout=timeout)
+            return user
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
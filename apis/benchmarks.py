@@ -0,0 +1,290 @@
+"""
+Endpoint benchmarks: seed a batch at a given scale, request every URL in
+apis/urls.py with the test client and record queries, latency and memory.
+Used by the benchmark_endpoints and compare_benchmarks commands.
+"""
+import time
+import tracemalloc
+from datetime import timedelta
+from statistics import median, quantiles
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .counters import counter_drift, repair_counters
+from .models import (
+    User, Role, Batch, UserBatch, Status, Activity, UserActivity,
+    Card, CardType, UserCard, Question, Option, Answer, RegistrationJob
+)
+from .registration import CSV_COLUMNS, make_verification_token
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+def seed_benchmark_data(users, activities=10, cards=10, questions=10, options=4):
+    """
+    One batch of `users` learners with `activities` x `cards` x `questions`
+    content, every learner enrolled in every activity and the first learner
+    through the first activity. Rows are bulk created, so counters are
+    repaired at the end.
+
+    Returns the rows the endpoint cases point at.
+    """
+    now = timezone.now()
+    # Hashing once keeps seeding fast; every account shares the password
+    password = make_password(BENCHMARK_PASSWORD)
+
+    admin = User.objects.create(
+        email='benchmark-admin@proleap.com', username='benchmark-admin', password=password,
+        role=Role.ADMIN, is_verified=True, is_staff=True)
+    batch = Batch.objects.create(
+        name='benchmark', year=now.year, start_time=now, organizer=admin)
+    learners = User.objects.bulk_create([
+        User(email=f'benchmark-{i}@proleap.com', username=f'benchmark-{i}',
+             password=password, is_verified=True, current_batch=batch)
+        for i in range(users)])
+    UserBatch.objects.bulk_create([
+        UserBatch(user=learner, batch=batch) for learner in learners])
+
+    activity_rows = Activity.objects.bulk_create([
+        Activity(name=f'activity {a}', batch=batch, sequence_no=a)
+        for a in range(activities)])
+    card_rows = Card.objects.bulk_create([
+        Card(name=f'card {c}', activity=activity, sequence_no=c,
+             # The first card of each activity is a poll that has ended
+             type=CardType.POLL if c == 0 else CardType.SURVEY_INPUT,
+             start_time=now - timedelta(minutes=1), end_time=now)
+        for activity in activity_rows for c in range(cards)])
+    question_rows = Question.objects.bulk_create([
+        Question(text=f'question {q}', card=card, sequence_no=q)
+        for card in card_rows for q in range(questions)])
+    option_rows = Option.objects.bulk_create([
+        Option(value=f'option {o}', question=question, sequence_no=o)
+        for question in question_rows for o in range(options)])
+
+    UserActivity.objects.bulk_create([
+        UserActivity(user=learner, activity=activity)
+        for learner in learners for activity in activity_rows])
+
+    learner = learners[0]
+    activity = activity_rows[0]
+    first_options = {option.question_id: option for option in option_rows if option.sequence_no == 0}
+    UserCard.objects.bulk_create([
+        UserCard(user=learner, card=card, status=Status.COMPLETED)
+        for card in card_rows if card.activity_id == activity.id])
+    answers = Answer.objects.bulk_create([
+        Answer(user=learner, question=question, option=first_options.get(question.id))
+        for question in question_rows if question.card.activity_id == activity.id])
+
+    for parent, field, drifted in counter_drift():
+        if drifted:
+            repair_counters(parent, field, [pk for pk, _, _ in drifted])
+
+    return {
+        'admin': admin,
+        'learner': learner,
+        'batch': batch,
+        'activity': activity,
+        'card': card_rows[1],
+        'poll': card_rows[0],
+        'question': question_rows[0],
+        'option': option_rows[0],
+        'answer': answers[0],
+        'user_batch': UserBatch.objects.filter(user=learner).first(),
+        'user_activity': UserActivity.objects.filter(user=learner, activity=activity).first(),
+        'user_card': UserCard.objects.filter(user=learner).first(),
+        'job': RegistrationJob.objects.create(created_by=admin),
+    }
+
+
+def _registration_csv():
+    stamp = time.perf_counter_ns()
+    lines = [','.join(CSV_COLUMNS)] + [
+        f'new-{stamp}-{i}@proleap.com,new-{stamp}-{i},New {i},{Role.USER},Other,9876543210'
+        for i in range(10)]
+    return {'file': SimpleUploadedFile('users.csv', '\n'.join(lines).encode(), content_type='text/csv')}
+
+
+def endpoint_cases(seed):
+    """
+    (name, method, path, data, user, format) for every URL in apis/urls.py.
+    `data` may be a callable for bodies that can only be used once.
+    """
+    admin, learner = seed['admin'], seed['learner']
+    activity, card, poll = seed['activity'], seed['card'], seed['poll']
+    question = seed['question']
+    options_by_question = {}
+    for option_id, question_id in Option.objects.filter(
+            question__card=card).values_list('id', 'question_id'):
+        options_by_question.setdefault(question_id, option_id)
+    card_answers = {'answers': [
+        {'question': question_id, 'options': [option_id]}
+        for question_id, option_id in options_by_question.items()]}
+
+    cases = [
+        ('schema json', 'get', reverse('schema-json', args=['.json']), None, None, None),
+        ('token obtain', 'post', reverse('token_obtain_pair'),
+         {'email': learner.email, 'password': BENCHMARK_PASSWORD}, None, 'json'),
+        ('token refresh', 'post', reverse('token_refresh'),
+         lambda: {'refresh': str(RefreshToken.for_user(learner))}, None, 'json'),
+        ('sign in', 'post', reverse('auth'),
+         {'email': learner.email, 'password': BENCHMARK_PASSWORD}, None, 'json'),
+        ('users list', 'get', reverse('users'), None, admin, None),
+        ('user detail', 'get', reverse('users', args=[learner.id]), None, admin, None),
+        ('batches list', 'get', reverse('batch-list-create'), None, admin, None),
+        ('batch detail', 'get', reverse('batch-detail', args=[seed['batch'].id]), None, admin, None),
+        ('user batches list', 'get', reverse('user-batch-list-create'), None, admin, None),
+        ('user batch detail', 'get', reverse('user-batch-detail', args=[seed['user_batch'].id]),
+         None, admin, None),
+        ('batch users', 'get', f'{reverse("batch-user-list")}?batch_id={seed["batch"].id}',
+         None, admin, None),
+        ('activities list', 'get', reverse('activity-list-create'), None, admin, None),
+        ('activity detail', 'get', reverse('activity-detail', args=[activity.id]), None, admin, None),
+        ('user activities list', 'get', reverse('user-activity-list-create'), None, admin, None),
+        ('user activity detail', 'get',
+         reverse('user-activity-detail', args=[seed['user_activity'].id]), None, admin, None),
+        ('cards list', 'get', reverse('card-list-create'), None, admin, None),
+        ('card detail', 'get', reverse('card-detail', args=[card.id]), None, admin, None),
+        ('user cards list', 'get', reverse('user-card-list-create'), None, admin, None),
+        ('user card detail', 'get', reverse('user-card-detail', args=[seed['user_card'].id]),
+         None, admin, None),
+        ('questions list', 'get', reverse('question-list-create'), None, admin, None),
+        ('question detail', 'get', reverse('question-detail', args=[question.id]), None, admin, None),
+        ('options list', 'get', reverse('option-list-create'), None, admin, None),
+        ('option detail', 'get', reverse('option-detail', args=[seed['option'].id]), None, admin, None),
+        ('answers list', 'get', reverse('answer-list-create'), None, admin, None),
+        ('answer create', 'post', reverse('answer-list-create'),
+         {'user': learner.id, 'question': question.id, 'option': seed['option'].id,
+          'answer': 'benchmark'}, learner, 'json'),
+        ('answer detail', 'get', reverse('answer-detail', args=[seed['answer'].id]),
+         None, learner, None),
+        ('answers export', 'get', f'{reverse("answer-export")}?activity={activity.id}',
+         None, admin, None),
+        ('card answers submit', 'post', reverse('card-answer-submit', args=[card.id]),
+         card_answers, learner, 'json'),
+        ('poll stream', 'get', reverse('card-poll-stream', args=[poll.id]), None, admin, None),
+        ('csv upload', 'post', reverse('upload_users_csv'), _registration_csv, admin, 'multipart'),
+        ('registration job', 'get', reverse('registration-job-detail', args=[seed['job'].id]),
+         None, admin, None),
+        ('verify email', 'get', reverse('verify-email', args=[make_verification_token(learner)]),
+         None, None, None),
+        ('card progress', 'get', reverse('user-card-question-detail', args=[learner.id, activity.id]),
+         None, learner, None),
+        ('activity progress', 'get',
+         reverse('user-activities-detail', args=[learner.id, seed['batch'].id]),
+         None, learner, None),
+    ]
+    if settings.API_DOCS:
+        cases[1:1] = [
+            ('swagger ui', 'get', reverse('schema-swagger-ui'), None, None, None),
+            ('redoc', 'get', reverse('schema-redoc'), None, None, None),
+        ]
+    return cases
+
+
+def _request(client, method, path, data, user, format, tokens):
+    if user is None:
+        client.credentials()
+    else:
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens.setdefault(user.id, AccessToken.for_user(user))}')
+    response = getattr(client, method)(path, data() if callable(data) else data, format=format)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def measure_endpoint(client, case, iterations, tokens):
+    """
+    Time `iterations` requests after a warm-up request, each in a savepoint
+    that is rolled back so writes can be repeated. on_commit callbacks (the
+    progress rollup, poll tallies) run inside the timing.
+    """
+    name, method, path, data, user, format = case
+    timings = []
+    queries = 0
+    status_code = None
+    for i in range(iterations + 1):
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                with TestCase.captureOnCommitCallbacks(execute=True):
+                    response = _request(client, method, path, data, user, format, tokens)
+                elapsed = (time.perf_counter() - start) * 1000
+            transaction.set_rollback(True)
+        if i:
+            timings.append(elapsed)
+            queries = max(queries, len(ctx.captured_queries))
+        status_code = response.status_code
+
+    tracemalloc.start()
+    try:
+        with transaction.atomic():
+            with TestCase.captureOnCommitCallbacks(execute=True):
+                _request(client, method, path, data, user, format, tokens)
+            transaction.set_rollback(True)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'method': method.upper(),
+        'path': path,
+        'status': status_code,
+        'queries': queries,
+        'p50_ms': round(median(timings), 3),
+        'p95_ms': round(quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0], 3),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(seed, iterations):
+    """
+    {case name: measurements} for every endpoint case.
+    """
+    client = APIClient()
+    tokens = {}
+    return {
+        case[0]: measure_endpoint(client, case, iterations, tokens)
+        for case in endpoint_cases(seed)}
+
+
+def find_regressions(baseline, current, threshold=0.2, min_ms=5.0):
+    """
+    Compare two benchmark_endpoints results and return a message per
+    regression: any extra query, a status change, or p95 latency / peak
+    memory more than `threshold` (a fraction) above the baseline. Latency
+    changes under `min_ms` are treated as noise. Only the scales both runs
+    measured are compared.
+    """
+    regressions = []
+    for scale, cases in baseline['scales'].items():
+        current_cases = current['scales'].get(scale)
+        if current_cases is None:
+            continue
+        for name, before in cases.items():
+            after = current_cases.get(name)
+            label = f'[{scale}] {name}'
+            if after is None:
+                regressions.append(f'{label}: missing from the current run')
+                continue
+            if after['status'] != before['status']:
+                regressions.append(f'{label}: status {before["status"]} -> {after["status"]}')
+            if after['queries'] > before['queries']:
+                regressions.append(f'{label}: queries {before["queries"]} -> {after["queries"]}')
+            if (after['p95_ms'] > before['p95_ms'] * (1 + threshold)
+                    and after['p95_ms'] - before['p95_ms'] >= min_ms):
+                regressions.append(
+                    f'{label}: p95 {before["p95_ms"]:.1f}ms -> {after["p95_ms"]:.1f}ms')
+            if after['peak_kb'] > before['peak_kb'] * (1 + threshold):
+                regressions.append(
+                    f'{label}: peak memory {before["peak_kb"]:.0f}KB -> {after["peak_kb"]:.0f}KB')
+    return regressions
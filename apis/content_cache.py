@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Prefetch
+
+from .models import Card, ContentVersion, Question
+from .serializers import CardSerializer, QuestionSerializer, OptionSerializer
+
+
+def _tree_key(activity_id, version):
+    return f'content-tree:{activity_id}:{version}'
+
+
+def _content_version(activity_id):
+    # Read from the database, not the cache, so every worker and instance
+    # sees a bump as soon as it commits, whatever the cache backend
+    return ContentVersion.objects.filter(activity_id=activity_id).values_list(
+        'version', flat=True).first() or 0
+
+
+def _bump_content_version(activity_id):
+    bumped = ContentVersion.objects.filter(activity_id=activity_id).update(
+        version=F('version') + 1)
+    if not bumped:
+        # First change: a concurrent writer may insert the row as well, so
+        # insert ignoring conflicts and bump whichever row won
+        ContentVersion.objects.bulk_create(
+            [ContentVersion(activity_id=activity_id)], ignore_conflicts=True)
+        ContentVersion.objects.filter(activity_id=activity_id).update(
+            version=F('version') + 1)
+
+
+def invalidate_content_tree(activity_id):
+    """
+    Bump the activity's content version with the change, and again on
+    commit, so a tree rebuilt from the old rows while the change was in
+    flight is never served under the final version.
+    """
+    if activity_id is None:
+        return
+    _bump_content_version(activity_id)
+    transaction.on_commit(lambda: _bump_content_version(activity_id))
+
+
+def build_content_tree(activity_id):
+    """
+    Serialize the cards -> questions -> options structure of an activity.
+
+    Contains nothing user specific, so one build serves every participant.
+    """
+    cards = Card.objects.filter(activity_id=activity_id).prefetch_related(
+        Prefetch(
+            'question_set',
+            queryset=Question.objects.prefetch_related('options')))
+
+    tree_cards = []
+    first_card = None
+    for card in cards:
+        # Same pick as order_by('created_at').first(), NULLs last
+        if first_card is None or (card.created_at is not None and (
+                first_card.created_at is None or card.created_at < first_card.created_at)):
+            first_card = card
+
+        questions = []
+        for question in card.question_set.all():
+            serialized_question = dict(QuestionSerializer(question).data)
+            serialized_options = OptionSerializer(
+                question.options.all(), many=True).data
+            if serialized_options:
+                serialized_question['options'] = [dict(option) for option in serialized_options]
+            questions.append(serialized_question)
+
+        tree_cards.append({
+            'card': dict(CardSerializer(card).data),
+            'questions': questions,
+        })
+
+    return {
+        'first_card_id': first_card.id if first_card else None,
+        'cards': tree_cards,
+    }
+
+
+def get_content_tree(activity_id):
+    key = _tree_key(activity_id, _content_version(activity_id))
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_content_tree(activity_id)
+        cache.set(key, tree, timeout=getattr(settings, 'CONTENT_TREE_CACHE_TIMEOUT', 3600))
+    return tree
@@ -0,0 +1,80 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Batch, Activity, Card, CardType, Question
+
+# (parent, counter field, child, child FK to the parent, conditions on the child)
+COUNTERS = [
+    (Batch, 'total_activities', Activity, 'batch', {}),
+    (Activity, 'total_cards', Card, 'activity', {}),
+    (Activity, 'total_polling_cards', Card, 'activity', {'type': CardType.POLL}),
+    (Card, 'total_questions', Question, 'card', {}),
+]
+
+COUNTED_MODELS = {child for _, _, child, _, _ in COUNTERS}
+
+
+def counted_parents(instance):
+    """
+    {(parent model, parent id): {counter field: 1}} for the counters `instance`
+    currently contributes to.
+    """
+    counts = {}
+    if instance is None:
+        return counts
+    for parent, field, child, fk, conditions in COUNTERS:
+        if not isinstance(instance, child):
+            continue
+        parent_id = getattr(instance, f'{fk}_id')
+        if parent_id is None:
+            continue
+        if any(getattr(instance, name) != value for name, value in conditions.items()):
+            continue
+        counts.setdefault((parent, parent_id), {})[field] = 1
+    return counts
+
+
+def adjust_counters(before, after):
+    """
+    Move counters from what a row counted towards (`before`) to what it
+    counts towards now (`after`), with one F() update per changed parent.
+    """
+    for parent, parent_id in before.keys() | after.keys():
+        old = before.get((parent, parent_id), {})
+        new = after.get((parent, parent_id), {})
+        deltas = {
+            field: new.get(field, 0) - old.get(field, 0)
+            for field in old.keys() | new.keys()}
+        updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if updates:
+            parent.objects.filter(pk=parent_id).update(**updates)
+
+
+def _actual_count(child, fk, conditions):
+    children = child.objects.filter(**{fk: OuterRef('pk')}, **conditions).order_by()
+    return Coalesce(
+        Subquery(children.values(fk).annotate(count=Count('*')).values('count')),
+        Value(0))
+
+
+def counter_drift():
+    """
+    Yield (parent, field, [(id, stored, actual)]) for every counter out of
+    step with the rows it counts.
+    """
+    for parent, field, child, fk, conditions in COUNTERS:
+        drifted = parent.objects.annotate(
+            actual=_actual_count(child, fk, conditions)).exclude(
+            **{field: F('actual')}).values_list('pk', field, 'actual')
+        yield parent, field, list(drifted)
+
+
+def repair_counters(parent, field, ids):
+    """
+    Recount `field` for the given parent ids in a single UPDATE.
+    """
+    for counted_parent, counted_field, child, fk, conditions in COUNTERS:
+        if (counted_parent, counted_field) == (parent, field):
+            return parent.objects.filter(pk__in=ids).update(
+                **{field: _actual_count(child, fk, conditions)})
+    raise ValueError(f'Unknown counter {parent.__name__}.{field}')
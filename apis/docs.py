@@ -0,0 +1,99 @@
+"""
+drf_yasg's `openapi` and `swagger_auto_schema` for the views to describe
+themselves with. They do that at import time, so under SERVERLESS, where every
+cold start pays for the imports, both are stand-ins that only record what they
+are given; apply_deferred_schemas() imports drf_yasg and applies it when the
+schema is first generated. With API_DOCS off the stand-ins do nothing.
+"""
+import threading
+from importlib import import_module
+
+from django.conf import settings
+
+
+class _Inert:
+    """
+    Takes the place of the openapi module and everything built from it:
+    any attribute or call gives back the same object.
+    """
+
+    def __getattr__(self, name):
+        return self
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+
+class _Deferred:
+    """
+    An attribute of the openapi module, or of anything built from it, or a
+    call of one: evaluated, once, when first needed.
+    """
+
+    _unset = object()
+
+    def __init__(self, evaluate):
+        self._evaluate = evaluate
+        self._value = self._unset
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return _Deferred(lambda: getattr(self._resolve(), name))
+
+    def __call__(self, *args, **kwargs):
+        return _Deferred(lambda: self._resolve()(*_resolved(args), **_resolved(kwargs)))
+
+    def _resolve(self):
+        if self._value is self._unset:
+            self._value = self._evaluate()
+        return self._value
+
+
+def _resolved(value):
+    if isinstance(value, _Deferred):
+        return value._resolve()
+    if isinstance(value, dict):
+        return {key: _resolved(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_resolved(item) for item in value)
+    return value
+
+
+# (view, args, kwargs) of the swagger_auto_schema calls not applied yet
+_deferred = []
+_lock = threading.Lock()
+
+
+def apply_deferred_schemas():
+    """
+    Apply the recorded swagger_auto_schema decorations, importing the URLconf
+    first so that every view has recorded its own. No-op unless deferred.
+    """
+    if not (settings.API_DOCS and settings.SERVERLESS):
+        return
+    import_module(settings.ROOT_URLCONF)
+    from drf_yasg.utils import swagger_auto_schema as decorate
+
+    with _lock:
+        while _deferred:
+            view, args, kwargs = _deferred.pop(0)
+            decorate(*_resolved(args), **_resolved(kwargs))(view)
+
+
+if not settings.API_DOCS:
+    openapi = _Inert()
+
+    def swagger_auto_schema(*args, **kwargs):
+        return lambda view: view
+elif settings.SERVERLESS:
+    openapi = _Deferred(lambda: import_module('drf_yasg.openapi'))
+
+    def swagger_auto_schema(*args, **kwargs):
+        def record(view):
+            _deferred.append((view, args, kwargs))
+            return view
+        return record
+else:
+    from drf_yasg import openapi
+    from drf_yasg.utils import swagger_auto_schema
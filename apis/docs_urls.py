@@ -0,0 +1,35 @@
+"""
+The Swagger UI and ReDoc pages. apis/urls.py includes this module lazily, so
+drf_yasg is imported on the first request that reaches it, not at startup.
+"""
+from django.urls import path
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+from .docs import apply_deferred_schemas
+from .schema import api_info
+
+apply_deferred_schemas()
+
+# Only renders the Swagger UI and ReDoc pages; they load the document from
+# 'schema-json' (SPEC_URL in settings), which is generated once, not per hit
+schema_view = get_schema_view(
+    api_info(),
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+)
+
+urlpatterns = [
+    path(
+        'swagger/',
+        schema_view.with_ui(
+            'swagger',
+            cache_timeout=0),
+        name='schema-swagger-ui'),
+    path(
+        'redoc/',
+        schema_view.with_ui(
+            'redoc',
+            cache_timeout=0),
+        name='schema-redoc'),
+]
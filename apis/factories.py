@@ -1,9 +1,21 @@
+from functools import lru_cache
 from random import randint
+from django.contrib.auth.hashers import make_password
 from factory.django import DjangoModelFactory
-from factory import LazyFunction, LazyAttribute, SubFactory, post_generation
+from factory import LazyFunction, LazyAttribute, SelfAttribute, Sequence, SubFactory, post_generation
 from factory.faker import Faker
-from .models import Status, User, Role, Batch, UserBatch
-from datetime import datetime, timedelta
+from .models import (
+    Status, User, Role, Batch, UserBatch, Activity, UserActivity,
+    Card, CardType, UserCard, Question, QuestionType, Option, Answer
+)
+from datetime import datetime, timedelta, timezone
+
+
+@lru_cache
+def password_hash(raw_password):
+    # Hashing is deliberately slow; mock users share one hash per password
+    return make_password(raw_password)
+
 
 class UserFactory(DjangoModelFactory):
     class Meta:
@@ -25,9 +37,7 @@ class UserFactory(DjangoModelFactory):
 
     @post_generation
     def password(self, create, extracted, **kwargs):
-        self.set_password('proleap')
-        if extracted:
-            self.set_password(extracted)
+        self.password = password_hash(extracted or 'proleap')
 
 
 class BatchFactory(DjangoModelFactory):
@@ -36,9 +46,8 @@ class BatchFactory(DjangoModelFactory):
 
     name = Faker('company')
     year = LazyFunction(lambda: datetime.now().year)
-    start_time = Faker('date_time_this_year')
+    start_time = Faker('date_time_this_year', tzinfo=timezone.utc)
     end_time = LazyAttribute(lambda obj: obj.start_time + timedelta(days=randint(1, 3)))
-    total_activities = LazyAttribute(2)
 
     created_at = Faker('date_time_this_year')
     updated_at = Faker('date_time_this_year')
@@ -64,3 +73,79 @@ class UserBatchFactory(DjangoModelFactory):
 
     created_at = Faker('date_time_this_year')
     updated_at = Faker('date_time_this_year')
+
+
+class ActivityFactory(DjangoModelFactory):
+    class Meta:
+        model = Activity
+
+    name = Faker('catch_phrase')
+    desc = Faker('sentence')
+    batch = SubFactory(BatchFactory)
+    sequence_no = Sequence(lambda n: n)
+    start_time = Faker('date_time_this_year', tzinfo=timezone.utc)
+    end_time = LazyAttribute(lambda obj: obj.start_time + timedelta(hours=randint(1, 3)))
+
+
+class UserActivityFactory(DjangoModelFactory):
+    class Meta:
+        model = UserActivity
+
+    user = SubFactory(UserFactory)
+    activity = SubFactory(ActivityFactory)
+
+    completed_cards = 0
+    status = Status.NOT_ATTEMPTED
+
+
+class CardFactory(DjangoModelFactory):
+    class Meta:
+        model = Card
+
+    name = Faker('bs')
+    desc = Faker('sentence')
+    type = CardType.SURVEY_INPUT
+    activity = SubFactory(ActivityFactory)
+    sequence_no = Sequence(lambda n: n)
+    start_time = SelfAttribute('activity.start_time')
+    end_time = LazyAttribute(lambda obj: obj.start_time + obj.duration)
+    duration = timedelta(minutes=1)
+
+
+class UserCardFactory(DjangoModelFactory):
+    class Meta:
+        model = UserCard
+
+    user = SubFactory(UserFactory)
+    card = SubFactory(CardFactory)
+
+    completed_questions = 0
+    status = Status.NOT_ATTEMPTED
+
+
+class QuestionFactory(DjangoModelFactory):
+    class Meta:
+        model = Question
+
+    text = Faker('sentence', nb_words=8)
+    type = QuestionType.RADIO
+    card = SubFactory(CardFactory)
+    sequence_no = Sequence(lambda n: n)
+
+
+class OptionFactory(DjangoModelFactory):
+    class Meta:
+        model = Option
+
+    value = Faker('word')
+    question = SubFactory(QuestionFactory)
+    sequence_no = Sequence(lambda n: n)
+
+
+class AnswerFactory(DjangoModelFactory):
+    class Meta:
+        model = Answer
+
+    user = SubFactory(UserFactory)
+    option = SubFactory(OptionFactory)
+    question = SelfAttribute('option.question')
@@ -0,0 +1,15 @@
+"""
+include() imports its URLconf straight away. A URLResolver given the module
+name instead imports it the first time a request path reaches it (or on the
+first reverse()), which keeps rarely used URL modules out of cold starts.
+"""
+from django.urls import URLResolver
+from django.urls.resolvers import RoutePattern
+
+
+def lazy_include(route, urlconf_name, namespace=None):
+    """
+    path(route, include(urlconf_name)), importing urlconf_name on first use.
+    `namespace` doubles as the application namespace, as for the admin.
+    """
+    return URLResolver(RoutePattern(route), urlconf_name, app_name=namespace, namespace=namespace)
@@ -0,0 +1,63 @@
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+def filter_list_queryset(request, queryset, filter_fields):
+    """
+    Apply ?<name>=<value> filters declared as {query param: ORM lookup}.
+
+    `updated_since` (ISO 8601) is accepted by every list endpoint.
+    """
+    for param, lookup in filter_fields.items():
+        value = request.query_params.get(param)
+        if value is None:
+            continue
+        if param != 'status':
+            try:
+                value = int(value)
+            except ValueError:
+                raise ParseError(f"Invalid {param}")
+        queryset = queryset.filter(**{lookup: value})
+
+    updated_since = request.query_params.get('updated_since')
+    if updated_since is not None:
+        try:
+            parsed = parse_datetime(updated_since)
+        except ValueError:
+            # Well formed but out of range, e.g. month 13
+            parsed = None
+        if parsed is None:
+            raise ParseError("Invalid updated_since")
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        queryset = queryset.filter(updated_at__gte=parsed)
+
+    return queryset
+
+
+def sparse_fieldset(request, rows):
+    """
+    Trim serialized rows down to ?fields=a,b,c when requested.
+    """
+    fields = request.query_params.get('fields')
+    if not fields:
+        return rows
+    wanted = {field.strip() for field in fields.split(',') if field.strip()}
+    return [{key: value for key, value in row.items() if key in wanted} for row in rows]
+
+
+def paginated_list_response(request, queryset, serializer_class, filter_fields=None):
+    try:
+        queryset = filter_list_queryset(request, queryset, filter_fields or {})
+        paginator = api_settings.DEFAULT_PAGINATION_CLASS()
+        page = paginator.paginate_queryset(queryset, request)
+    except ParseError as e:
+        return Response({'error': str(e.detail)},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    data = serializer_class(page, many=True).data
+    return paginator.get_paginated_response(sparse_fieldset(request, data))
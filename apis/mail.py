@@ -0,0 +1,110 @@
+import logging
+import smtplib
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger('apis')
+
+# Failures that will not go away by retrying the same message
+PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError, ValueError)
+# Failures worth a fresh connection and another attempt
+TRANSIENT_ERRORS = (smtplib.SMTPException, OSError)
+
+
+class _RateLimiter:
+    # Spaces sends evenly so at most `rate` messages go out per second
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next_slot > now:
+            time.sleep(self.next_slot - now)
+            now = self.next_slot
+        self.next_slot = now + self.interval
+
+
+def _batches(messages, size):
+    messages = iter(messages)
+    while batch := list(islice(messages, size)):
+        yield batch
+
+
+def _reconnect(connection, attempt):
+    delay = settings.EMAIL_RETRY_BACKOFF * (2 ** (attempt - 1))
+    try:
+        connection.close()
+    except Exception:
+        pass
+    time.sleep(delay)
+    connection.open()
+
+
+def _send_one(connection, message, limiter):
+    """
+    Send one message over the shared connection, reconnecting with
+    exponential backoff on transient failures. Returns None or the error.
+    """
+    attempt = 0
+    while True:
+        limiter.wait()
+        try:
+            if connection.send_messages([message]) != 1:
+                return 'Message was not sent'
+            return None
+        except PERMANENT_ERRORS as e:
+            return str(e)
+        except TRANSIENT_ERRORS as e:
+            attempt += 1
+            if attempt > settings.EMAIL_MAX_RETRIES:
+                return str(e)
+            logger.warning(f"Email to {message.to} failed ({e}), retry {attempt}")
+            try:
+                _reconnect(connection, attempt)
+            except TRANSIENT_ERRORS as e:
+                logger.warning(f"Reconnecting to the mail server failed: {e}")
+
+
+def dispatch_messages(messages, on_batch=None, connection=None):
+    """
+    Send `messages` (any iterable of EmailMessage) over a single connection.
+
+    Messages are handed over in batches of EMAIL_BATCH_SIZE, paced to
+    EMAIL_RATE_LIMIT per second. After each batch `on_batch(sent, failures)`
+    is called, failures being a list of (message, error) pairs.
+
+    Returns (sent, failures) for the whole run.
+    """
+    connection = connection or get_connection()
+    limiter = _RateLimiter(settings.EMAIL_RATE_LIMIT)
+    sent = 0
+    failures = []
+
+    # Opened once here, send_messages() then reuses it instead of
+    # connecting and negotiating TLS for every message
+    connection.open()
+    try:
+        for batch in _batches(messages, settings.EMAIL_BATCH_SIZE):
+            batch_sent = 0
+            batch_failures = []
+            for message in batch:
+                error = _send_one(connection, message, limiter)
+                if error is None:
+                    batch_sent += 1
+                else:
+                    batch_failures.append((message, error))
+
+            sent += batch_sent
+            failures.extend(batch_failures)
+            if on_batch is not None:
+                on_batch(batch_sent, batch_failures)
+    finally:
+        connection.close()
+
+    return sent, failures
@@ -0,0 +1,58 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from statistics import median, quantiles
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apis.models import User
+
+
+class Command(BaseCommand):
+    help = ('Fire concurrent GETs at a running server and report throughput, '
+            'e.g. to compare gunicorn sync workers with an ASGI server')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+',
+                            help='Paths to request in turn, e.g. /apis/user/1/batch/1/activities/')
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--user', type=int, required=True,
+                            help='User to mint an access token for')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(pk=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} not found")
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        paths = options['paths']
+        urls = [options['base_url'].rstrip('/') + paths[i % len(paths)]
+                for i in range(options['requests'])]
+
+        def fetch(url):
+            start = time.perf_counter()
+            try:
+                with urlopen(Request(url, headers=headers)) as response:
+                    response.read()
+                    status = response.status
+            except HTTPError as e:
+                status = e.code
+            except URLError:
+                status = 599
+            return status, (time.perf_counter() - start) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(fetch, urls))
+        elapsed = time.perf_counter() - started
+
+        timings = [ms for _, ms in results]
+        errors = sum(1 for status, _ in results if status >= 400)
+        self.stdout.write(
+            f"{len(results)} requests, concurrency {options['concurrency']}: "
+            f"{len(results) / elapsed:.1f} req/s, p50={median(timings):.1f}ms "
+            f"p95={quantiles(timings, n=20)[-1]:.1f}ms, {errors} errors")
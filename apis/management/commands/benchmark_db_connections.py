@@ -0,0 +1,68 @@
+import time
+from statistics import median, quantiles
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apis.models import User
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request latency with and without persistent database connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--conn-max-age', type=int, default=None,
+                            help='Persistent mode lifetime (defaults to the configured one)')
+
+    def handle(self, *args, **options):
+        settings_dict = connection.settings_dict
+        configured = settings_dict['CONN_MAX_AGE']
+        persistent = options['conn_max_age'] or configured or 600
+
+        user = User.objects.create_user(
+            email='db-benchmark@proleap.com', username='db-benchmark',
+            is_verified=True)
+        try:
+            for label, conn_max_age in (('per request', 0), ('persistent', persistent)):
+                settings_dict['CONN_MAX_AGE'] = conn_max_age
+                connection.close()
+                self.report(label, *self.run(user, options['requests']))
+        finally:
+            settings_dict['CONN_MAX_AGE'] = configured
+            connection.close()
+            User.objects.filter(pk=user.pk).delete()
+
+    def run(self, user, n_requests):
+        client = APIClient()
+        client.force_authenticate(user)
+        url = reverse('users', args=[user.id])
+
+        connects = []
+        def count_connect(**kwargs):
+            connects.append(1)
+        connection_created.connect(count_connect)
+
+        timings = []
+        try:
+            for _ in range(n_requests):
+                start = time.perf_counter()
+                # The test client unhooks close_old_connections from the
+                # request signals, so do what the WSGI handler would
+                close_old_connections()
+                response = client.get(url)
+                close_old_connections()
+                timings.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.status_code
+        finally:
+            connection_created.disconnect(count_connect)
+        return timings, len(connects)
+
+    def report(self, label, timings, connects):
+        p95 = quantiles(timings, n=20)[-1]
+        self.stdout.write(
+            f'{label:>12}: p50={median(timings):.2f}ms p95={p95:.2f}ms '
+            f'connects={connects} over {len(timings)} requests')
@@ -0,0 +1,68 @@
+import json
+from datetime import datetime
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from apis.benchmarks import run_benchmarks, seed_benchmark_data
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway test database at several scales and record query counts, '
+            'p50/p95 latency and peak memory for every endpoint')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[50, 500, 5000],
+                            help='Users per batch to seed, one run each')
+        parser.add_argument('--activities', type=int, default=10)
+        parser.add_argument('--cards', type=int, default=10)
+        parser.add_argument('--questions', type=int, default=10)
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Timed requests per endpoint')
+        parser.add_argument('--output', default='benchmarks.json',
+                            help='JSON file for the results, e.g. a baseline to commit')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Reuse the test database between runs')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            # Send nothing, and keep registration emails and poll tallies
+            # in the request thread so their cost is measured
+            with override_settings(REGISTRATION_EMAIL_MODE='inline', POLL_TALLY_FLUSH_INTERVAL=0):
+                scales = {}
+                for users in options['scales']:
+                    scales[str(users)] = self.run_scale(users, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        results = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'scales': scales,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def run_scale(self, users, options):
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        seed = seed_benchmark_data(
+            users, options['activities'], options['cards'], options['questions'])
+        results = run_benchmarks(seed, options['iterations'])
+
+        self.stdout.write(f'\n{users} users per batch')
+        for name, result in results.items():
+            self.stdout.write(
+                f"  {name:<24} {result['status']} {result['queries']:>4} queries "
+                f"p50={result['p50_ms']:>8.1f}ms p95={result['p95_ms']:>8.1f}ms "
+                f"peak={result['peak_kb']:>8.0f}KB")
+        return results
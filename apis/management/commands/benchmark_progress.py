@@ -0,0 +1,65 @@
+from statistics import mean
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apis.models import User, Batch, Activity, Card, Question, Answer
+from apis.progress import flush_progress_updates
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Report how many queries the progress rollup issues per saved Answer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--activities', type=int, default=5)
+        parser.add_argument('--cards', type=int, default=10)
+        parser.add_argument('--questions', type=int, default=10)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['activities'], options['cards'], options['questions'])
+                # Never leave benchmark rows behind
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def run(self, n_activities, n_cards, n_questions):
+        now = timezone.now()
+        user = User.objects.create(
+            email='progress-benchmark@proleap.com', username='progress-benchmark')
+        batch = Batch.objects.create(
+            name='progress-benchmark', year=now.year)
+
+        questions = []
+        for a in range(n_activities):
+            activity = Activity.objects.create(
+                name=f'activity {a}', batch=batch, sequence_no=a)
+            for c in range(n_cards):
+                card = Card.objects.create(
+                    name=f'card {c}', activity=activity, sequence_no=c,
+                    start_time=now, end_time=now)
+                questions.extend(Question.objects.bulk_create([
+                    Question(text=f'question {q}', card=card, sequence_no=q)
+                    for q in range(n_questions)]))
+
+        counts = []
+        for question in questions:
+            with CaptureQueriesContext(connection) as ctx:
+                Answer.objects.create(user=user, question=question, answer='yes')
+                # The whole run is one transaction, so flush what on_commit would
+                flush_progress_updates()
+            counts.append(len(ctx.captured_queries))
+
+        self.stdout.write(
+            f'{len(counts)} answers over {n_activities} activities x {n_cards} cards x '
+            f'{n_questions} questions')
+        self.stdout.write(
+            f'queries per answer (including the INSERT): '
+            f'min={min(counts)} max={max(counts)} avg={mean(counts):.2f}')
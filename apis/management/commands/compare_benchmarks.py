@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apis.benchmarks import find_regressions
+
+
+class Command(BaseCommand):
+    help = 'Compare a benchmark_endpoints run against a baseline and fail on regressions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('baseline', help='JSON written by benchmark_endpoints')
+        parser.add_argument('current', help='JSON written by benchmark_endpoints')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed growth of p95 latency and peak memory, as a fraction')
+        parser.add_argument('--min-ms', type=float, default=5.0,
+                            help='Ignore p95 changes smaller than this many milliseconds')
+
+    def handle(self, *args, **options):
+        results = []
+        for path in (options['baseline'], options['current']):
+            try:
+                with open(path) as f:
+                    results.append(json.load(f))
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read {path}: {e}')
+
+        skipped = results[0]['scales'].keys() - results[1]['scales'].keys()
+        if skipped:
+            self.stdout.write(f'Not in the current run, skipped: scales {", ".join(sorted(skipped))}')
+        regressions = find_regressions(
+            *results, threshold=options['threshold'], min_ms=options['min_ms'])
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(regression))
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}')
+        self.stdout.write(self.style.SUCCESS('No regressions'))
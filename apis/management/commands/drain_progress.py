@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apis.progress import drain_progress_updates
+
+
+class Command(BaseCommand):
+    help = 'Roll up queued user progress (PROGRESS_ROLLUP_MODE=deferred)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the queue once and exit')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        while True:
+            drained = drain_progress_updates(limit=batch_size)
+            if drained:
+                self.stdout.write(f'Rolled up {drained} queued progress updates')
+
+            if options['once'] and drained < batch_size:
+                break
+            if drained < batch_size:
+                close_old_connections()
+                time.sleep(options['interval'])
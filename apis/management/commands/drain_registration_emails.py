@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apis.registration import drain_registration_jobs
+
+
+class Command(BaseCommand):
+    help = ('Send queued registration emails and '
+            'resume jobs whose sender died')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to sleep when there is nothing to send')
+        parser.add_argument('--once', action='store_true',
+                            help='Send what is queued once and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            ran = drain_registration_jobs()
+            if ran:
+                self.stdout.write(f'Sent the emails of {ran} registration jobs')
+
+            if options['once'] and not ran:
+                break
+            if not ran:
+                close_old_connections()
+                time.sleep(options['interval'])
@@ -0,0 +1,95 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from apis.models import Answer, Status, UserActivity, UserBatch, UserCard
+
+# Plan lines that read a whole table instead of going through an index
+FULL_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)(?! USING)'),
+}
+
+
+def hot_queries(user_id, card_id, activity_id, batch_id):
+    """
+    (name, driving table, queryset) for the queries behind sign-in,
+    progress rollups and the progress views.
+    """
+    return [
+        ('latest user card', UserCard._meta.db_table,
+         UserCard.objects.filter(
+             user_id=user_id, card__activity_id=activity_id).order_by('-updated_at')[:1]),
+        ('latest user activity', UserActivity._meta.db_table,
+         UserActivity.objects.filter(
+             user_id=user_id, activity__batch_id=batch_id).order_by('-updated_at')[:1]),
+        ('sign-in batch', UserBatch._meta.db_table,
+         UserBatch.objects.filter(user_id=user_id).order_by('updated_at', 'id')[:1]),
+        ('answered required questions', Answer._meta.db_table,
+         Answer.objects.filter(
+             user_id=user_id, question__card_id=card_id,
+             question__is_required=True).values('user').annotate(
+                 answered=Count('question', distinct=True))),
+        ('completed cards', UserCard._meta.db_table,
+         UserCard.objects.filter(
+             user_id=user_id, card__activity_id=activity_id,
+             status=Status.COMPLETED).values('user').annotate(completed=Count('*'))),
+        ('completed activities', UserActivity._meta.db_table,
+         UserActivity.objects.filter(
+             user_id=user_id, activity__batch_id=batch_id,
+             status=Status.COMPLETED).values('user').annotate(completed=Count('*'))),
+        ('activity answers', Answer._meta.db_table,
+         Answer.objects.filter(user_id=user_id, question__card__activity_id=activity_id)),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot progress queries and report any that scan their table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int,
+                            help='User to plan for (defaults to one with answers)')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Refresh planner statistics first')
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Print every plan, not only the failing ones')
+        parser.add_argument('--strict', action='store_true',
+                            help='Exit with an error when any query scans its table')
+
+    def sample(self, user_id):
+        answers = Answer.objects.filter(question__card__activity__batch__isnull=False)
+        if user_id is not None:
+            answers = answers.filter(user_id=user_id)
+        row = answers.values_list(
+            'user_id', 'question__card_id', 'question__card__activity_id',
+            'question__card__activity__batch_id').first()
+        if row is None:
+            raise CommandError('No answers to plan against; seed the database first')
+        return row
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        pattern = FULL_SCAN_PATTERNS.get(vendor)
+        if pattern is None:
+            raise CommandError(f'Unsupported database: {vendor}')
+
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        failures = 0
+        for name, table, queryset in hot_queries(*self.sample(options['user'])):
+            plan = queryset.explain()
+            full_scans = set(pattern.findall(plan))
+            if table in full_scans:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f'SCAN   {name}: full scan of {table}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'INDEX  {name}'))
+            if table in full_scans or options['verbose_plans']:
+                self.stdout.write(plan + '\n')
+
+        if failures and options['strict']:
+            raise CommandError(f'{failures} hot queries scan their table')
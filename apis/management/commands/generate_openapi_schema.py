@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apis.schema import SCHEMA_FORMATS, generate_schema, schema_path
+
+
+class Command(BaseCommand):
+    help = 'Write the OpenAPI schema to OPENAPI_SCHEMA_DIR, to be served without regenerating it'
+
+    def handle(self, *args, **options):
+        if not settings.API_DOCS:
+            raise CommandError('The schema is generated from the views\' documentation; run with API_DOCS=true')
+        for format in SCHEMA_FORMATS:
+            path = schema_path(format)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(generate_schema(format))
+            self.stdout.write(f'Wrote {path}')
@@ -1,32 +1,200 @@
-from django.core.management.base import BaseCommand
-from random import shuffle
-from apis.factories import UserFactory, BatchFactory, UserBatchFactory
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apis.counters import counter_drift, repair_counters
+from apis.factories import (
+    UserFactory, BatchFactory, ActivityFactory, CardFactory, QuestionFactory, OptionFactory,
+    password_hash
+)
+from apis.models import (
+    User, UserBatch, Status, Activity, UserActivity, Card, UserCard, Question, Option, Answer
+)
+from apis.progress import progress_status
+from apis.signals import progress_updates_suspended
 
 
 class Command(BaseCommand):
-    help = 'Populate database with users and assign them to batches'
+    help = ('Populate the database with users, batches, activities, cards, questions, '
+            'answers and the matching progress, using bulk inserts')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=40,
+                            help='Users, spread evenly over the batches')
+        parser.add_argument('--batches', type=int, default=2)
+        parser.add_argument('--activities', type=int, default=3, help='Per batch')
+        parser.add_argument('--cards', type=int, default=5, help='Per activity')
+        parser.add_argument('--questions', type=int, default=5, help='Per card')
+        parser.add_argument('--options', type=int, default=4, help='Per question')
+        parser.add_argument('--answer-fill', type=float, default=0.5,
+                            help="Fraction of its batch's questions every user has answered, in order")
+        parser.add_argument('--password', default='proleap',
+                            help='Password of every generated user')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Rows per insert and per transaction')
+        parser.add_argument('--copy', action='store_true',
+                            help='Load answers with COPY (PostgreSQL with psycopg 3 only)')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['answer_fill'] <= 1:
+            raise CommandError('--answer-fill must be between 0 and 1')
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy needs PostgreSQL')
+        self.options = options
+        self.chunk_size = options['chunk_size']
+        started = time.perf_counter()
+
+        # Bulk inserts never send post_save; this also keeps any per-row
+        # save below from rolling up progress that is written directly
+        with progress_updates_suspended():
+            UserFactory(email='admin1@proleap.com', username='admin1', is_staff=True,
+                        is_superuser=True, password=options['password'])
+            batches = [BatchFactory() for _ in range(options['batches'])]
+            contents = [self.create_content(batch) for batch in batches]
+            users = self.create_users(batches)
+            answers = self.create_answers_and_progress(users, batches, contents)
+
+            for parent, field, drifted in counter_drift():
+                if drifted:
+                    repair_counters(parent, field, [pk for pk, _, _ in drifted])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Populated {len(users)} users in {len(batches)} batches with {answers} answers '
+            f'in {time.perf_counter() - started:.1f}s'))
+
+    def bulk_create(self, model, rows):
+        with transaction.atomic():
+            return model.objects.bulk_create(rows, batch_size=self.chunk_size)
+
+    def create_content(self, batch):
+        """
+        The batch's questions in answering order, as
+        [(activity_id, card_id, question_id, [option ids])].
+        """
+        options = self.options
+        now = timezone.now()
+        activities = self.bulk_create(Activity, [
+            ActivityFactory.build(batch=batch, sequence_no=a, start_time=now)
+            for a in range(options['activities'])])
+        cards = self.bulk_create(Card, [
+            CardFactory.build(activity=activity, sequence_no=c)
+            for activity in activities for c in range(options['cards'])])
+        questions = self.bulk_create(Question, [
+            QuestionFactory.build(card=card, sequence_no=q)
+            for card in cards for q in range(options['questions'])])
+        option_rows = self.bulk_create(Option, [
+            OptionFactory.build(question=question, sequence_no=o)
+            for question in questions for o in range(options['options'])])
+
+        option_ids = {}
+        for option in option_rows:
+            option_ids.setdefault(option.question_id, []).append(option.id)
+        return [
+            (question.card.activity_id, question.card_id, question.id,
+             option_ids.get(question.id, [None]))
+            for question in questions]
+
+    def create_users(self, batches):
+        # Built, not created: the factory would save and hash row by row
+        users = [
+            UserFactory.build(
+                email=f'user{i}@proleap.com', username=f'user{i}',
+                current_batch=batches[i % len(batches)] if batches else None)
+            for i in range(self.options['users'])]
+        hashed = password_hash(self.options['password'])
+        for user in users:
+            user.password = hashed
+        return self.bulk_create(User, users)
+
+    def progress_rows(self, content, answered):
+        """
+        (user card, user activity, user batch) field values for a user who
+        answered the first `answered` questions of `content`.
+        """
+        questions_per_card = self.options['questions']
+        cards_per_activity = self.options['cards']
+        answered_per_card = {}
+        for activity_id, card_id, _, _ in content[:answered]:
+            answered_per_card[(activity_id, card_id)] = answered_per_card.get((activity_id, card_id), 0) + 1
 
-    def handle(self, *args, **kwargs):
+        user_cards = []
+        completed_cards = {}
+        for (activity_id, card_id), count in answered_per_card.items():
+            status = progress_status(count, questions_per_card)
+            user_cards.append({'card_id': card_id, 'completed_questions': count, 'status': status})
+            completed_cards.setdefault(activity_id, 0)
+            completed_cards[activity_id] += status == Status.COMPLETED
 
-        # Create admin user
-        UserFactory(email='admin1@proleap.com', username='admin1', is_staff=True, is_superuser=True, password='proleap')
- 
-        # Create 40 new users
-        users = UserFactory.create_batch(40)
+        user_activities = [
+            {'activity_id': activity_id, 'completed_cards': count,
+             'status': progress_status(count, cards_per_activity)}
+            for activity_id, count in completed_cards.items()]
+        completed_activities = sum(
+            1 for row in user_activities if row['status'] == Status.COMPLETED)
+        batch_status = progress_status(completed_activities, self.options['activities'])
+        user_batch = {
+            'completed_activities': completed_activities,
+            'status': batch_status,
+            'is_completed': batch_status == Status.COMPLETED}
+        return user_cards, user_activities, user_batch
 
-        # Create new batches
-        batch1 = BatchFactory()
-        batch2 = BatchFactory()
+    def create_answers_and_progress(self, users, batches, contents):
+        """
+        Answers are generated per user and flushed every --chunk-size rows,
+        so memory stays flat however many are seeded.
+        """
+        now = timezone.now()
+        content_by_batch = {batch.id: content for batch, content in zip(batches, contents)}
+        answered = {
+            batch.id: round(len(content) * self.options['answer_fill'])
+            for batch, content in zip(batches, contents)}
+        progress = {
+            batch.id: self.progress_rows(content_by_batch[batch.id], answered[batch.id])
+            for batch in batches}
 
-        # Shuffle users to evenly distribute them between batches
-        shuffle(users)
+        total = 0
+        pending = {Answer: [], UserCard: [], UserActivity: [], UserBatch: []}
+        for user in users:
+            batch_id = user.current_batch_id
+            if batch_id is None:
+                continue
+            user_cards, user_activities, user_batch = progress[batch_id]
+            pending[UserBatch].append(UserBatch(user_id=user.id, batch_id=batch_id, **user_batch))
+            pending[UserActivity].extend(
+                UserActivity(user_id=user.id, **row) for row in user_activities)
+            pending[UserCard].extend(UserCard(user_id=user.id, **row) for row in user_cards)
+            pending[Answer].extend(
+                Answer(user_id=user.id, question_id=question_id,
+                       option_id=random.choice(option_ids), created_at=now, updated_at=now)
+                for _, _, question_id, option_ids in content_by_batch[batch_id][:answered[batch_id]])
 
-        # Assign users to batches
-        # Assign users to batches
-        for index, user in enumerate(users[:20]):
-            UserBatchFactory(user=user, batch=batch1)
+            if len(pending[Answer]) >= self.chunk_size:
+                total += self.flush(pending)
+        return total + self.flush(pending)
 
-        for index, user in enumerate(users[20:40]):
-            UserBatchFactory(user=user, batch=batch2)
+    def flush(self, pending):
+        answers = len(pending[Answer])
+        for model, rows in pending.items():
+            if not rows:
+                continue
+            if model is Answer and self.options['copy']:
+                self.copy_answers(rows)
+            else:
+                self.bulk_create(model, rows)
+            rows.clear()
+        if answers:
+            self.stdout.write(f'  {answers} answers', ending='\r')
+        return answers
 
-        self.stdout.write(self.style.SUCCESS('Successfully populated database with users and assigned them to batches'))
\ No newline at end of file
+    def copy_answers(self, answers):
+        fields = [Answer._meta.get_field(name) for name in
+                  ('user', 'question', 'option', 'created_at', 'updated_at')]
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        table = connection.ops.quote_name(Answer._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            with cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy:
+                for answer in answers:
+                    copy.write_row([getattr(answer, field.attname) for field in fields])
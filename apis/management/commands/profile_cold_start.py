@@ -0,0 +1,107 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter: imports the WSGI application and serves one
+# request to it, then prints the timings as the last line of stdout
+CHILD = '''
+import time
+start = time.perf_counter()
+import importlib, json, sys
+from wsgiref.util import setup_testing_defaults
+
+module, name = sys.argv[1].rsplit('.', 1)
+application = getattr(importlib.import_module(module), name)
+loaded = time.perf_counter()
+
+environ = {'PATH_INFO': sys.argv[2], 'REQUEST_METHOD': sys.argv[3]}
+setup_testing_defaults(environ)
+statuses = []
+response = application(environ, lambda status, headers: statuses.append(status))
+b''.join(response)
+done = time.perf_counter()
+print(json.dumps({
+    'setup_ms': (loaded - start) * 1000,
+    'first_response_ms': (done - start) * 1000,
+    'status': statuses[0],
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Time a cold start, from the first import to the first response, and '
+            'break the imports down by package')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/apis/signin/',
+                            help='Request path of the first request')
+        parser.add_argument('--method', default='GET')
+        parser.add_argument('--runs', type=int, default=3,
+                            help='Cold starts to time; the median is reported')
+        parser.add_argument('--top', type=int, default=15,
+                            help='Packages to list in the import breakdown')
+        parser.add_argument('--serverless', action='store_true',
+                            help='Start with SERVERLESS=true, as on Vercel')
+        parser.add_argument('--budget-ms', type=float,
+                            help='Fail when the median time to the first response is above this')
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be at least 1')
+        env = {**os.environ, 'PYTHONPATH': str(settings.BASE_DIR)}
+        if options['serverless']:
+            env['SERVERLESS'] = 'true'
+
+        runs = [self.cold_start(env, options) for _ in range(options['runs'])]
+        setup_ms = statistics.median(run['setup_ms'] for run in runs)
+        first_response_ms = statistics.median(run['first_response_ms'] for run in runs)
+        self.stdout.write(
+            f"{settings.WSGI_APPLICATION}, {options['method']} {options['path']} -> "
+            f"{runs[0]['status']} (median of {len(runs)})")
+        self.stdout.write(f'  setup           {setup_ms:8.1f} ms')
+        self.stdout.write(f'  first response  {first_response_ms:8.1f} ms')
+
+        # A separate start: -X importtime slows the imports it measures
+        imports = self.import_times(env, options)
+        self.stdout.write('Import time by package (self time, one start under -X importtime):')
+        for package, ms in imports[:options['top']]:
+            self.stdout.write(f'  {package:<30} {ms:8.1f} ms')
+
+        budget = options['budget_ms']
+        if budget is not None and first_response_ms > budget:
+            raise CommandError(
+                f'First response after {first_response_ms:.1f} ms, over the {budget:.1f} ms budget')
+
+    def run_child(self, env, options, *flags):
+        process = subprocess.run(
+            [sys.executable, *flags, '-c', CHILD,
+             settings.WSGI_APPLICATION, options['path'], options['method']],
+            env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if process.returncode:
+            raise CommandError(f'Cold start failed:\n{process.stderr}')
+        return process
+
+    def cold_start(self, env, options):
+        return json.loads(self.run_child(env, options).stdout.splitlines()[-1])
+
+    def import_times(self, env, options):
+        """
+        [(top-level package, self import ms)], slowest first.
+        """
+        totals = {}
+        stderr = self.run_child(env, options, '-X', 'importtime').stderr
+        for line in stderr.splitlines():
+            # import time: <self us> | <cumulative us> | <module, indented by depth>
+            if not line.startswith('import time:'):
+                continue
+            fields = line[len('import time:'):].split('|')
+            if len(fields) != 3 or not fields[0].strip().isdigit():
+                continue
+            package = fields[2].strip().split('.')[0]
+            totals[package] = totals.get(package, 0) + int(fields[0]) / 1000
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)
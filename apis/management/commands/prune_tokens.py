@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apis.tokens import prune_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted JWTs in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help='Seconds to sleep between chunks')
+        parser.add_argument('--every', type=float, default=None,
+                            help='Keep running, pruning every N seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            total = 0
+            while True:
+                deleted = prune_expired_tokens(options['batch_size'])
+                total += deleted
+                if deleted < options['batch_size']:
+                    break
+                # Let other writers at the tables between chunks
+                time.sleep(options['pause'])
+            self.stdout.write(f'Pruned {total} expired tokens')
+
+            if options['every'] is None:
+                break
+            close_old_connections()
+            time.sleep(options['every'])
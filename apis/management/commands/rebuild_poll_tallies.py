@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apis.models import Card, CardType
+from apis.polls import rebuild_poll_tallies
+
+
+class Command(BaseCommand):
+    help = 'Recount POLL card tallies from their answers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('card_ids', nargs='*', type=int,
+                            help='Cards to rebuild (defaults to every POLL card)')
+
+    def handle(self, *args, **options):
+        card_ids = options['card_ids'] or Card.objects.filter(
+            type=CardType.POLL).values_list('id', flat=True)
+        for card_id in card_ids:
+            rebuild_poll_tallies(card_id)
+            self.stdout.write(f'Rebuilt tallies of card {card_id}')
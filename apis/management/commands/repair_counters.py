@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apis.counters import counter_drift, repair_counters
+
+
+class Command(BaseCommand):
+    help = 'Find and repair total_* counters that drifted from the rows they count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report drift, exit with an error if any')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        drifted_total = 0
+
+        for parent, field, drifted in counter_drift():
+            label = f'{parent.__name__}.{field}'
+            if not drifted:
+                self.stdout.write(f'{label}: ok')
+                continue
+
+            drifted_total += len(drifted)
+            self.stdout.write(self.style.WARNING(f'{label}: {len(drifted)} drifted'))
+            for pk, stored, actual in drifted[:10]:
+                self.stdout.write(f'  {parent.__name__} {pk}: {stored} stored, {actual} actual')
+
+            if not options['check']:
+                ids = [pk for pk, _, _ in drifted]
+                for start in range(0, len(ids), batch_size):
+                    repair_counters(parent, field, ids[start:start + batch_size])
+                self.stdout.write(self.style.SUCCESS(f'{label}: repaired'))
+
+        if drifted_total and options['check']:
+            raise CommandError(f'{drifted_total} counters drifted')
@@ -0,0 +1,126 @@
+"""
+Prometheus metrics, served at apis/metrics/.
+
+Under gunicorn set PROMETHEUS_MULTIPROC_DIR to an empty directory shared by
+the workers (gunicorn.conf.py clears it on start and cleans up after dead
+workers); every worker then writes its samples there and any one of them
+reports the whole fleet. Set it for the web process only: the directory
+must exist before anything imports this module.
+"""
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess
+)
+
+REQUEST_LATENCY = Histogram(
+    'proleap_http_request_duration_seconds', 'Time to the response, by URL name',
+    ['view', 'method'])
+REQUEST_COUNT = Counter(
+    'proleap_http_requests', 'Responses by URL name and status code',
+    ['view', 'method', 'status'])
+REQUESTS_IN_FLIGHT = Gauge(
+    'proleap_http_requests_in_flight', 'Requests being handled, by URL name',
+    ['view'], multiprocess_mode='livesum')
+
+SIGNAL_LATENCY = Histogram(
+    'proleap_signal_duration_seconds', 'Time spent in signal receivers', ['receiver'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1))
+PROGRESS_ROLLUP_LATENCY = Histogram(
+    'proleap_progress_rollup_duration_seconds',
+    'Time to recompute one user card, activity and batch progress')
+PROGRESS_ROLLUP_QUERIES = Histogram(
+    'proleap_progress_rollup_queries', 'Queries issued by one progress rollup',
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15, 20))
+
+# For requests that never reach a view, e.g. 404s
+UNRESOLVED = '<unresolved>'
+
+
+def timed_receiver(receiver):
+    """
+    Decorate a signal receiver to record its runtime. Apply it below
+    @receiver, so the timed wrapper is what gets connected.
+    """
+    histogram = SIGNAL_LATENCY.labels(receiver.__name__)
+
+    @wraps(receiver)
+    def wrapper(*args, **kwargs):
+        with histogram.time():
+            return receiver(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def track_progress_rollup():
+    """
+    Record the runtime and query count of a progress rollup; also usable as
+    a decorator.
+    """
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    with connection.execute_wrapper(count):
+        yield
+    PROGRESS_ROLLUP_LATENCY.observe(time.perf_counter() - start)
+    PROGRESS_ROLLUP_QUERIES.observe(queries)
+
+
+def render_metrics():
+    """
+    (body, content type) of every metric, from all workers in multiprocess mode.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    Latency, status and in-flight metrics per URL name. First in MIDDLEWARE,
+    so the latency covers the other middleware as well.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            in_flight = getattr(request, '_metrics_in_flight', None)
+            if in_flight is not None:
+                in_flight.dec()
+        view = _url_name(request)
+        REQUEST_LATENCY.labels(view, request.method).observe(time.perf_counter() - start)
+        REQUEST_COUNT.labels(view, request.method, str(response.status_code)).inc()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_in_flight = REQUESTS_IN_FLIGHT.labels(_url_name(request))
+        request._metrics_in_flight.inc()
+
+
+def _url_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNRESOLVED
+    return match.view_name or match.route
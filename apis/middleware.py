@@ -0,0 +1,174 @@
+"""
+Opt-in request profiling (REQUEST_PROFILING=True): per-request query count,
+database, view and serializer time as Server-Timing headers and one JSON log
+line, plus the SQL of slow requests spooled to REQUEST_PROFILING_SPOOL_DIR.
+"""
+import json
+import logging
+import time
+import uuid
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+
+logger = logging.getLogger('apis.requests')
+
+# Stats of the request being profiled in this thread or task, if any
+_current = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+
+    def __init__(self):
+        self.queries = []
+        self.serializer_ms = 0.0
+        self.serializer_depth = 0
+
+    @property
+    def db_ms(self):
+        return sum(query['ms'] for query in self.queries)
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed with connection.execute_wrapper() for the whole request
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'params': params,
+                'many': many,
+                'ms': (time.perf_counter() - start) * 1000,
+            })
+
+
+def _timed_representation(to_representation):
+    @wraps(to_representation)
+    def wrapper(self, instance):
+        profile = _current.get()
+        if profile is None:
+            return to_representation(self, instance)
+        # Nested serializers are counted once, in their outermost parent
+        profile.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return to_representation(self, instance)
+        finally:
+            profile.serializer_depth -= 1
+            if not profile.serializer_depth:
+                profile.serializer_ms += (time.perf_counter() - start) * 1000
+    wrapper._profiled = True
+    return wrapper
+
+
+def _instrument_serializers():
+    for serializer_class in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(serializer_class.to_representation, '_profiled', False):
+            serializer_class.to_representation = _timed_representation(
+                serializer_class.to_representation)
+
+
+class RequestProfilingMiddleware:
+    """
+    Only installed when REQUEST_PROFILING is set; keep it last in MIDDLEWARE
+    so its view time covers the view alone. Queries run by a streaming
+    response's iterator happen after the response leaves here and are not
+    counted.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.threshold_ms = settings.REQUEST_PROFILING_SLOW_MS
+        self.spool_dir = Path(settings.REQUEST_PROFILING_SPOOL_DIR)
+        _instrument_serializers()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+                if hasattr(request, '_profile_view_start'):
+                    # Last in MIDDLEWARE, so this is the view and nothing else
+                    request._profile_view_ms = (
+                        time.perf_counter() - request._profile_view_start) * 1000
+                # Templates and DRF responses render lazily, after the view
+                if hasattr(response, 'render') and callable(response.render):
+                    response = response.render()
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - start) * 1000
+
+        view_ms = getattr(request, '_profile_view_ms', None)
+        timings = [
+            ('db', profile.db_ms, f'{len(profile.queries)} queries'),
+            ('serialize', profile.serializer_ms, None),
+            ('view', view_ms, None),
+            ('total', total_ms, None),
+        ]
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={ms:.1f}' + (f';desc="{desc}"' if desc else '')
+            for name, ms, desc in timings if ms is not None)
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request, '_profile_view_name', None),
+            'status': response.status_code,
+            'queries': len(profile.queries),
+            'db_ms': round(profile.db_ms, 2),
+            'view_ms': round(view_ms, 2) if view_ms is not None else None,
+            'serializer_ms': round(profile.serializer_ms, 2),
+            'total_ms': round(total_ms, 2),
+        }
+        if total_ms >= self.threshold_ms:
+            record['spool'] = self.spool(record, profile)
+        logger.info(json.dumps(record))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'view_class', view_func)
+        request._profile_view_name = getattr(view, '__qualname__', repr(view))
+        request._profile_view_start = time.perf_counter()
+
+    def spool(self, record, profile):
+        """
+        Write the request's queries and an EXPLAIN of its slowest one to the
+        spool directory. Returns the file name, or None if writing failed.
+        """
+        data = {**record, 'sql': profile.queries}
+        if profile.queries:
+            slowest = max(profile.queries, key=lambda query: query['ms'])
+            data['slowest'] = {**slowest, 'plan': self.explain(slowest)}
+        path = self.spool_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.json"
+        try:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(data, indent=2, default=str))
+        except OSError as e:
+            logger.error(f"Spooling slow request {record['path']} failed: {e}")
+            return None
+        return path.name
+
+    def explain(self, query):
+        if query['many'] or not query['sql'].lstrip().upper().startswith('SELECT'):
+            return None
+        connection = connections[query['alias']]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"{connection.ops.explain_query_prefix()} {query['sql']}", query['params'])
+                return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+        except Exception as e:
+            return f'EXPLAIN failed: {e}'
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 00:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingProgressUpdate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('queued_at', models.DateTimeField()),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='apis.card')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='pendingprogressupdate',
+            constraint=models.UniqueConstraint(fields=('user', 'card'), name='unique_pending_progress_user_card'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-18 00:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0002_pendingprogressupdate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistrationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('SENDING', 'Sending'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='QUEUED', max_length=20)),
+                ('total_users', models.IntegerField(default=0)),
+                ('emails_sent', models.IntegerField(default=0)),
+                ('emails_failed', models.IntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, null=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='registration_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
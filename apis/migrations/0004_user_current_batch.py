@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 00:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_current_batch(apps, schema_editor):
+    User = apps.get_model('apis', 'User')
+    UserBatch = apps.get_model('apis', 'UserBatch')
+    earliest = UserBatch.objects.filter(
+        user=models.OuterRef('pk')).order_by('updated_at', 'id').values('batch_id')[:1]
+    User.objects.update(current_batch=models.Subquery(earliest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0003_registrationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='current_batch',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='apis.batch'),
+        ),
+        migrations.RunPython(backfill_current_batch, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 00:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0004_user_current_batch'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['user', '-updated_at'], name='useractivity_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['user', 'status', 'activity'], name='useractivity_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userbatch',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='userbatch_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usercard',
+            index=models.Index(fields=['user', '-updated_at'], name='usercard_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usercard',
+            index=models.Index(fields=['user', 'status', 'card'], name='usercard_user_status_idx'),
+        ),
+    ]
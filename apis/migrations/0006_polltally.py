@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-18 00:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0005_progress_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('votes', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True, null=True)),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='poll_tallies', to='apis.card')),
+                ('option', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='poll_tally', to='apis.option')),
+            ],
+        ),
+    ]
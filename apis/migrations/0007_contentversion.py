@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-18 01:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0006_polltally'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentVersion',
+            fields=[
+                ('activity', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='content_version', serialize=False, to='apis.activity')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-18 01:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0007_contentversion'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['-created_at', '-id'], name='answer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-created_at', '-id'], name='user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['-created_at', '-id'], name='useractivity_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userbatch',
+            index=models.Index(fields=['-created_at', '-id'], name='userbatch_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usercard',
+            index=models.Index(fields=['-created_at', '-id'], name='usercard_created_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-18 01:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0008_list_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registrationjob',
+            name='domain',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.CreateModel(
+            name='PendingVerificationEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_emails', to='apis.registrationjob')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='pendingverificationemail',
+            constraint=models.UniqueConstraint(fields=('job', 'user'), name='unique_pending_email_job_user'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-18 02:10
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+# As apis.counters.COUNTERS: (parent, counter field, child, child FK, conditions)
+COUNTERS = [
+    ('Batch', 'total_activities', 'Activity', 'batch', {}),
+    ('Activity', 'total_cards', 'Card', 'activity', {}),
+    ('Activity', 'total_polling_cards', 'Card', 'activity', {'type': 'POLL'}),
+    ('Card', 'total_questions', 'Question', 'card', {}),
+]
+
+
+def repair_counters(apps, schema_editor):
+    # The signal handlers keep the counters with F() deltas from here on, so
+    # hand-set values have to be recounted first
+    for parent, field, child, fk, conditions in COUNTERS:
+        children = apps.get_model('apis', child).objects.filter(
+            **{fk: models.OuterRef('pk')}, **conditions).order_by()
+        apps.get_model('apis', parent).objects.update(**{field: Coalesce(
+            models.Subquery(children.values(fk).annotate(count=models.Count('*')).values('count')),
+            models.Value(0))})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0009_pending_verification_emails'),
+    ]
+
+    operations = [
+        migrations.RunPython(repair_counters, migrations.RunPython.noop),
+    ]
@@ -29,6 +29,12 @@ class UserManager(BaseUserManager):
 
         return self.create_user(email, username, password, role=Role.ADMIN, **extra_fields)
 
+    def refresh_current_batch(self, user_id):
+        # Same pick as UserBatch.objects.filter(user=...).order_by('updated_at').first()
+        earliest = UserBatch.objects.filter(
+            user_id=user_id).order_by('updated_at', 'id').values('batch_id')[:1]
+        self.filter(pk=user_id).update(current_batch=models.Subquery(earliest))
+
 
 class Role(models.TextChoices):
     ADMIN = 'admin', _('Admin')
@@ -46,6 +52,14 @@ class User(AbstractBaseUser, PermissionsMixin):
         default=Role.USER)
     gender = models.CharField(max_length=10, blank=True, null=True)
     phoneNumber = models.PositiveBigIntegerField(null=True)
+    # Denormalized sign-in batch, kept in sync by the UserBatch signals
+    current_batch = models.ForeignKey(
+        'Batch',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        editable=False)
 
     is_active = models.BooleanField(default=True)
     is_verified = models.BooleanField(default=False)
@@ -59,6 +73,12 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    class Meta:
+        indexes = [
+            # Keyset pages of the list endpoint: order_by('-created_at', '-id')
+            models.Index(fields=['-created_at', '-id'], name='user_created_idx'),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -117,6 +137,12 @@ class UserBatch(models.Model):
 
     class Meta:
         unique_together = ['user', 'batch']
+        indexes = [
+            # Sign-in batch: filter(user=...).order_by('updated_at', 'id')
+            models.Index(fields=['user', 'updated_at', 'id'], name='userbatch_user_updated_idx'),
+            # Keyset pages of the list endpoint: order_by('-created_at', '-id')
+            models.Index(fields=['-created_at', '-id'], name='userbatch_created_idx'),
+        ]
 
     def __str__(self):
         return f"B = {self.batch.id} U = {self.user.id}"
@@ -131,7 +157,6 @@ class Activity(models.Model):
 
     total_cards = models.IntegerField(default=0, null=False)
     total_polling_cards = models.IntegerField(default=0, null=False)
-    # TODO: Write a Trigger coz polling cards are created in runtime
 
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
@@ -161,6 +186,21 @@ class Activity(models.Model):
         return f"{self.batch} {self.name} {self.sequence_no}"
 
 
+class ContentVersion(models.Model):
+    # Bumped whenever a card, question or option of the activity changes;
+    # keys its cached content tree (apis/content_cache.py). A row of its
+    # own, so saving an Activity can never write back a stale version.
+    activity = models.OneToOneField(
+        Activity,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="content_version")
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"A = {self.activity_id} V = {self.version}"
+
+
 class UserActivity(models.Model):
     activity = models.ForeignKey(
         Activity, on_delete=models.SET_NULL, null=True)
@@ -182,6 +222,14 @@ class UserActivity(models.Model):
                     'activity',
                     'user'],
                 name='unique_activity_user')]
+        indexes = [
+            # Latest activity of a user: filter(user=...).order_by('-updated_at')
+            models.Index(fields=['user', '-updated_at'], name='useractivity_user_updated_idx'),
+            # Completed activities of a user in a batch, joined on activity
+            models.Index(fields=['user', 'status', 'activity'], name='useractivity_user_status_idx'),
+            # Keyset pages of the list endpoint: order_by('-created_at', '-id')
+            models.Index(fields=['-created_at', '-id'], name='useractivity_created_idx'),
+        ]
 
     def str(self):
         return f"A = {self.activity.id} U = {self.user.id}"
@@ -250,6 +298,14 @@ class UserCard(models.Model):
                     'card',
                     'user'],
                 name='unique_card_user')]
+        indexes = [
+            # Latest card of a user: filter(user=...).order_by('-updated_at')
+            models.Index(fields=['user', '-updated_at'], name='usercard_user_updated_idx'),
+            # Completed cards of a user in an activity, joined on card
+            models.Index(fields=['user', 'status', 'card'], name='usercard_user_status_idx'),
+            # Keyset pages of the list endpoint: order_by('-created_at', '-id')
+            models.Index(fields=['-created_at', '-id'], name='usercard_created_idx'),
+        ]
 
     def str(self):
         return f"C = {self.card.id} U = {self.user.id}"
@@ -351,6 +407,10 @@ class Answer(models.Model):
                 name='unique_user_question_option_answer'
             )
         ]
+        indexes = [
+            # Keyset pages of the list endpoint: order_by('-created_at', '-id')
+            models.Index(fields=['-created_at', '-id'], name='answer_created_idx'),
+        ]
 
     def __str__(self) -> str:
         if self.answer:
@@ -362,3 +422,95 @@ class Answer(models.Model):
                 self.user.id} Q = {
                 self.question.id} O = {
                 self.option.id}"
+
+
+class PendingProgressUpdate(models.Model):
+    # Coalesced (user, card) progress rollups waiting for the drain_progress worker
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    card = models.ForeignKey(Card, on_delete=models.CASCADE)
+
+    queued_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=[
+                    'user',
+                    'card'],
+                name='unique_pending_progress_user_card')]
+
+    def __str__(self) -> str:
+        return f"C = {self.card_id} U = {self.user_id}"
+
+
+class JobStatus(models.TextChoices):
+    QUEUED = "QUEUED", "Queued"
+    SENDING = "SENDING", "Sending"
+    COMPLETED = "COMPLETED", "Completed"
+    FAILED = "FAILED", "Failed"
+
+
+class RegistrationJob(models.Model):
+    # One CSV upload; tracks the delivery of its verification emails
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        related_name="registration_jobs",
+        null=True)
+    status = models.CharField(
+        max_length=20,
+        choices=JobStatus.choices,
+        default=JobStatus.QUEUED)
+
+    # Host the verification links point at
+    domain = models.CharField(max_length=255, blank=True, default='')
+
+    total_users = models.IntegerField(default=0)
+    emails_sent = models.IntegerField(default=0)
+    emails_failed = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.id}. {self.status} {self.emails_sent}/{self.total_users}"
+
+
+class PendingVerificationEmail(models.Model):
+    # Verification email of a RegistrationJob not yet handed to the mail
+    # server; deleted once sent, so an interrupted job can be resumed
+    job = models.ForeignKey(
+        RegistrationJob,
+        on_delete=models.CASCADE,
+        related_name="pending_emails")
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=[
+                    'job',
+                    'user'],
+                name='unique_pending_email_job_user')]
+
+    def __str__(self) -> str:
+        return f"J = {self.job_id} U = {self.user_id}"
+
+
+class PollTally(models.Model):
+    # Running vote count of a POLL card option, fed by apis/polls.py
+    card = models.ForeignKey(
+        Card,
+        on_delete=models.CASCADE,
+        related_name="poll_tallies")
+    option = models.OneToOneField(
+        Option,
+        on_delete=models.CASCADE,
+        related_name="poll_tally")
+    votes = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"C = {self.card_id} O = {self.option_id} V = {self.votes}"
@@ -0,0 +1,97 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class CreatedAtCursorPagination(BasePagination):
+    """
+    Keyset pagination over (created_at, id), newest first.
+
+    Rows with a created_at are read first, then those without one (by id),
+    so each part is a plain range over a (created_at DESC, id DESC) index
+    and a deep page costs no more than the first, unlike OFFSET based
+    pagination.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_page_size(self, request):
+        page_size = api_settings.PAGE_SIZE or 100
+        value = request.query_params.get(self.page_size_query_param)
+        if value is not None:
+            try:
+                page_size = int(value)
+            except ValueError:
+                raise ParseError(f"Invalid {self.page_size_query_param}")
+            if page_size < 1:
+                raise ParseError(f"Invalid {self.page_size_query_param}")
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk = urlsafe_b64decode(encoded.encode()).decode().rsplit('|', 1)
+            pk = int(pk)
+            # An empty timestamp marks a row without created_at
+            if not created_at:
+                return None, pk
+            created_at = parse_datetime(created_at)
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise ParseError('Invalid cursor')
+        if created_at is None:
+            raise ParseError('Invalid cursor')
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at)
+        return created_at, pk
+
+    def encode_cursor(self, instance):
+        created_at = instance.created_at.isoformat() if instance.created_at else ''
+        return urlsafe_b64encode(f'{created_at}|{instance.pk}'.encode()).decode()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        # Fetch one extra row to learn whether there is a next page
+        page = []
+        if position is None or position[0] is not None:
+            dated = queryset.filter(created_at__isnull=False).order_by('-created_at', '-id')
+            if position is not None:
+                created_at, pk = position
+                # The created_at bound alone is the index range; the rest
+                # only trims rows of the boundary timestamp
+                dated = dated.filter(
+                    Q(created_at__lt=created_at) | Q(id__lt=pk), created_at__lte=created_at)
+            page = list(dated[:page_size + 1])
+        if len(page) <= page_size:
+            undated = queryset.filter(created_at__isnull=True).order_by('-id')
+            if position is not None and position[0] is None:
+                undated = undated.filter(id__lt=position[1])
+            page += list(undated[:page_size + 1 - len(page)])
+
+        self.next_cursor = self.encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+        return page[:page_size]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
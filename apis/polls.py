@@ -0,0 +1,150 @@
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Answer, CardType, Option, PollTally
+
+logger = logging.getLogger('apis')
+
+# Votes recorded by this process and not yet written to PollTally, by option,
+# with the card of every option that may need its tally row created
+_pending = Counter()
+_cards = {}
+_lock = threading.Lock()
+_timer = None
+
+
+def record_poll_votes(card, option_ids, delta=1):
+    """
+    Count votes for options of `card` once the current transaction commits.
+    Nothing is recorded unless it is a POLL card, read from the card the
+    caller already has. A vote taken back may pass card=None: it only moves
+    an existing tally, and options outside POLL cards have none.
+
+    Votes are buffered in memory and written as one F() increment per option
+    every POLL_TALLY_FLUSH_INTERVAL seconds, instead of one write per answer
+    on the option's hot row; with an interval of 0 they are written on commit.
+    """
+    if card is not None and card.type != CardType.POLL:
+        return
+    card_id = card.id if card is not None else None
+    option_ids = [option_id for option_id in option_ids if option_id is not None]
+    if option_ids:
+        transaction.on_commit(lambda: _count_votes(card_id, option_ids, delta))
+
+
+def _count_votes(card_id, option_ids, delta):
+    global _timer
+    interval = settings.POLL_TALLY_FLUSH_INTERVAL
+    if not interval:
+        now = timezone.now()
+        for option_id in option_ids:
+            _increment(option_id, card_id, delta, now)
+        return
+    with _lock:
+        for option_id in option_ids:
+            _pending[option_id] += delta
+            if card_id is not None:
+                _cards[option_id] = card_id
+        if _timer is None:
+            _timer = threading.Timer(interval, _flush_in_background)
+            _timer.daemon = True
+            _timer.start()
+
+
+def _flush_in_background():
+    global _timer
+    with _lock:
+        _timer = None
+    try:
+        flush_poll_votes()
+    finally:
+        connection.close()
+
+
+def flush_poll_votes():
+    """
+    Write the buffered votes to PollTally. Returns the number of options updated.
+    """
+    with _lock:
+        pending = {option_id: delta for option_id, delta in _pending.items() if delta}
+        cards = dict(_cards)
+        _pending.clear()
+        _cards.clear()
+    if not pending:
+        return 0
+
+    written = len(pending)
+    try:
+        now = timezone.now()
+        for option_id, delta in list(pending.items()):
+            _increment(option_id, cards.get(option_id), delta, now)
+            del pending[option_id]
+    except Exception as e:
+        logger.error(f"Flushing poll votes failed: {e}")
+        # Keep what was not written for the next flush
+        with _lock:
+            _pending.update(pending)
+            for option_id in pending:
+                if option_id in cards:
+                    _cards.setdefault(option_id, cards[option_id])
+        return 0
+    return written
+
+
+def _increment(option_id, card_id, delta, now):
+    tallies = PollTally.objects.filter(option_id=option_id)
+    if tallies.update(votes=F('votes') + delta, updated_at=now):
+        return
+    if card_id is None or delta <= 0:
+        # Not a poll option, or nothing counted to take back
+        return
+    try:
+        with transaction.atomic():
+            PollTally.objects.create(option_id=option_id, card_id=card_id, votes=delta)
+    except IntegrityError:
+        # Another process created it first
+        tallies.update(votes=F('votes') + delta, updated_at=now)
+
+
+def poll_results(card_id):
+    """
+    Current tallies of a POLL card, every option included:
+    {'card_id', 'total_votes', 'questions': [{'question_id', 'options': [...]}]}
+    """
+    votes = dict(PollTally.objects.filter(card_id=card_id).values_list('option_id', 'votes'))
+    questions = {}
+    for option_id, question_id, value in Option.objects.filter(
+            question__card_id=card_id).order_by(
+            'question__sequence_no', 'sequence_no').values_list('id', 'question_id', 'value'):
+        questions.setdefault(question_id, []).append({
+            'option_id': option_id,
+            'value': value,
+            'votes': votes.get(option_id, 0)})
+
+    return {
+        'card_id': card_id,
+        'total_votes': sum(votes.values()),
+        'questions': [
+            {'question_id': question_id, 'options': options}
+            for question_id, options in questions.items()],
+    }
+
+
+def rebuild_poll_tallies(card_id):
+    """
+    Recount a POLL card's tallies from its answers, e.g. after a restart lost
+    buffered votes.
+    """
+    counts = Answer.objects.filter(
+        option__question__card_id=card_id).values('option_id').annotate(votes=Count('*'))
+    with transaction.atomic():
+        PollTally.objects.filter(card_id=card_id).delete()
+        PollTally.objects.bulk_create([
+            PollTally(card_id=card_id, option_id=row['option_id'], votes=row['votes'])
+            for row in counts])
@@ -0,0 +1,218 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    Answer, Card, Question, UserCard, UserActivity, UserBatch, Status,
+    PendingProgressUpdate
+)
+from .metrics import track_progress_rollup
+
+logger = logging.getLogger('apis')
+
+
+def progress_status(completed, total):
+    if completed == 0:
+        return Status.NOT_ATTEMPTED
+    elif completed < total:
+        return Status.IN_PROGRESS
+    return Status.COMPLETED
+
+
+def _count_subquery(queryset, group_by, count=Count('*')):
+    # Correlated COUNT that evaluates to 0 instead of NULL for empty groups
+    counted = queryset.values(group_by).annotate(total=count).values('total')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def _upsert(model, unique_fields, values, update_fields):
+    # Single INSERT ... ON CONFLICT DO UPDATE instead of get_or_create + save.
+    # updated_at is left out of update_fields on purpose: the old cascade
+    # saved with update_fields as well, so rollups never touched it.
+    model.objects.bulk_create(
+        [model(**values)],
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=update_fields)
+
+
+@track_progress_rollup()
+def recompute_user_progress(user_id, card_id):
+    """
+    Recompute UserCard, UserActivity and UserBatch for a (user, card) pair.
+
+    Issues a fixed number of queries (at most six) no matter how many
+    questions, cards or activities are involved, and yields the same
+    statuses as the previous get_or_create/save cascade.
+    """
+    required_questions = Question.objects.filter(
+        card=OuterRef('pk'), is_required=True)
+    answered_questions = Answer.objects.filter(
+        user_id=user_id, question__card=OuterRef('pk'), question__is_required=True)
+
+    card = Card.objects.select_related('activity__batch').annotate(
+        required_questions=_count_subquery(required_questions, 'card'),
+        completed_questions=_count_subquery(
+            answered_questions, 'user', Count('question', distinct=True)),
+    ).get(pk=card_id)
+
+    card_status = progress_status(
+        card.completed_questions, card.required_questions)
+    _upsert(
+        UserCard,
+        unique_fields=['card', 'user'],
+        values={
+            'user_id': user_id,
+            'card_id': card.id,
+            'completed_questions': card.completed_questions,
+            'status': card_status},
+        update_fields=['completed_questions', 'status'])
+
+    activity = card.activity
+    if activity is None:
+        logger.info(f"UserCard updated: {card_status}, {card.completed_questions}")
+        return
+
+    completed_cards = UserCard.objects.filter(
+        user_id=user_id,
+        card__activity_id=activity.id,
+        status=Status.COMPLETED).count()
+    activity_status = progress_status(completed_cards, activity.total_cards)
+    _upsert(
+        UserActivity,
+        unique_fields=['activity', 'user'],
+        values={
+            'user_id': user_id,
+            'activity_id': activity.id,
+            'completed_cards': completed_cards,
+            'status': activity_status},
+        update_fields=['completed_cards', 'status'])
+
+    batch = activity.batch
+    if batch is None:
+        logger.info(f"UserActivity updated: {activity_status}, {completed_cards}")
+        return
+
+    completed_activities = UserActivity.objects.filter(
+        user_id=user_id,
+        activity__batch_id=batch.id,
+        status=Status.COMPLETED).count()
+    batch_status = progress_status(completed_activities, batch.total_activities)
+    is_completed = batch_status == Status.COMPLETED
+
+    batch_fields = ['completed_activities', 'status']
+    if is_completed:
+        # Like the cascade, a batch is only ever flagged completed, never unflagged
+        batch_fields.append('is_completed')
+    _upsert(
+        UserBatch,
+        unique_fields=['user', 'batch'],
+        values={
+            'user_id': user_id,
+            'batch_id': batch.id,
+            'completed_activities': completed_activities,
+            'status': batch_status,
+            'is_completed': is_completed},
+        update_fields=batch_fields)
+
+    logger.info(
+        f"Progress updated: card {card_status} ({card.completed_questions}), "
+        f"activity {activity_status} ({completed_cards}), "
+        f"batch {batch_status} ({completed_activities})")
+
+
+class _PendingProgress:
+    """
+    The (user, card) keys scheduled by one transaction. Every key gets its own
+    on_commit callback, so a rolled back savepoint drops its keys along with
+    its callbacks. The callbacks that do run roll each key up once.
+    """
+
+    def __init__(self):
+        self.keys = set()
+        self.done = set()
+        # Set once a callback has run: the transaction is over
+        self.closed = False
+
+    def run(self, keys):
+        self.closed = True
+        keys = [key for key in keys if key not in self.done]
+        self.done.update(keys)
+        if not keys:
+            return
+
+        if getattr(settings, 'PROGRESS_ROLLUP_MODE', 'inline') == 'deferred':
+            enqueue_progress_updates(keys)
+            return
+
+        for user_id, card_id in keys:
+            try:
+                recompute_user_progress(user_id, card_id)
+            except Exception as e:
+                logger.error(f"Progress rollup failed for user {user_id} card {card_id}: {e}")
+
+
+_local = threading.local()
+
+
+def schedule_progress_update(user_id, card_id):
+    """
+    Mark a (user, card) pair dirty and roll it up once the transaction commits.
+
+    Any number of answers saved in the same transaction for the same card
+    results in a single recompute. Outside of an atomic block the commit
+    happens immediately, so this degrades to the old per-save behaviour.
+    """
+    pending = getattr(_local, 'pending', None)
+    # A transaction that rolled back as a whole never closes its set; its
+    # callbacks are gone, so the next transaction can carry on with it
+    if pending is None or pending.closed:
+        pending = _local.pending = _PendingProgress()
+    key = (user_id, card_id)
+    pending.keys.add(key)
+    transaction.on_commit(lambda: pending.run([key]))
+
+
+def flush_progress_updates():
+    """
+    Run the rollups collected so far without waiting for the commit.
+    """
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        pending.run(pending.keys)
+
+
+def enqueue_progress_updates(keys):
+    # Re-queuing an already pending pair only bumps queued_at, which tells
+    # the drain worker that the pair changed while it was being processed.
+    now = timezone.now()
+    PendingProgressUpdate.objects.bulk_create(
+        [PendingProgressUpdate(user_id=user_id, card_id=card_id, queued_at=now)
+         for user_id, card_id in keys],
+        update_conflicts=True,
+        unique_fields=['user', 'card'],
+        update_fields=['queued_at'])
+
+
+def drain_progress_updates(limit=500):
+    """
+    Recompute up to `limit` queued (user, card) pairs and return how many ran.
+    """
+    pending = list(
+        PendingProgressUpdate.objects.order_by('queued_at')[:limit])
+    for update in pending:
+        try:
+            recompute_user_progress(update.user_id, update.card_id)
+        except Exception as e:
+            logger.error(
+                f"Progress rollup failed for user {update.user_id} card {update.card_id}: {e}")
+            continue
+        # Leave the row alone if it was re-queued while we were recomputing
+        PendingProgressUpdate.objects.filter(
+            pk=update.pk, queued_at=update.queued_at).delete()
+    return len(pending)
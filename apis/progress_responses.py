@@ -0,0 +1,93 @@
+"""
+Response bodies of the progress endpoints, shared by the sync views in
+views.py and their async counterparts in async_views.py. Everything here
+works on rows that are already loaded and never touches the database.
+"""
+from .serializers import (
+    ActivitySerializer, UserActivitySerializer, UserCardSerializer, AnswerSerializer
+)
+
+
+def activity_progress_data(activities):
+    """
+    Body of UserActivityProgressList, from a batch's activities carrying the
+    user's UserActivity rows in `user_progress`. None when there is nothing
+    to point the user at.
+    """
+    user_activities = [
+        user_activity for activity in activities for user_activity in activity.user_progress]
+    # Same picks as order_by('-updated_at') / order_by('created_at'),
+    # with NULL timestamps sorting last
+    latest_user_activity = max(
+        user_activities,
+        key=lambda ua: (ua.updated_at is not None, ua.updated_at or 0),
+        default=None)
+    first_activity = min(
+        activities,
+        key=lambda a: (a.created_at is None, a.created_at or 0),
+        default=None)
+
+    last_activity_id = latest_user_activity.activity_id if latest_user_activity else (
+        first_activity.id if first_activity else None)
+
+    if not last_activity_id:
+        return None
+
+    response_data = {
+        'current_activity_id': last_activity_id,
+        'activities': []
+    }
+
+    for activity in activities:
+        serialized_activity = ActivitySerializer(activity).data
+
+        if activity.user_progress:
+            serialized_user_activity = UserActivitySerializer(
+                activity.user_progress[0]).data
+            serialized_activity['user_activity_progress'] = serialized_user_activity
+
+        response_data['activities'].append(serialized_activity)
+
+    return response_data
+
+
+def card_progress_data(latest_user_card_id, content_tree, user_cards, answers):
+    """
+    Body of UserCardQuestionProgress: the cached content tree of an activity
+    overlaid with the user's UserCards and Answers. None when the activity
+    has no card to point the user at.
+    """
+    last_card_id = latest_user_card_id or content_tree['first_card_id']
+    if not last_card_id:
+        return None
+
+    user_cards = {user_card.card_id: user_card for user_card in user_cards}
+    user_answers = {}
+    for answer in answers:
+        user_answers.setdefault(answer.question_id, []).append(answer)
+
+    response_data = {
+        'recent_card_id': last_card_id,
+        'cards': []
+    }
+
+    for tree_card in content_tree['cards']:
+        serialized_card = dict(tree_card['card'])
+
+        user_card = user_cards.get(serialized_card['id'])
+        if user_card:
+            serialized_user_card = UserCardSerializer(user_card).data
+            serialized_card['user_card_progress'] = serialized_user_card
+
+        serialized_questions = []
+        for tree_question in tree_card['questions']:
+            serialized_question = dict(tree_question)
+            serialized_answers = AnswerSerializer(
+                user_answers.get(tree_question['id'], []), many=True).data
+            serialized_question['answers'] = serialized_answers
+            serialized_questions.append(serialized_question)
+
+        serialized_card['questions'] = serialized_questions
+        response_data['cards'].append(serialized_card)
+
+    return response_data
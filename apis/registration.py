@@ -0,0 +1,264 @@
+import csv
+import io
+import logging
+from datetime import datetime, timedelta
+
+import jwt
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.mail import EmailMessage
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .mail import dispatch_messages
+from .models import User, Role, RegistrationJob, JobStatus, PendingVerificationEmail
+
+logger = logging.getLogger('apis')
+
+CSV_COLUMNS = ['email', 'username', 'name', 'role', 'gender', 'phoneNumber']
+
+def parse_registration_csv(data):
+    """
+    Parse and validate every row of an uploaded CSV before anything is written.
+
+    Returns (rows, errors); rows are dicts of User field values.
+    """
+    reader = csv.reader(io.StringIO(data), delimiter=',')
+    next(reader)  # header
+
+    rows = []
+    errors = []
+    seen_emails = set()
+    seen_usernames = set()
+    roles = set(Role.values)
+
+    for line_no, row in enumerate(reader, start=2):
+        if not any(row):
+            continue
+        if len(row) != len(CSV_COLUMNS):
+            errors.append(f'Row {line_no}: expected {len(CSV_COLUMNS)} columns, got {len(row)}')
+            continue
+
+        email, username, name, role, gender, phone_number = (value.strip() for value in row)
+        email = User.objects.normalize_email(email)
+        role = role or Role.USER
+
+        try:
+            validate_email(email)
+        except ValidationError:
+            errors.append(f'Row {line_no}: invalid email {email!r}')
+            continue
+        if not username:
+            errors.append(f'Row {line_no}: username is required')
+            continue
+        if len(name) > User._meta.get_field('name').max_length:
+            errors.append(f'Row {line_no}: name is too long')
+            continue
+        if role not in roles:
+            errors.append(f'Row {line_no}: unknown role {role!r}')
+            continue
+        if phone_number and not phone_number.isdigit():
+            errors.append(f'Row {line_no}: invalid phone number {phone_number!r}')
+            continue
+        if email in seen_emails or username in seen_usernames:
+            errors.append(f'Row {line_no}: duplicate email or username in file')
+            continue
+
+        seen_emails.add(email)
+        seen_usernames.add(username)
+        rows.append({
+            'email': email,
+            'username': username,
+            'name': name,
+            'role': role,
+            'gender': gender,
+            'phoneNumber': int(phone_number) if phone_number else None,
+        })
+
+    return rows, errors
+
+
+def find_existing_accounts(rows):
+    """
+    Report rows clashing with existing accounts, using a single query.
+    """
+    emails = [row['email'] for row in rows]
+    usernames = [row['username'] for row in rows]
+    taken = User.objects.filter(
+        Q(email__in=emails) | Q(username__in=usernames)).values_list('email', 'username')
+
+    taken_emails = {email for email, _ in taken}
+    taken_usernames = {username for _, username in taken}
+    errors = []
+    for row in rows:
+        if row['email'] in taken_emails:
+            errors.append(f"User with email {row['email']} already exists")
+        elif row['username'] in taken_usernames:
+            errors.append(f"User with username {row['username']} already exists")
+    return errors
+
+
+def create_users(rows):
+    # No hashing on the import path: accounts start with an unusable
+    # password and their owners choose one through the verification link
+    users = [
+        User(password=make_password(None), is_verified=False, **row)
+        for row in rows]
+    return User.objects.bulk_create(users)
+
+
+def _password_fingerprint(user):
+    # Changes whenever the password does, which spends the token
+    return salted_hmac('apis.verification-token', user.password).hexdigest()
+
+
+def make_verification_token(user):
+    token_payload = {
+        'user_id': user.id,
+        'email': user.email,
+        'pwd': _password_fingerprint(user),
+        'exp': datetime.now() + timedelta(hours=24)  # Token valid for 24 hours
+    }
+    return jwt.encode(token_payload, settings.SECRET_KEY, algorithm='HS256')
+
+
+def read_verification_token(token):
+    """
+    Return the user of a verification token.
+
+    Raises jwt.InvalidTokenError (or its ExpiredSignatureError subclass) for
+    bad, expired or already used tokens and User.DoesNotExist.
+    """
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+    user = User.objects.get(id=payload['user_id'])
+    if not constant_time_compare(payload.get('pwd', ''), _password_fingerprint(user)):
+        raise jwt.InvalidTokenError('Verification link has already been used')
+    return user
+
+
+def verification_message(user, domain):
+    verification_url = f"http://{domain}/apis/verify/{make_verification_token(user)}/"
+    message = f'Please click the following link to verify your account: {verification_url}'
+    return EmailMessage(
+        'Activate your account',
+        message,
+        settings.DEFAULT_FROM_EMAIL,
+        [user.email],
+    )
+
+
+def _claim(jobs):
+    # Only one sender gets to move a job to SENDING
+    return jobs.update(status=JobStatus.SENDING, updated_at=timezone.now()) == 1
+
+
+def _deliver(job_id):
+    """
+    Send the job's pending emails, deleting each batch's rows together with
+    the progress it adds, so an interrupted job resumes where it stopped.
+    """
+    job = RegistrationJob.objects.get(pk=job_id)
+    pending = PendingVerificationEmail.objects.filter(job_id=job_id).select_related(
+        'user').only('id', 'user__id', 'user__email', 'user__password').order_by('id')
+    errors = list(job.errors)
+    in_flight = []
+
+    def messages():
+        # Paged by id, so memory stays flat however large the job is
+        last_id = 0
+        while rows := list(pending.filter(id__gt=last_id)[:settings.EMAIL_BATCH_SIZE]):
+            for row in rows:
+                in_flight.append(row.id)
+                yield verification_message(row.user, job.domain)
+            last_id = rows[-1].id
+
+    def record_batch(sent, failures):
+        errors.extend(f'{message.to[0]}: {error}' for message, error in failures)
+        with transaction.atomic():
+            PendingVerificationEmail.objects.filter(id__in=in_flight).delete()
+            RegistrationJob.objects.filter(pk=job_id).update(
+                emails_sent=F('emails_sent') + sent,
+                emails_failed=F('emails_failed') + len(failures),
+                errors=errors,
+                updated_at=timezone.now())
+        in_flight.clear()
+
+    try:
+        dispatch_messages(messages(), on_batch=record_batch)
+        RegistrationJob.objects.filter(pk=job_id).update(
+            status=JobStatus.COMPLETED, errors=errors, updated_at=timezone.now())
+    except Exception as e:
+        logger.error(f"Registration job {job_id} failed: {e}")
+        RegistrationJob.objects.filter(pk=job_id).update(
+            status=JobStatus.FAILED, errors=errors + [str(e)], updated_at=timezone.now())
+
+
+def send_verification_emails(job_id):
+    """
+    Deliver the verification emails of a queued registration job.
+    """
+    if _claim(RegistrationJob.objects.filter(pk=job_id, status=JobStatus.QUEUED)):
+        _deliver(job_id)
+
+
+def drain_registration_jobs(limit=10):
+    """
+    Deliver queued jobs, and resume SENDING jobs whose sender has made no
+    progress for REGISTRATION_JOB_STALE_SECONDS (a restarted worker or a
+    frozen serverless instance). Returns how many jobs ran.
+    """
+    stale = timezone.now() - timedelta(seconds=settings.REGISTRATION_JOB_STALE_SECONDS)
+    claimable = Q(status=JobStatus.QUEUED) | Q(status=JobStatus.SENDING, updated_at__lt=stale)
+    job_ids = RegistrationJob.objects.filter(
+        claimable, pk__in=PendingVerificationEmail.objects.values('job_id')).order_by(
+        'id').values_list('id', flat=True)[:limit]
+
+    ran = 0
+    for job_id in job_ids:
+        if _claim(RegistrationJob.objects.filter(claimable, pk=job_id)):
+            _deliver(job_id)
+            ran += 1
+    return ran
+
+
+def queue_verification_emails(job, users):
+    """
+    Persist one pending email per user, in the job's transaction.
+
+    By default (REGISTRATION_EMAIL_MODE=deferred) they are left to
+    `python manage.py drain_registration_emails`; 'inline', meant for
+    development, sends them once the users are committed, before the upload
+    request returns.
+    """
+    PendingVerificationEmail.objects.bulk_create(
+        [PendingVerificationEmail(job=job, user=user) for user in users])
+    if settings.REGISTRATION_EMAIL_MODE == 'inline':
+        transaction.on_commit(lambda: send_verification_emails(job.id))
+
+
+def register_users(data, created_by, domain):
+    """
+    Validate a whole CSV upload, create its users in bulk and queue their emails.
+
+    Users start without a usable password and set one through the link.
+
+    Returns (job, errors); nothing is written when errors is non-empty.
+    """
+    rows, errors = parse_registration_csv(data)
+    if not errors:
+        errors = find_existing_accounts(rows)
+    if errors:
+        return None, errors
+    if not rows:
+        return None, ['The CSV file has no users']
+
+    with transaction.atomic():
+        users = create_users(rows)
+        job = RegistrationJob.objects.create(
+            created_by=created_by, total_users=len(users), domain=domain)
+        queue_verification_emails(job, users)
+    return job, []
@@ -0,0 +1,76 @@
+"""
+The OpenAPI document, generated once instead of on every Swagger hit.
+
+`manage.py generate_openapi_schema` (run by build.sh) writes it to
+OPENAPI_SCHEMA_DIR; without that artifact it is generated on first request
+and kept in memory. Either way it is served with an ETag. drf_yasg is only
+imported to generate it; with API_DOCS off only the artifact is served.
+"""
+import hashlib
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+from .docs import apply_deferred_schemas
+
+# (drf_yasg.codecs class, content type)
+SCHEMA_FORMATS = {
+    '.json': ('OpenAPICodecJson', 'application/json'),
+    '.yaml': ('OpenAPICodecYaml', 'application/yaml'),
+}
+
+_schemas = {}
+_lock = threading.Lock()
+
+
+def api_info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title="ProLeap API",
+        default_version='v1',
+        description="Test description",
+        terms_of_service="https://www.google.com/policies/terms/",
+        contact=openapi.Contact(email="proleap.ewhiz@gmail.com"),
+        license=openapi.License(name="BSD License"),
+    )
+
+
+def generate_schema(format='.json'):
+    """
+    The public schema of every endpoint, encoded as `format`. Without a
+    request there is no host, so clients resolve paths against the docs' origin.
+    """
+    from drf_yasg import codecs
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    apply_deferred_schemas()
+    codec, _ = SCHEMA_FORMATS[format]
+    schema = OpenAPISchemaGenerator(api_info()).get_schema(request=None, public=True)
+    return getattr(codecs, codec)(validators=[]).encode(schema)
+
+
+def schema_path(format):
+    return Path(settings.OPENAPI_SCHEMA_DIR) / f'openapi{format}'
+
+
+def get_schema(format='.json'):
+    """
+    (body, etag) of the schema: the build artifact if there is one, else
+    generated on first use. Kept for the life of the process. None when
+    there is no artifact and API_DOCS is off.
+    """
+    if format not in _schemas:
+        with _lock:
+            if format not in _schemas:
+                path = schema_path(format)
+                if path.exists():
+                    body = path.read_bytes()
+                elif settings.API_DOCS:
+                    body = generate_schema(format)
+                else:
+                    return None
+                _schemas[format] = (body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+    return _schemas[format]
+
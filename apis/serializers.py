@@ -1,6 +1,7 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from django.contrib.auth import authenticate
+from django.db import transaction
 from django.core.exceptions import ObjectDoesNotExist
 from rest_framework.exceptions import ValidationError
 
@@ -8,8 +9,11 @@ from .models import (
     User, Batch, UserBatch, Status,
     Activity, UserActivity,
     Card, UserCard,
-    Question, Option, Answer
+    Question, Option, Answer, RegistrationJob
 )
+from .progress import schedule_progress_update
+from .polls import record_poll_votes
+from .tokens import CachedBlacklistRefreshToken
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -28,6 +32,7 @@ class BatchSerializer(serializers.ModelSerializer):
     class Meta:
         model = Batch
         fields = '__all__'
+        read_only_fields = ['total_activities']
 
 
 class UserBatchSerializer(serializers.ModelSerializer):
@@ -90,7 +95,9 @@ class ActivitySerializer(serializers.ModelSerializer):
                   'total_cards', 'total_polling_cards',
                   'created_at', 'updated_at', 'batch', 'sequence_no',
                   ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        # Counters are maintained by signals (see apis/counters.py)
+        read_only_fields = ['id', 'total_cards', 'total_polling_cards',
+                            'created_at', 'updated_at']
 
 
 class UserActivitySerializer(serializers.ModelSerializer):
@@ -159,7 +166,7 @@ class CardSerializer(serializers.ModelSerializer):
             'activity',
             'sequence_no',
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'total_questions', 'created_at', 'updated_at']
 
 
 class UserCardSerializer(serializers.ModelSerializer):
@@ -257,6 +264,8 @@ class AnswerSerializer(serializers.ModelSerializer):
             'created_at',
             'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
+        # With its card, which the poll tally signal reads
+        extra_kwargs = {'question': {'queryset': Question.objects.select_related('card')}}
 
     def create(self, validated_data):
         options = validated_data.pop('options', None)
@@ -267,12 +276,14 @@ class AnswerSerializer(serializers.ModelSerializer):
 
         if (options):
             answer_instances = []
-            for option_id in options:
-                option = Option.objects.get(id=option_id)
-                answer_instance = Answer.objects.create(
-                    user=user, question=question, option=option, answer=answer_text
-                )    # TODO: Check if the option belongs to the question
-                answer_instances.append(answer_instance)    
+            # One transaction so the progress rollup runs once, not per option
+            with transaction.atomic():
+                for option_id in options:
+                    option = Option.objects.get(id=option_id)
+                    answer_instance = Answer.objects.create(
+                        user=user, question=question, option=option, answer=answer_text
+                    )    # TODO: Check if the option belongs to the question
+                    answer_instances.append(answer_instance)
             return answer_instances
         else:
             answer = Answer.objects.create(
@@ -295,3 +306,74 @@ class AnswerSerializer(serializers.ModelSerializer):
                 self.user.id} Q = {
                 self.question.id} O = {
                 self.option.id}"
+
+
+class CardAnswerItemSerializer(serializers.Serializer):
+    question = serializers.IntegerField()
+    answer = serializers.CharField(
+        max_length=500, required=False, allow_null=True, allow_blank=True)
+    options = serializers.ListField(
+        child=serializers.IntegerField(), required=False)
+
+
+class CardAnswerSubmissionSerializer(serializers.Serializer):
+    """
+    Answers for every question of one card, submitted in a single request.
+
+    Expects `card` and `user` in the serializer context.
+    """
+    answers = CardAnswerItemSerializer(many=True, allow_empty=False)
+
+    def validate_answers(self, answers):
+        card = self.context['card']
+
+        question_ids = {item['question'] for item in answers}
+        card_question_ids = set(Question.objects.filter(
+            card=card, id__in=question_ids).values_list('id', flat=True))
+        foreign_questions = question_ids - card_question_ids
+        if foreign_questions:
+            raise ValidationError(
+                f"Questions {sorted(foreign_questions)} do not belong to card {card.id}")
+
+        # Resolve every submitted option with one query and check it belongs
+        # to the question it was submitted for
+        option_ids = {
+            option_id for item in answers for option_id in item.get('options', [])}
+        option_questions = dict(Option.objects.filter(
+            id__in=option_ids).values_list('id', 'question_id'))
+        for item in answers:
+            for option_id in item.get('options', []):
+                if option_questions.get(option_id) != item['question']:
+                    raise ValidationError(
+                        f"Option {option_id} does not belong to question {item['question']}")
+        return answers
+
+    def create(self, validated_data):
+        user = self.context['user']
+        rows = []
+        for item in validated_data['answers']:
+            answer_text = item.get('answer')
+            options = item.get('options') or [None]
+            for option_id in options:
+                rows.append(Answer(
+                    user=user,
+                    question_id=item['question'],
+                    option_id=option_id,
+                    answer=answer_text))
+
+        with transaction.atomic():
+            answers = Answer.objects.bulk_create(rows)
+            # bulk_create skips post_save, so roll progress up for the card once
+            schedule_progress_update(user.id, self.context['card'].id)
+            record_poll_votes(self.context['card'], [answer.option_id for answer in answers])
+        return answers
+
+
+class RegistrationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RegistrationJob
+        fields = '__all__'
+
+
+class CachedTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = CachedBlacklistRefreshToken
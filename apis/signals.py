@@ -1,98 +1,184 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.db import transaction
 from django.dispatch import receiver
-from django.db.utils import IntegrityError
-from django.core.exceptions import ObjectDoesNotExist
 import logging
+from contextlib import contextmanager
 
-from .models import Answer, Question, Card, Activity, UserCard, UserBatch, UserActivity, Status
+from .models import User, UserBatch, Answer, Activity, Card, Question, Option
+from .counters import counted_parents, adjust_counters
+from .progress import schedule_progress_update
+from .content_cache import invalidate_content_tree
+from .authentication import invalidate_cached_user
+from .polls import record_poll_votes
+from .metrics import timed_receiver
 
 logger = logging.getLogger('apis')
 
 @receiver(post_save, sender=Answer)
+@timed_receiver
 def update_user_progress(sender, instance, created, **kwargs):
+    if instance.user_id is None or instance.question_id is None:
+        return
+
     try:
-        question = instance.question
-        card = question.card
-        user = instance.user
-
-        # Fetch all questions in the card
-        questions_in_card = Question.objects.filter(card=card)
-        
-        # Fetch all required questions in the card
-        tot_rqd_questions = questions_in_card.filter(is_required=True)
-        required_question_ids = tot_rqd_questions.values_list('id', flat=True)
-
-        # Fetch all unique answers for the user and required questions in the card
-        user_answers = Answer.objects.filter(
-            user=user, question__in=required_question_ids
-        ).values('question').distinct()
-        completed_questions_count = user_answers.count()
-
-        logger.info(f"User completed_questions_count: {completed_questions_count}")
-
-        # Update the UserCard instance
-        user_card, created = UserCard.objects.get_or_create(user=user, card=card)
-        user_card.completed_questions = completed_questions_count
-
-        # Update the status in UserCard
-        if completed_questions_count == 0:
-            user_card.status = Status.NOT_ATTEMPTED
-        elif completed_questions_count < tot_rqd_questions.count():
-            user_card.status = Status.IN_PROGRESS
-        else:
-            user_card.status = Status.COMPLETED
-
-        user_card.save(update_fields=['completed_questions', 'status'])
-        logger.info(f"UserCard updated: {user_card.status}, {user_card.completed_questions}")
-
-        # Fetch all cards for the activity of the current card
-        cards_in_activity = Card.objects.filter(activity=card.activity)
-        card_ids = cards_in_activity.values_list('id', flat=True)
-        user_cards_in_activity = UserCard.objects.filter(user=user, card__in=card_ids)
-        completed_cards_count = user_cards_in_activity.filter(status=Status.COMPLETED).count()
-
-        # Update the UserActivity instance
-        user_activity, created = UserActivity.objects.get_or_create(user=user, activity=card.activity)
-        user_activity.completed_cards = completed_cards_count
-
-        if completed_cards_count == 0:
-            user_activity.status = Status.NOT_ATTEMPTED
-        elif completed_cards_count < card.activity.total_cards:
-            user_activity.status = Status.IN_PROGRESS
-        else:
-            user_activity.status = Status.COMPLETED
-
-        user_activity.save(update_fields=['completed_cards', 'status'])
-        logger.info(f"UserActivity updated: {user_activity.status}, {user_activity.completed_cards}")
-
-        # Fetch all activities for the batch of the current activity
-        activities_in_batch = Activity.objects.filter(batch=card.activity.batch)
-        activity_ids = activities_in_batch.values_list('id', flat=True)
-        user_activities_in_batch = UserActivity.objects.filter(user=user, activity__in=activity_ids)
-        completed_activities_count = user_activities_in_batch.filter(status=Status.COMPLETED).count()
-
-        # Update the UserBatch instance
-        user_batch, created = UserBatch.objects.get_or_create(user=user, batch=card.activity.batch)
-        user_batch.completed_activities = completed_activities_count
-
-        if completed_activities_count == 0:
-            user_batch.status = Status.NOT_ATTEMPTED
-        elif completed_activities_count < card.activity.batch.total_activities:
-            user_batch.status = Status.IN_PROGRESS
-        else:
-            user_batch.status = Status.COMPLETED
-            user_batch.is_completed = True
-
-        user_batch.save(update_fields=['completed_activities', 'status', 'is_completed'])
-        logger.info(f"UserBatch updated: {user_batch.status}, {user_batch.completed_activities}")
-
-    except UserCard.DoesNotExist:
-        logger.error(f"UserCard instance for user {user.id} and card {card.id} does not exist.")
-    except UserActivity.DoesNotExist:
-        logger.error(f"UserActivity instance for user {user.id} and activity {card.activity.id} does not exist.")
-    except UserBatch.DoesNotExist:
-        logger.error(f"UserBatch instance for user {user.id} and batch {card.activity.batch.id} does not exist.")
-    except IntegrityError as e:
-        logger.error(f"IntegrityError occurred: {e}")
+        card_id = instance.question.card_id
     except Exception as e:
         logger.error(f"An error occurred: {e}")
+        return
+
+    if card_id is not None:
+        # Coalesced per transaction, rolled up once on commit
+        schedule_progress_update(instance.user_id, card_id)
+
+
+@contextmanager
+def progress_updates_suspended():
+    """
+    Disconnect update_user_progress, e.g. while seeding answers together with
+    the progress they add up to.
+    """
+    post_save.disconnect(update_user_progress, sender=Answer)
+    try:
+        yield
+    finally:
+        post_save.connect(update_user_progress, sender=Answer)
+
+
+# Poll tallies follow the option of every answer written, deleted or changed
+@receiver(pre_save, sender=Answer)
+def remember_answer_option(sender, instance, **kwargs):
+    instance._previous_option_id = None
+    if not instance._state.adding and instance.pk is not None:
+        instance._previous_option_id = Answer.objects.filter(
+            pk=instance.pk).values_list('option_id', flat=True).first()
+
+
+def _loaded_card(answer):
+    """
+    The answer's card if its question and card are already loaded, else None.
+    """
+    question_field = Answer._meta.get_field('question')
+    if not question_field.is_cached(answer):
+        return None
+    question = answer.question
+    if question is None or not Question._meta.get_field('card').is_cached(question):
+        return None
+    return question.card
+
+
+@receiver(post_save, sender=Answer)
+@timed_receiver
+def count_poll_vote(sender, instance, **kwargs):
+    previous_option_id = getattr(instance, '_previous_option_id', None)
+    if previous_option_id != instance.option_id:
+        record_poll_votes(_loaded_card(instance), [previous_option_id], -1)
+        if instance.option_id is not None:
+            # update_user_progress has loaded the question; the answer
+            # serializers load its card along with it
+            record_poll_votes(instance.question.card, [instance.option_id])
+    instance._previous_option_id = instance.option_id
+
+
+@receiver(post_delete, sender=Answer)
+def uncount_poll_vote(sender, instance, **kwargs):
+    record_poll_votes(_loaded_card(instance), [instance.option_id], -1)
+
+
+@receiver(post_save, sender=UserBatch)
+@receiver(post_delete, sender=UserBatch)
+def update_current_batch(sender, instance, **kwargs):
+    if instance.user_id is not None:
+        User.objects.refresh_current_batch(instance.user_id)
+        _forget_cached_user(instance.user_id)
+
+
+def _forget_cached_user(user_id):
+    # Again on commit, in case a concurrent request cached the old row meanwhile
+    invalidate_cached_user(user_id)
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_authenticated_user(sender, instance, **kwargs):
+    _forget_cached_user(instance.pk)
+
+
+# total_activities / total_cards / total_polling_cards / total_questions are
+# maintained here with F() updates, so concurrent writers cannot lose counts.
+# Registered before the content cache receivers so a rebuilt tree never
+# sees the old counts under the new version.
+@receiver(pre_save, sender=Activity)
+@receiver(pre_save, sender=Card)
+@receiver(pre_save, sender=Question)
+def remember_counted_parents(sender, instance, **kwargs):
+    previous = None
+    if not instance._state.adding and instance.pk is not None:
+        previous = sender.objects.filter(pk=instance.pk).first()
+    instance._previous_counts = counted_parents(previous)
+
+
+@receiver(post_save, sender=Activity)
+@receiver(post_save, sender=Card)
+@receiver(post_save, sender=Question)
+def update_saved_counters(sender, instance, **kwargs):
+    adjust_counters(
+        getattr(instance, '_previous_counts', {}), counted_parents(instance))
+    instance._previous_counts = counted_parents(instance)
+
+
+@receiver(post_delete, sender=Activity)
+@receiver(post_delete, sender=Card)
+@receiver(post_delete, sender=Question)
+def update_deleted_counters(sender, instance, **kwargs):
+    adjust_counters(counted_parents(instance), {})
+
+
+# Content tree cache invalidation. Each content model knows how to find the
+# activity it belongs to; a save also invalidates the activity it was moved
+# away from.
+_CONTENT_ACTIVITY_LOOKUPS = {
+    Card: 'activity_id',
+    Question: 'card__activity_id',
+    Option: 'question__card__activity_id',
+}
+
+
+def _content_activity_id(model, pk):
+    return model.objects.filter(pk=pk).values_list(
+        _CONTENT_ACTIVITY_LOOKUPS[model], flat=True).first()
+
+
+@receiver(pre_save, sender=Card)
+@receiver(pre_save, sender=Question)
+@receiver(pre_save, sender=Option)
+def remember_content_activity(sender, instance, **kwargs):
+    instance._previous_activity_id = (
+        _content_activity_id(sender, instance.pk) if instance.pk else None)
+
+
+@receiver(post_save, sender=Card)
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Option)
+def invalidate_saved_content(sender, instance, **kwargs):
+    activity_id = _content_activity_id(sender, instance.pk)
+    invalidate_content_tree(activity_id)
+    previous_activity_id = getattr(instance, '_previous_activity_id', None)
+    if previous_activity_id != activity_id:
+        invalidate_content_tree(previous_activity_id)
+
+
+@receiver(post_delete, sender=Card)
+def invalidate_deleted_card(sender, instance, **kwargs):
+    invalidate_content_tree(instance.activity_id)
+
+
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Option)
+def invalidate_deleted_content(sender, instance, **kwargs):
+    # The row is gone, so resolve the activity through its parent
+    if sender is Question:
+        activity_id = _content_activity_id(Card, instance.card_id)
+    else:
+        activity_id = _content_activity_id(Question, instance.question_id)
+    invalidate_content_tree(activity_id)
@@ -1,4 +1,8 @@
-from drf_yasg import openapi
+from functools import lru_cache
+
+from rest_framework import serializers
+
+from .docs import openapi
 
 # Define the schema for the Answer model
 answer_schema = openapi.Schema(
@@ -128,3 +132,34 @@ batch_activity_response_schema = openapi.Schema(
         'current_activity_id': openapi.Schema(
             type=openapi.TYPE_INTEGER), 'activities': openapi.Schema(
                 type=openapi.TYPE_ARRAY, items=activity_schema), })
+
+
+# Query parameters shared by the paginated list endpoints
+def list_query_parameters(*filters):
+    parameters = [
+        openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="Opaque cursor taken from the `next` link of the previous page"),
+        openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description="Rows per page (default 100, max 1000)"),
+        openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="Comma separated list of fields to return"),
+        openapi.Parameter('updated_since', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          format=openapi.FORMAT_DATETIME,
+                          description="Only rows updated at or after this time"),
+    ]
+    for name in filters:
+        parameters.append(openapi.Parameter(
+            name, openapi.IN_QUERY,
+            type=openapi.TYPE_STRING if name == 'status' else openapi.TYPE_INTEGER,
+            description=f"Filter by {name}"))
+    return parameters
+
+
+# The page returned by the paginated list endpoints (apis/listing.py)
+@lru_cache(maxsize=None)
+def paginated_list_schema(serializer_class):
+    return type(f'Paginated{serializer_class.__name__}', (serializers.Serializer,), {
+        'next': serializers.URLField(
+            allow_null=True, help_text="Link to the next page, null on the last one"),
+        'results': serializer_class(many=True),
+    })
@@ -1,8 +1,49 @@
-from django.test import TestCase
-from .models import User, Role
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+import io
+import json
+import smtplib
+import tempfile
+import warnings
+from pathlib import Path
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.cache import cache
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends import locmem
+from django.core.files.uploadedfile import SimpleUploadedFile
+from prometheus_client import REGISTRY
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from .models import (
+    User, Role, Batch, UserBatch, Status,
+    Activity, ContentVersion, UserActivity,
+    Card, CardType, UserCard,
+    Question, Option, Answer, PendingProgressUpdate, PollTally, RegistrationJob, JobStatus
+)
+from .progress import recompute_user_progress, drain_progress_updates
+from .pagination import CreatedAtCursorPagination
+from .serializers import AnswerSerializer
+from .mail import dispatch_messages
+from .registration import drain_registration_jobs
+from . import docs, polls, schema
+from .benchmarks import find_regressions, run_benchmarks, seed_benchmark_data
+from .async_views import (
+    AsyncBatchUserListView, AsyncUserCardQuestionProgress, AsyncUserActivityProgressList
+)
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
 
 class UserTest(TestCase):
     
@@ -70,3 +111,1174 @@ class UserTest(TestCase):
     def test_string_representation(self):
         user = self.create_user()
         self.assertEqual(str(user), user.email)
+
+
+class ActivityFixtureTestCase(TestCase):
+    """
+    One batch with one activity of two cards, each with two required questions.
+    """
+
+    def setUp(self):
+        now = timezone.now()
+        self.user = User.objects.create_user(
+            email="learner@example.com", username="learner", password="testpassword123",
+            is_verified=True)
+        self.batch = Batch.objects.create(name="Batch", year=now.year)
+        self.activity = Activity.objects.create(
+            name="Activity", batch=self.batch)
+        self.cards = [
+            Card.objects.create(
+                name=f"Card {i}", activity=self.activity, sequence_no=i,
+                start_time=now, end_time=now)
+            for i in range(2)]
+        self.questions = {
+            card.id: [
+                Question.objects.create(text=f"Q{i}", card=card, sequence_no=i)
+                for i in range(2)]
+            for card in self.cards}
+        Question.objects.create(
+            text="Optional", card=self.cards[0], sequence_no=2, is_required=False)
+
+
+class ProgressRollupTest(ActivityFixtureTestCase):
+
+    def answer(self, question):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Answer.objects.create(user=self.user, question=question, answer="yes")
+
+    def test_statuses_follow_required_answers(self):
+        first, second = self.cards
+
+        self.answer(self.questions[first.id][0])
+        user_card = UserCard.objects.get(user=self.user, card=first)
+        self.assertEqual(user_card.status, Status.IN_PROGRESS)
+        self.assertEqual(user_card.completed_questions, 1)
+        user_activity = UserActivity.objects.get(user=self.user, activity=self.activity)
+        self.assertEqual(user_activity.status, Status.NOT_ATTEMPTED)
+
+        self.answer(self.questions[first.id][1])
+        self.assertEqual(UserCard.objects.get(user=self.user, card=first).status, Status.COMPLETED)
+        user_activity.refresh_from_db()
+        self.assertEqual(user_activity.status, Status.IN_PROGRESS)
+        self.assertEqual(user_activity.completed_cards, 1)
+
+        for question in self.questions[second.id]:
+            self.answer(question)
+        user_activity.refresh_from_db()
+        self.assertEqual(user_activity.status, Status.COMPLETED)
+        user_batch = UserBatch.objects.get(user=self.user, batch=self.batch)
+        self.assertEqual(user_batch.status, Status.COMPLETED)
+        self.assertEqual(user_batch.completed_activities, 1)
+        self.assertTrue(user_batch.is_completed)
+
+    def test_rollup_query_count_is_constant(self):
+        card = self.cards[0]
+        with self.assertNumQueries(6):
+            recompute_user_progress(self.user.id, card.id)
+        self.answer(self.questions[card.id][0])
+        with self.assertNumQueries(6):
+            recompute_user_progress(self.user.id, card.id)
+
+    def test_checkbox_answers_roll_up_once(self):
+        question = self.questions[self.cards[0].id][0]
+        options = [
+            Option.objects.create(value=f"O{i}", question=question, sequence_no=i)
+            for i in range(3)]
+        serializer = AnswerSerializer(data={
+            'user': self.user.id,
+            'question': question.id,
+            'answer': None,
+            'option': None,
+            'options': [option.id for option in options]})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        with mock.patch('apis.progress.recompute_user_progress') as recompute:
+            with self.captureOnCommitCallbacks(execute=True):
+                serializer.save()
+        recompute.assert_called_once_with(self.user.id, self.cards[0].id)
+
+    def test_rolled_back_keys_are_not_recomputed(self):
+        first, second = self.cards
+
+        def rolled_back(question):
+            with self.assertRaises(IntegrityError):
+                with transaction.atomic():
+                    Answer.objects.create(user=self.user, question=question, answer="yes")
+                    raise IntegrityError
+
+        for kept, dropped in ((first, second), (second, first)):
+            with mock.patch('apis.progress.recompute_user_progress') as recompute:
+                with self.captureOnCommitCallbacks(execute=True):
+                    Answer.objects.create(
+                        user=self.user, question=self.questions[kept.id][0], answer="yes")
+                    rolled_back(self.questions[dropped.id][0])
+                    Answer.objects.create(
+                        user=self.user, question=self.questions[kept.id][1], answer="yes")
+            recompute.assert_called_once_with(self.user.id, kept.id)
+
+    @override_settings(PROGRESS_ROLLUP_MODE='deferred')
+    def test_deferred_mode_queues_until_drained(self):
+        card = self.cards[0]
+        for question in self.questions[card.id]:
+            self.answer(question)
+        self.assertEqual(PendingProgressUpdate.objects.count(), 1)
+        self.assertFalse(UserCard.objects.filter(user=self.user, card=card).exists())
+
+        self.assertEqual(drain_progress_updates(), 1)
+        self.assertFalse(PendingProgressUpdate.objects.exists())
+        self.assertEqual(UserCard.objects.get(user=self.user, card=card).status, Status.COMPLETED)
+
+
+class CardAnswerSubmitTest(ActivityFixtureTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.card = self.cards[0]
+        self.url = reverse('card-answer-submit', args=[self.card.id])
+
+    def test_submits_whole_card(self):
+        first, second = self.questions[self.card.id]
+        options = [
+            Option.objects.create(value=f"O{i}", question=second, sequence_no=i)
+            for i in range(2)]
+        payload = {'answers': [
+            {'question': first.id, 'answer': 'text'},
+            {'question': second.id, 'options': [option.id for option in options]}]}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(Answer.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(
+            UserCard.objects.get(user=self.user, card=self.card).status, Status.COMPLETED)
+
+    def test_rejects_option_of_another_question(self):
+        first, second = self.questions[self.card.id]
+        option = Option.objects.create(value="O", question=second, sequence_no=0)
+        payload = {'answers': [{'question': first.id, 'options': [option.id]}]}
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Answer.objects.exists())
+
+    def test_rejects_question_of_another_card(self):
+        other = self.questions[self.cards[1].id][0]
+        payload = {'answers': [{'question': other.id, 'answer': 'text'}]}
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, 400)
+
+
+class UserCardQuestionProgressTest(ActivityFixtureTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse(
+            'user-card-question-detail', args=[self.user.id, self.activity.id])
+        cache.clear()
+
+    def add_card(self, sequence_no):
+        card = Card.objects.create(
+            name=f"Card {sequence_no}", activity=self.activity, sequence_no=sequence_no,
+            start_time=timezone.now(), end_time=timezone.now())
+        for i in range(3):
+            question = Question.objects.create(text=f"Q{i}", card=card, sequence_no=i)
+            Option.objects.create(value="O", question=question, sequence_no=0)
+            Answer.objects.create(user=self.user, question=question, answer="yes")
+        return card
+
+    def test_response_shape(self):
+        question = self.questions[self.cards[0].id][0]
+        option = Option.objects.create(value="O", question=question, sequence_no=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Answer.objects.create(user=self.user, question=question, option=option)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['recent_card_id'], self.cards[0].id)
+        first_card, second_card = response.data['cards']
+        self.assertEqual(first_card['user_card_progress']['status'], Status.IN_PROGRESS)
+        self.assertNotIn('user_card_progress', second_card)
+        first_question = first_card['questions'][0]
+        self.assertEqual([o['id'] for o in first_question['options']], [option.id])
+        self.assertEqual(len(first_question['answers']), 1)
+        self.assertNotIn('options', first_card['questions'][1])
+        self.assertEqual(first_card['questions'][1]['answers'], [])
+
+    def test_query_count_does_not_grow_with_content(self):
+        # Cold: content tree is built (cards, questions, options)
+        with self.assertNumQueries(7):
+            self.client.get(self.url)
+        # Warm: only the content version and the user's own rows are read
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+
+        for sequence_no in range(2, 6):
+            self.add_card(sequence_no)
+
+        with self.assertNumQueries(7):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['cards']), 6)
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+
+    def test_content_changes_invalidate_cached_tree(self):
+        question = self.questions[self.cards[0].id][0]
+        option = Option.objects.create(value="Before", question=question, sequence_no=0)
+        self.client.get(self.url)
+
+        option.value = "After"
+        option.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['cards'][0]['questions'][0]['options'][0]['value'], "After")
+
+        question.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data['cards'][0]['questions']), 2)
+
+    def test_version_bumped_elsewhere_invalidates_cached_tree(self):
+        question = self.questions[self.cards[0].id][0]
+        self.client.get(self.url)
+
+        # As another worker would: the rows and the version change, this
+        # process's cache is left alone
+        Question.objects.filter(pk=question.pk).update(text="Changed")
+        ContentVersion.objects.filter(activity=self.activity).update(version=F('version') + 1)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['cards'][0]['questions'][0]['text'], "Changed")
+
+
+class UserActivityProgressListTest(ActivityFixtureTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('user-activities-detail', args=[self.user.id, self.batch.id])
+
+    def test_current_activity_and_progress(self):
+        later = Activity.objects.create(name="Later", batch=self.batch, sequence_no=2)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['current_activity_id'], self.activity.id)
+        self.assertNotIn('user_activity_progress', response.data['activities'][0])
+
+        UserActivity.objects.create(user=self.user, activity=later, status=Status.IN_PROGRESS)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['current_activity_id'], later.id)
+        progress = response.data['activities'][1]['user_activity_progress']
+        self.assertEqual(progress['status'], Status.IN_PROGRESS)
+
+    def test_query_count_does_not_grow_with_activities(self):
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+        for sequence_no in range(2, 8):
+            activity = Activity.objects.create(
+                name="Extra", batch=self.batch, sequence_no=sequence_no)
+            UserActivity.objects.create(user=self.user, activity=activity)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['activities']), 7)
+
+    def test_unknown_batch(self):
+        url = reverse('user-activities-detail', args=[self.user.id, self.batch.id + 1])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ListPaginationTest(ActivityFixtureTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.organizer = User.objects.create_user(
+            email="organizer@example.com", username="organizer", password="testpassword123",
+            role=Role.ORGANIZER, is_verified=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+        for card in self.cards:
+            for question in self.questions[card.id]:
+                Answer.objects.create(user=self.user, question=question, answer="yes")
+
+    def test_cursor_walks_every_row_once(self):
+        url = reverse('answer-list-create')
+        seen = []
+        response = self.client.get(url, {'page_size': 3})
+        while True:
+            self.assertEqual(response.status_code, 200, response.data)
+            seen.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        expected = list(Answer.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_cursor_covers_tied_and_undated_rows(self):
+        answers = list(Answer.objects.order_by('id'))
+        Answer.objects.filter(pk__in=[a.pk for a in answers[:2]]).update(created_at=None)
+        Answer.objects.filter(pk__in=[a.pk for a in answers[2:]]).update(created_at=answers[2].created_at)
+
+        seen = []
+        response = self.client.get(reverse('answer-list-create'), {'page_size': 1})
+        while True:
+            seen.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(seen, [a.pk for a in reversed(answers[2:])] + [answers[1].pk, answers[0].pk])
+
+    def test_page_is_an_index_range(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Reads the SQLite query plan')
+        paginator = CreatedAtCursorPagination()
+        cursor = paginator.encode_cursor(Answer.objects.order_by('-created_at', '-id').first())
+        request = Request(APIRequestFactory().get('/', {'cursor': cursor}))
+        with CaptureQueriesContext(connection) as queries:
+            paginator.paginate_queryset(Answer.objects.all(), request)
+
+        with connection.cursor() as db:
+            db.execute(f"EXPLAIN QUERY PLAN {queries[0]['sql']}")
+            plan = ' '.join(str(row[-1]) for row in db.fetchall())
+        self.assertIn('answer_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_filters_and_sparse_fields(self):
+        card = self.cards[0]
+        response = self.client.get(
+            reverse('answer-list-create'), {'card': card.id, 'fields': 'id,question'})
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data['results']), 2)
+        for row in response.data['results']:
+            self.assertEqual(set(row), {'id', 'question'})
+
+    def test_invalid_parameters(self):
+        url = reverse('card-list-create')
+        self.assertEqual(self.client.get(url, {'cursor': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'activity': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'updated_since': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'updated_since': '2024-13-01T00:00'}).status_code, 400)
+        garbage = urlsafe_b64encode(b'garbage|5').decode()
+        self.assertEqual(self.client.get(url, {'cursor': garbage}).status_code, 400)
+
+    def test_naive_timestamps_use_the_current_time_zone(self):
+        url = reverse('answer-list-create')
+        newest = Answer.objects.order_by('-created_at', '-id').first()
+        naive = timezone.make_naive(newest.created_at).isoformat()
+        cursor = urlsafe_b64encode(f'{naive}|{newest.pk}'.encode()).decode()
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertEqual(len(response.data['results']), Answer.objects.count() - 1)
+            response = self.client.get(url, {'updated_since': naive})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertIn(newest.pk, [row['id'] for row in response.data['results']])
+
+    def test_streaming_export(self):
+        url = reverse('answer-export')
+
+        response = self.client.get(url, {'activity': self.activity.id})
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'user_id', 'user__email'])
+        self.assertEqual(len(lines), 1 + Answer.objects.count())
+        self.assertIn(self.user.email, lines[1])
+
+        response = self.client.get(
+            url, {'card': self.cards[0].id, 'file_format': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['question__text'], "Q0")
+
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+    @override_settings(ASGI=True)
+    async def test_streaming_export_under_asgi(self):
+        response = await sync_to_async(self.client.get)(
+            reverse('answer-export'), {'activity': self.activity.id})
+
+        self.assertTrue(response.is_async)
+        lines = b''.join([line async for line in response.streaming_content]).decode().splitlines()
+        self.assertEqual(len(lines), 1 + await Answer.objects.acount())
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class UserRegisterTest(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(
+            email="organizer@example.com", username="organizer", password="testpassword123",
+            role=Role.ORGANIZER, is_verified=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+
+    def upload(self, rows):
+        lines = ['email,username,name,role,gender,phoneNumber'] + rows
+        file = SimpleUploadedFile('users.csv', '\n'.join(lines).encode(), content_type='text/csv')
+        return self.client.post(reverse('upload_users_csv'), {'file': file}, format='multipart')
+
+    @override_settings(REGISTRATION_EMAIL_MODE='inline')
+    def test_registers_users_and_tracks_emails(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload([
+                'a@example.com,alpha,Alpha,USER,F,9876543210',
+                'b@example.com,beta,Beta,,,',
+            ])
+        self.assertEqual(response.status_code, 201, response.data)
+
+        users = User.objects.filter(username__in=['alpha', 'beta'])
+        self.assertEqual(users.count(), 2)
+        for user in users:
+            self.assertFalse(user.has_usable_password())
+            self.assertFalse(user.is_verified)
+        self.assertEqual(len(mail.outbox), 2)
+
+        job = self.client.get(
+            reverse('registration-job-detail', args=[response.data['job_id']])).data
+        self.assertEqual(job['status'], 'COMPLETED')
+        self.assertEqual(job['total_users'], 2)
+        self.assertEqual(job['emails_sent'], 2)
+
+    def test_upload_sends_no_mail_by_default(self):
+        self.assertEqual(settings.REGISTRATION_EMAIL_MODE, 'deferred')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload([f'user{i}@example.com,user{i},User,USER,,' for i in range(3)])
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            RegistrationJob.objects.get(pk=response.data['job_id']).pending_emails.count(), 3)
+
+    def test_deferred_and_interrupted_jobs_are_drained(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload([
+                'a@example.com,alpha,Alpha,USER,,',
+                'b@example.com,beta,Beta,USER,,',
+            ])
+        job = RegistrationJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual(job.status, JobStatus.QUEUED)
+        self.assertEqual(len(mail.outbox), 0)
+
+        # Claimed by a sender that died before sending anything
+        RegistrationJob.objects.filter(pk=job.pk).update(
+            status=JobStatus.SENDING, updated_at=timezone.now())
+        self.assertEqual(drain_registration_jobs(), 0)
+        RegistrationJob.objects.filter(pk=job.pk).update(
+            updated_at=timezone.now() - timedelta(hours=1))
+        call_command('drain_registration_emails', once=True, stdout=io.StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.COMPLETED)
+        self.assertEqual(job.emails_sent, 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(job.pending_emails.exists())
+
+    def test_invalid_rows_create_nothing(self):
+        response = self.upload([
+            'a@example.com,alpha,Alpha,USER,F,9876543210',
+            'not-an-email,beta,Beta,USER,F,',
+            'c@example.com,alpha,Gamma,USER,F,',
+            'organizer@example.com,delta,Delta,USER,F,',
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['errors']), 2)
+        self.assertFalse(User.objects.filter(username='alpha').exists())
+
+    def test_existing_accounts_are_rejected(self):
+        rows = [f'user{i}@example.com,user{i},User,USER,,' for i in range(20)]
+        rows.append('organizer@example.com,other,Other,USER,,')
+        response = self.upload(rows)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'], ['User with email organizer@example.com already exists'])
+        self.assertEqual(User.objects.count(), 1)
+
+    @override_settings(
+        REGISTRATION_EMAIL_MODE='inline',
+        FRONTEND_SET_PASSWORD_URL='https://app.example.com/set-password/')
+    def test_verification_link_sets_password_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload(['a@example.com,alpha,Alpha,USER,F,'])
+        url = mail.outbox[0].body.split()[-1]
+        path = url[url.index('/apis/'):]
+        client = APIClient()
+
+        token = path.rstrip('/').rsplit('/', 1)[-1]
+        self.assertRedirects(
+            client.get(path), f'https://app.example.com/set-password/?token={token}',
+            fetch_redirect_response=False)
+        self.assertEqual(client.post(path, {'password': '123'}).status_code, 400)
+
+        response = client.post(path, {'password': 'a-Long-passphrase-42'})
+        self.assertEqual(response.status_code, 200, response.data)
+        user = User.objects.get(email='a@example.com')
+        self.assertTrue(user.is_verified)
+        self.assertTrue(user.check_password('a-Long-passphrase-42'))
+
+        response = client.post(path, {'password': 'another-Passphrase-42'})
+        self.assertEqual(response.status_code, 400)
+
+
+class _FlakyBackend(locmem.EmailBackend):
+    # Drops the connection on the listed send attempts (1-based)
+    def __init__(self, fail_on=(), **kwargs):
+        super().__init__(**kwargs)
+        self.fail_on = set(fail_on)
+        self.opens = 0
+        self.attempts = 0
+
+    def open(self):
+        self.opens += 1
+
+    def send_messages(self, messages):
+        self.attempts += 1
+        if self.attempts in self.fail_on:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BATCH_SIZE=2, EMAIL_RATE_LIMIT=0, EMAIL_MAX_RETRIES=2, EMAIL_RETRY_BACKOFF=1.0)
+class MailDispatchTest(TestCase):
+
+    def messages(self, count):
+        return [EmailMessage('Subject', 'Body', 'from@example.com', [f'user{i}@example.com'])
+                for i in range(count)]
+
+    def test_batches_over_one_connection(self):
+        backend = _FlakyBackend()
+        batches = []
+        sent, failures = dispatch_messages(
+            self.messages(5), on_batch=lambda sent, failures: batches.append(sent),
+            connection=backend)
+        self.assertEqual((sent, failures), (5, []))
+        self.assertEqual(batches, [2, 2, 1])
+        self.assertEqual(backend.opens, 1)
+        self.assertEqual(len(mail.outbox), 5)
+
+    @mock.patch('apis.mail.time.sleep')
+    def test_retries_with_backoff(self, sleep):
+        backend = _FlakyBackend(fail_on={2, 3})
+        sent, failures = dispatch_messages(self.messages(3), connection=backend)
+        self.assertEqual((sent, failures), (3, []))
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [1.0, 2.0])
+
+    @mock.patch('apis.mail.time.sleep')
+    def test_gives_up_after_max_retries(self, sleep):
+        backend = _FlakyBackend(fail_on={1, 2, 3})
+        sent, failures = dispatch_messages(self.messages(2), connection=backend)
+        self.assertEqual(sent, 1)
+        self.assertEqual(failures[0][0].to, ['user0@example.com'])
+
+
+class SignInTest(ActivityFixtureTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other_batch = Batch.objects.create(name="Other", year=timezone.now().year)
+        UserBatch.objects.create(user=self.user, batch=self.batch)
+        UserBatch.objects.create(user=self.user, batch=self.other_batch)
+
+    def sign_in(self, password="testpassword123"):
+        return APIClient().post(
+            reverse('auth'), {'email': self.user.email, 'password': password}, format='json')
+
+    def test_current_batch_follows_user_batches(self):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.current_batch_id, self.batch.id)
+
+        UserBatch.objects.get(user=self.user, batch=self.batch).delete()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.current_batch_id, self.other_batch.id)
+
+    def test_sign_in_is_two_queries(self):
+        # The user with its batch, then the blacklist app's OutstandingToken insert
+        with self.assertNumQueries(2):
+            response = self.sign_in()
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['batch_id'], self.batch.id)
+        self.assertEqual(response.data['batch_name'], self.batch.name)
+
+        self.assertEqual(self.sign_in("wrong").status_code, 401)
+
+    def test_sign_in_without_batch(self):
+        UserBatch.objects.filter(user=self.user).delete()
+        self.assertEqual(self.sign_in().status_code, 404)
+
+
+# As with a shared CACHE_URL; the locmem test cache stands in for it
+@override_settings(AUTH_USER_CACHE_TIMEOUT=60)
+class CachedJWTAuthenticationTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user(
+            email="organizer@example.com", username="organizer", password="testpassword123",
+            role=Role.ORGANIZER, is_verified=True)
+        token = RefreshToken.for_user(self.organizer).access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_user_fetched_once(self):
+        url = reverse('batch-list-create')
+        # The user, then the dated and undated halves of the (last) page
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_changes_apply_on_next_request(self):
+        url = reverse('batch-list-create')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.organizer.role = Role.USER
+        self.organizer.save()
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.organizer.is_active = False
+        self.organizer.save()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+
+class TokenBlacklistTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="learner@example.com", username="learner", password="testpassword123",
+            is_verified=True)
+
+    def test_rotated_token_refused_from_cache(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        client = APIClient()
+        response = client.post(reverse('token_refresh'), {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('refresh', response.data)
+
+        with self.assertNumQueries(0):
+            response = client.post(reverse('token_refresh'), {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_prune_deletes_only_expired(self):
+        tokens = [RefreshToken.for_user(self.user) for _ in range(5)]
+        for token in tokens[:3]:
+            token.blacklist()
+        OutstandingToken.objects.filter(jti__in=[t['jti'] for t in tokens[1:4]]).update(
+            expires_at=timezone.now() - timezone.timedelta(minutes=1))
+
+        call_command('prune_tokens', batch_size=2, pause=0, stdout=io.StringIO())
+        self.assertEqual(OutstandingToken.objects.count(), 2)
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+
+class ExplainHotQueriesTest(ActivityFixtureTestCase):
+
+    def test_hot_queries_use_indexes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for question in self.questions[self.cards[0].id]:
+                Answer.objects.create(user=self.user, question=question, answer="yes")
+
+        out = io.StringIO()
+        call_command('explain_hot_queries', strict=True, stdout=out)
+        self.assertNotIn('SCAN ', out.getvalue())
+
+
+class ContentCounterTest(ActivityFixtureTestCase):
+
+    def assertCounters(self, **expected):
+        self.batch.refresh_from_db()
+        self.activity.refresh_from_db()
+        for card in self.cards:
+            card.refresh_from_db()
+        actual = {
+            'total_activities': self.batch.total_activities,
+            'total_cards': self.activity.total_cards,
+            'total_polling_cards': self.activity.total_polling_cards,
+            'total_questions': [card.total_questions for card in self.cards],
+        }
+        self.assertEqual(actual, {**actual, **expected})
+
+    def test_create_move_and_delete(self):
+        self.assertCounters(
+            total_activities=1, total_cards=2, total_polling_cards=0, total_questions=[3, 2])
+
+        poll = Card.objects.create(
+            name="Poll", type=CardType.POLL, activity=self.activity, sequence_no=5,
+            start_time=timezone.now(), end_time=timezone.now())
+        self.assertCounters(total_cards=3, total_polling_cards=1)
+
+        question = self.questions[self.cards[0].id][0]
+        question.card = self.cards[1]
+        question.sequence_no = 5
+        question.save()
+        self.assertCounters(total_questions=[2, 3])
+
+        poll.type = CardType.SURVEY_INPUT
+        poll.save()
+        self.assertCounters(total_cards=3, total_polling_cards=0)
+
+        other = Activity.objects.create(name="Other", batch=self.batch, sequence_no=2)
+        poll.activity = other
+        poll.save()
+        other.refresh_from_db()
+        self.assertEqual(other.total_cards, 1)
+        self.assertCounters(total_activities=2, total_cards=2)
+
+        question.delete()
+        other.delete()
+        self.assertCounters(total_activities=1, total_questions=[2, 2])
+
+    def test_repair_counters(self):
+        Activity.objects.filter(pk=self.activity.pk).update(total_cards=7)
+        Card.objects.filter(pk=self.cards[1].pk).update(total_questions=0)
+
+        with self.assertRaises(CommandError):
+            call_command('repair_counters', check=True, stdout=io.StringIO())
+
+        call_command('repair_counters', stdout=io.StringIO())
+        self.assertCounters(total_cards=2, total_questions=[3, 2])
+        call_command('repair_counters', check=True, stdout=io.StringIO())
+
+
+class AsyncProgressViewsTest(ActivityFixtureTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            for question in self.questions[self.cards[0].id]:
+                Answer.objects.create(user=self.user, question=question, answer="yes")
+        self.organizer = User.objects.create_user(
+            email="organizer@example.com", username="organizer", password="testpassword123",
+            role=Role.ORGANIZER, is_verified=True)
+
+    def auth(self, user):
+        return {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+    async def assertSameResponse(self, view, url, headers, **kwargs):
+        sync_response = await sync_to_async(self.client.get)(url, headers=headers)
+        request = AsyncRequestFactory().get(url, headers=headers)
+        async_response = await view.as_view()(request, **kwargs)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(json.loads(async_response.content), json.loads(sync_response.content))
+        return async_response
+
+    async def test_same_responses(self):
+        user_headers = await sync_to_async(self.auth)(self.user)
+        organizer_headers = await sync_to_async(self.auth)(self.organizer)
+
+        kwargs = {'user_id': self.user.id, 'activity_id': self.activity.id}
+        response = await self.assertSameResponse(
+            AsyncUserCardQuestionProgress,
+            reverse('user-card-question-detail', kwargs=kwargs), user_headers, **kwargs)
+        self.assertEqual(response.status_code, 200)
+
+        kwargs = {'user_id': self.user.id, 'batch_id': self.batch.id}
+        response = await self.assertSameResponse(
+            AsyncUserActivityProgressList,
+            reverse('user-activities-detail', kwargs=kwargs), user_headers, **kwargs)
+        self.assertEqual(response.status_code, 200)
+
+        url = reverse('batch-user-list')
+        response = await self.assertSameResponse(
+            AsyncBatchUserListView, f'{url}?batch_id={self.batch.id}', organizer_headers)
+        self.assertEqual(len(json.loads(response.content)), 1)
+        await self.assertSameResponse(AsyncBatchUserListView, url, organizer_headers)
+
+        # Authentication and permission failures
+        response = await self.assertSameResponse(AsyncBatchUserListView, url, {})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+        response = await self.assertSameResponse(AsyncBatchUserListView, url, user_headers)
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(POLL_TALLY_FLUSH_INTERVAL=0, POLL_STREAM_INTERVAL=0)
+class PollTallyTest(ActivityFixtureTestCase):
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.poll = Card.objects.create(
+            name="Poll", type=CardType.POLL, activity=self.activity, sequence_no=5,
+            start_time=now, end_time=now - timedelta(seconds=1))
+        self.question = Question.objects.create(text="Vote", card=self.poll, sequence_no=0)
+        self.options = [
+            Option.objects.create(value=f"O{i}", question=self.question, sequence_no=i)
+            for i in range(3)]
+        self.organizer = User.objects.create_user(
+            email="organizer@example.com", username="organizer", password="testpassword123",
+            role=Role.ORGANIZER, is_verified=True)
+
+    def votes(self):
+        return dict(PollTally.objects.values_list('option__value', 'votes'))
+
+    def test_counts_answers(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(
+                reverse('card-answer-submit', args=[self.poll.id]),
+                {'answers': [{'question': self.question.id,
+                              'options': [self.options[0].id, self.options[1].id]}]},
+                format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            answer = Answer.objects.create(
+                user=self.organizer, question=self.question, option=self.options[0])
+        self.assertEqual(self.votes(), {'O0': 2, 'O1': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            answer.option = self.options[2]
+            answer.save()
+        self.assertEqual(self.votes(), {'O0': 1, 'O1': 1, 'O2': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            answer.delete()
+        self.assertEqual(self.votes(), {'O0': 1, 'O1': 1, 'O2': 0})
+
+    def test_ignores_other_cards(self):
+        first, second = self.questions[self.cards[0].id]
+        option = Option.objects.create(value="Other", question=second, sequence_no=0)
+        serializer = AnswerSerializer(data={
+            'user': self.user.id, 'question': second.id, 'answer': None, 'option': option.id})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        # Told apart by the card loaded with the question, without a query
+        with override_settings(POLL_TALLY_FLUSH_INTERVAL=60), \
+                mock.patch.object(polls, '_count_votes') as count, \
+                self.captureOnCommitCallbacks(execute=True):
+            Answer.objects.create(user=self.user, question=second, option=option)
+            serializer.save()
+        count.assert_not_called()
+        self.assertFalse(polls._pending)
+        self.assertIsNone(polls._timer)
+        self.assertFalse(PollTally.objects.exists())
+
+    def test_buffered_votes_are_flushed(self):
+        try:
+            with override_settings(POLL_TALLY_FLUSH_INTERVAL=60), \
+                    self.captureOnCommitCallbacks(execute=True):
+                for option in (self.options[0], self.options[0], self.options[2]):
+                    Answer.objects.create(user=self.user, question=self.question, option=option)
+            self.assertFalse(PollTally.objects.exists())
+
+            self.assertEqual(polls.flush_poll_votes(), 2)
+        finally:
+            polls._timer.cancel()
+            polls._timer = None
+        self.assertEqual(self.votes(), {'O0': 2, 'O2': 1})
+        self.assertEqual(polls.flush_poll_votes(), 0)
+
+    def test_rebuild_poll_tallies(self):
+        Answer.objects.create(user=self.user, question=self.question, option=self.options[1])
+        PollTally.objects.create(card=self.poll, option=self.options[0], votes=9)
+
+        call_command('rebuild_poll_tallies', self.poll.id, stdout=io.StringIO())
+
+        self.assertEqual(self.votes(), {'O1': 1})
+
+    def events(self, content):
+        return [event for event in content.decode().split('\n\n') if event]
+
+    def test_stream(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Answer.objects.create(user=self.user, question=self.question, option=self.options[1])
+        client = APIClient()
+        client.force_authenticate(self.organizer)
+        url = reverse('card-poll-stream', args=[self.poll.id])
+
+        response = client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        retry, tally, end = self.events(b''.join(response.streaming_content))
+        self.assertEqual(retry, 'retry: 0')
+        event_id = tally.split('\n')[0].removeprefix('id: ')
+        self.assertTrue(tally.startswith(f'id: {event_id}\nevent: tally\n'))
+        results = json.loads(tally.split('data: ', 1)[1])
+        self.assertEqual(results['total_votes'], 1)
+        self.assertEqual(
+            [option['votes'] for option in results['questions'][0]['options']], [0, 1, 0])
+        self.assertTrue(end.startswith('event: end\n'))
+
+        # Reconnecting with the last event id gets no tally until it changes
+        response = client.get(url, HTTP_LAST_EVENT_ID=event_id)
+        self.assertEqual(
+            [event.split('\n')[0] for event in self.events(b''.join(response.streaming_content))],
+            ['retry: 0', 'event: end'])
+
+        response = client.get(reverse('card-poll-stream', args=[self.cards[0].id]))
+        self.assertEqual(response.status_code, 400)
+        client.force_authenticate(self.user)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(ASGI=True)
+    async def test_stream_under_asgi(self):
+        self.poll.end_time = timezone.now() + timedelta(hours=1)
+        await self.poll.asave()
+        await Answer.objects.acreate(user=self.user, question=self.question, option=self.options[2])
+        await sync_to_async(polls.rebuild_poll_tallies)(self.poll.id)
+        client = APIClient()
+        client.force_authenticate(self.organizer)
+
+        with override_settings(POLL_STREAM_MAX_SECONDS=0):
+            response = await sync_to_async(client.get)(
+                reverse('card-poll-stream', args=[self.poll.id]))
+            self.assertTrue(response.is_async)
+            events = self.events(b''.join(
+                [event async for event in response.streaming_content]))
+
+        self.assertEqual(
+            [event.split('\n')[0].split(':')[0] for event in events], ['retry', 'id', 'event'])
+        self.assertEqual(json.loads(events[1].split('data: ', 1)[1])['total_votes'], 1)
+        self.assertTrue(events[2].startswith('event: end\n'))
+
+
+@override_settings(REGISTRATION_EMAIL_MODE='inline', POLL_TALLY_FLUSH_INTERVAL=0)
+class EndpointBenchmarkTest(TestCase):
+
+    def test_every_endpoint_succeeds(self):
+        cache.clear()
+        seed = seed_benchmark_data(3, activities=2, cards=2, questions=2, options=2)
+
+        results = run_benchmarks(seed, iterations=1)
+
+        failed = {name: result['status'] for name, result in results.items()
+                  if result['status'] >= 400}
+        self.assertEqual(failed, {})
+        self.assertEqual(Answer.objects.count(), 4)
+        # Registration emails went to the test backend, inside the timing
+        self.assertTrue(mail.outbox)
+
+    def test_find_regressions(self):
+        def run(queries, p95_ms, peak_kb=100, status=200):
+            return {'scales': {'50': {'users list': {
+                'status': status, 'queries': queries, 'p95_ms': p95_ms, 'peak_kb': peak_kb}}}}
+
+        baseline = run(2, 30.0)
+        self.assertEqual(find_regressions(baseline, run(2, 35.0)), [])
+        self.assertEqual(find_regressions(run(2, 1.0), run(2, 3.0)), [])
+        self.assertEqual(len(find_regressions(baseline, run(3, 40.0, peak_kb=200))), 3)
+        self.assertEqual(find_regressions(baseline, {'scales': {}}), [])
+
+
+class RequestProfilingTest(ActivityFixtureTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.spool_dir = tempfile.mkdtemp()
+        self.url = reverse('user-activities-detail', args=[self.user.id, self.batch.id])
+
+    def get(self, **settings):
+        with override_settings(REQUEST_PROFILING_SPOOL_DIR=self.spool_dir, **settings):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            with self.assertLogs('apis.requests', 'INFO') as logs:
+                response = client.get(self.url)
+        return response, json.loads(logs.records[-1].getMessage())
+
+    def test_disabled_by_default(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(self.url)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_reports_timings(self):
+        response, record = self.get(REQUEST_PROFILING=True, REQUEST_PROFILING_SLOW_MS=10_000)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, view;dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertEqual(record['view'], 'UserActivityProgressList')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertNotIn('spool', record)
+        self.assertEqual(list(Path(self.spool_dir).iterdir()), [])
+
+    def test_spools_slow_requests(self):
+        response, record = self.get(REQUEST_PROFILING=True, REQUEST_PROFILING_SLOW_MS=0)
+
+        spooled = json.loads((Path(self.spool_dir) / record['spool']).read_text())
+        self.assertEqual(len(spooled['sql']), record['queries'])
+        self.assertTrue(spooled['slowest']['sql'].startswith('SELECT'))
+        self.assertTrue(spooled['slowest']['plan'])
+
+
+class MetricsTest(ActivityFixtureTestCase):
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_and_progress_metrics(self):
+        labels = {'view': 'user-activities-detail', 'method': 'GET'}
+        requests = self.sample('proleap_http_requests_total', status='200', **labels)
+        rollups = self.sample('proleap_progress_rollup_queries_count')
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        client.get(reverse('user-activities-detail', args=[self.user.id, self.batch.id]))
+        with self.captureOnCommitCallbacks(execute=True):
+            Answer.objects.create(
+                user=self.user, question=self.questions[self.cards[0].id][0], answer="yes")
+
+        self.assertEqual(
+            self.sample('proleap_http_requests_total', status='200', **labels), requests + 1)
+        self.assertEqual(
+            self.sample('proleap_http_requests_in_flight', view='user-activities-detail'), 0)
+        self.assertEqual(self.sample('proleap_progress_rollup_queries_count'), rollups + 1)
+
+        admin = User.objects.create_user(
+            email="admin@example.com", username="admin", password="testpassword123",
+            role=Role.ADMIN, is_verified=True)
+        client.force_authenticate(admin)
+        response = client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('proleap_http_request_duration_seconds_bucket{', body)
+        self.assertIn('proleap_signal_duration_seconds_count{receiver="update_user_progress"}', body)
+
+    def test_rejected_without_token_or_admin(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get(reverse('metrics')).status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(
+            reverse('metrics'), headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+
+
+class PopulateMockDataTest(TestCase):
+
+    def test_seeds_hierarchy_with_progress(self):
+        call_command(
+            'populate_mock_data', users=4, batches=2, activities=2, cards=2, questions=3,
+            options=2, answer_fill=0.5, stdout=io.StringIO())
+
+        self.assertEqual(User.objects.count(), 1 + 2 + 4)    # admin, organizers, users
+        self.assertEqual(Question.objects.count(), 2 * 2 * 2 * 3)
+        self.assertEqual(Option.objects.count(), 2 * 2 * 2 * 3 * 2)
+        self.assertEqual(Answer.objects.count(), 4 * 6)
+        user = User.objects.get(username='user0')
+        self.assertTrue(user.check_password('proleap'))
+        self.assertIsNotNone(user.current_batch)
+        call_command('repair_counters', check=True, stdout=io.StringIO())
+
+        # Seeded progress matches what the rollup computes
+        seeded = list(UserCard.objects.filter(user=user).order_by('card').values_list(
+            'card', 'completed_questions', 'status'))
+        self.assertEqual([row[1:] for row in seeded], [(3, Status.COMPLETED), (3, Status.COMPLETED)])
+        for card_id, _, _ in seeded:
+            recompute_user_progress(user.id, card_id)
+        self.assertEqual(seeded, list(UserCard.objects.filter(user=user).order_by('card').values_list(
+            'card', 'completed_questions', 'status')))
+        self.assertEqual(
+            UserActivity.objects.get(user=user).status, Status.COMPLETED)
+        self.assertEqual(
+            UserBatch.objects.filter(user=user).values_list('completed_activities', 'status').get(),
+            (1, Status.IN_PROGRESS))
+
+
+@mock.patch.dict(schema._schemas, clear=True)
+class SchemaTest(TestCase):
+
+    def test_generated_once_and_served_with_etag(self):
+        url = reverse('schema-json', args=['.json'])
+        with override_settings(OPENAPI_SCHEMA_DIR=tempfile.mkdtemp()), \
+                mock.patch.object(schema, 'generate_schema', wraps=schema.generate_schema) as generate:
+            response = self.client.get(url)
+            again = self.client.get(url, headers={'If-None-Match': response['ETag']})
+
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(response.status_code, 200)
+        document = json.loads(response.content)
+        self.assertEqual(document['basePath'], '/apis')
+        self.assertIn('/signin/', document['paths'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], response['ETag'])
+        self.assertEqual(self.client.get(reverse('schema-json', args=['.xml'])).status_code, 404)
+
+    def test_serves_build_artifact(self):
+        directory = tempfile.mkdtemp()
+        with override_settings(OPENAPI_SCHEMA_DIR=directory):
+            call_command('generate_openapi_schema', stdout=io.StringIO())
+            (Path(directory) / 'openapi.yaml').write_text('swagger: "2.0"\n')
+            with mock.patch.object(schema, 'generate_schema') as generate:
+                response = self.client.get(reverse('schema-json', args=['.yaml']))
+
+        generate.assert_not_called()
+        self.assertEqual(response.content, b'swagger: "2.0"\n')
+        self.assertEqual(response['Content-Type'], 'application/yaml')
+
+    def test_docs_point_at_cached_schema(self):
+        response = self.client.get(reverse('schema-swagger-ui'))
+        self.assertContains(response, reverse('schema-json', args=['.json']))
+
+    def test_only_artifact_served_without_api_docs(self):
+        url = reverse('schema-json', args=['.json'])
+        with override_settings(OPENAPI_SCHEMA_DIR=tempfile.mkdtemp(), API_DOCS=False):
+            with mock.patch.object(schema, 'generate_schema') as generate:
+                response = self.client.get(url)
+            with self.assertRaises(CommandError):
+                call_command('generate_openapi_schema', stdout=io.StringIO())
+
+        generate.assert_not_called()
+        self.assertEqual(response.status_code, 404)
+
+    def test_deferred_decorations_applied_on_generation(self):
+        from drf_yasg import openapi
+
+        deferred = docs._Deferred(lambda: openapi)
+        response = deferred.Schema(type=deferred.TYPE_OBJECT, properties={
+            'id': deferred.Schema(type=deferred.TYPE_INTEGER)})
+
+        def view(request):
+            pass
+
+        with override_settings(SERVERLESS=True), mock.patch.object(
+                docs, '_deferred', [(view, (), {'responses': {200: response}})]):
+            docs.apply_deferred_schemas()
+            self.assertEqual(docs._deferred, [])
+
+        schema = view._swagger_auto_schema['responses'][200]
+        self.assertIsInstance(schema, openapi.Schema)
+        self.assertEqual(schema.properties['id'].type, openapi.TYPE_INTEGER)
+
+
+class ProfileColdStartTest(TestCase):
+
+    def test_reports_timings_and_enforces_budget(self):
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, 'budget'):
+            call_command('profile_cold_start', runs=1, top=3, serverless=True,
+                         budget_ms=0.001, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('405', output)
+        self.assertIn('first response', output)
+        self.assertIn('django', output)
+
+    def test_serverless_serves_docs_and_admin(self):
+        for path in ('/apis/swagger/', '/admin/login/'):
+            out = io.StringIO()
+            call_command('profile_cold_start', path=path, runs=1, top=1, serverless=True, stdout=out)
+            self.assertIn('200 OK', out.getvalue(), path)
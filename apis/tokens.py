@@ -0,0 +1,56 @@
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+
+def _blacklisted_key(jti):
+    return f'jwt-blacklisted:{jti}'
+
+
+class CachedBlacklistRefreshToken(RefreshToken):
+    """
+    RefreshToken that remembers blacklisted jtis in the cache until they
+    expire, so replays of rotated tokens are refused without a query.
+
+    Only positive answers are cached: a miss still asks the database, which
+    another process may have written to since.
+    """
+
+    def _remaining_lifetime(self):
+        return max(int(self.payload['exp'] - self.current_time.timestamp()), 1)
+
+    def check_blacklist(self):
+        key = _blacklisted_key(self.payload[api_settings.JTI_CLAIM])
+        if cache.get(key):
+            raise TokenError(_("Token is blacklisted"))
+        try:
+            super().check_blacklist()
+        except TokenError:
+            cache.set(key, True, timeout=self._remaining_lifetime())
+            raise
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        cache.set(
+            _blacklisted_key(self.payload[api_settings.JTI_CLAIM]), True,
+            timeout=self._remaining_lifetime())
+        return blacklisted
+
+
+def prune_expired_tokens(batch_size=1000):
+    """
+    Delete one chunk of expired outstanding tokens with their blacklist rows.
+
+    Returns the number of outstanding tokens deleted; 0 once none are left.
+    """
+    ids = list(OutstandingToken.objects.filter(
+        expires_at__lte=aware_utcnow()).values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return 0
+    BlacklistedToken.objects.filter(token_id__in=ids).delete()
+    OutstandingToken.objects.filter(id__in=ids).delete()
+    return len(ids)
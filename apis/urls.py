@@ -1,9 +1,8 @@
+from django.conf import settings
 from django.urls import path
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 from rest_framework_simplejwt.views import TokenRefreshView, TokenObtainPairView
 
+from .lazy_urls import lazy_include
 from .views import (
     UserListAPIView,
     UserDetailAPIView,
@@ -27,43 +26,39 @@ from .views import (
     OptionDetailAPIView,
     AnswerListCreateAPIView,
     AnswerDetailAPIView,
+    AnswerExportAPIView,
+    CardAnswerSubmitAPIView,
+    PollResultsStreamAPIView,
+    MetricsAPIView,
+    SchemaAPIView,
     UserRegister,
     VerifyEmail,
+    RegistrationJobDetailAPIView,
     UserCardQuestionProgress,
     UserActivityProgressList)
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="ProLeap API",
-        default_version='v1',
-        description="Test description",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="proleap.ewhiz@gmail.com"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from .async_views import (
+    AsyncBatchUserListView,
+    AsyncUserCardQuestionProgress,
+    AsyncUserActivityProgressList)
+
+# ASGI deployments serve the read-heavy progress endpoints asynchronously
+if settings.ASYNC_PROGRESS_VIEWS:
+    batch_user_list_view = AsyncBatchUserListView.as_view()
+    user_card_question_view = AsyncUserCardQuestionProgress.as_view()
+    user_activities_view = AsyncUserActivityProgressList.as_view()
+else:
+    batch_user_list_view = BatchUserListAPIView.as_view()
+    user_card_question_view = UserCardQuestionProgress.as_view()
+    user_activities_view = UserActivityProgressList.as_view()
 
 urlpatterns = [
 
     path(
-        'swagger<format>/',
-        schema_view.without_ui(
-            cache_timeout=0),
+        'swagger<extension>/',
+        SchemaAPIView.as_view(),
         name='schema-json'),
-    path(
-        'swagger/',
-        schema_view.with_ui(
-            'swagger',
-            cache_timeout=0),
-        name='schema-swagger-ui'),
-    path(
-        'redoc/',
-        schema_view.with_ui(
-            'redoc',
-            cache_timeout=0),
-        name='schema-redoc'),
+
+    path('metrics/', MetricsAPIView.as_view(), name='metrics'),
 
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -94,7 +89,7 @@ urlpatterns = [
         name='user-batch-detail'),
     path(
         'batches-users/',
-        BatchUserListAPIView.as_view(),
+        batch_user_list_view,
         name='batch-user-list'),
 
     # URLs for Activity APIs
@@ -153,20 +148,37 @@ urlpatterns = [
         'answers/',
         AnswerListCreateAPIView.as_view(),
         name='answer-list-create'),
+    path(
+        'answers/export/',
+        AnswerExportAPIView.as_view(),
+        name='answer-export'),
     path(
         'answers/<int:pk>/',
         AnswerDetailAPIView.as_view(),
         name='answer-detail'),
+    path(
+        'cards/<int:card_id>/answers/',
+        CardAnswerSubmitAPIView.as_view(),
+        name='card-answer-submit'),
+    path(
+        'cards/<int:card_id>/poll/stream/',
+        PollResultsStreamAPIView.as_view(),
+        name='card-poll-stream'),
 
     path('upload-csv/', UserRegister.as_view(), name='upload_users_csv'),
+    path('upload-csv/<int:job_id>/', RegistrationJobDetailAPIView.as_view(), name='registration-job-detail'),
 
     path('register/', UserRegister.as_view(), name='user-register'),
     path('verify/<str:token>/', VerifyEmail.as_view(), name='verify-email'),
 
     path(
         'user/<int:user_id>/activity/<int:activity_id>/',
-        UserCardQuestionProgress.as_view(),
+        user_card_question_view,
         name='user-card-question-detail'),
     path('user/<int:user_id>/batch/<int:batch_id>/activities/',
-         UserActivityProgressList.as_view(), name='user-activities-detail'),
+         user_activities_view, name='user-activities-detail'),
 ]
+
+if settings.API_DOCS:
+    # Last, so that only the docs pages and unknown paths import drf_yasg
+    urlpatterns.append(lazy_include('', 'apis.docs_urls'))
@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from django.conf import settings
 import jwt
 from rest_framework.views import APIView
@@ -9,37 +9,64 @@ from .permissions import IsAuthenticatedVerifiedActive, IsAdmin, IsOrganizer, Is
 from django.shortcuts import get_object_or_404, redirect
 from django.core.exceptions import ValidationError
 from rest_framework_simplejwt.tokens import RefreshToken
-from drf_yasg import openapi
-from drf_yasg.utils import swagger_auto_schema
+from .docs import openapi, swagger_auto_schema
 from rest_framework_simplejwt.tokens import AccessToken, TokenError
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 import csv
-import io
+from itertools import islice
+import json
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.contrib.sites.shortcuts import get_current_site
-from django.core.mail import EmailMessage
 from .swagger_schemas import activity_answer_response_schema
 from .swagger_schemas import batch_activity_response_schema
+from .swagger_schemas import list_query_parameters, paginated_list_schema
+from .content_cache import get_content_tree
+from .progress_responses import activity_progress_data, card_progress_data
+from .listing import paginated_list_response
+from .registration import register_users, read_verification_token
+from .polls import poll_results
+from .metrics import render_metrics
+from .schema import SCHEMA_FORMATS, get_schema
 from django.contrib.auth.hashers import make_password
-
-
-
-from .models import User, Batch, UserBatch, Activity, UserActivity, Card, UserCard, Question, Option, Answer
+from django.contrib.auth.password_validation import validate_password
+from django.db import IntegrityError
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import urlencode
+from django.http import Http404
+import hashlib
+import time
+import asyncio
+from asgiref.sync import sync_to_async
+
+
+
+from .models import User, Batch, UserBatch, Activity, UserActivity, Card, CardType, UserCard, Question, Option, Answer, RegistrationJob
 from .serializers import (
     UserSerializer, BatchSerializer, UserBatchSerializer,
     ActivitySerializer, UserActivitySerializer,
     CardSerializer, UserCardSerializer,
-    QuestionSerializer, OptionSerializer, AnswerSerializer
+    QuestionSerializer, OptionSerializer, AnswerSerializer,
+    CardAnswerSubmissionSerializer, RegistrationJobSerializer
 )
 
 
+class _EchoBuffer:
+    # File-like object whose write() hands the line back to csv.writer's caller
+    def write(self, value):
+        return value
+
+
 class UserListAPIView(APIView):
 
     permission_classes = [IsAuthenticatedVerifiedActive, IsAdminOrOrganizer]
 
     @swagger_auto_schema(
         operation_description="Retrieve a list of users",
-        responses={200: UserSerializer(many=True)},
+        responses={200: paginated_list_schema(UserSerializer)},
         manual_parameters=[
         openapi.Parameter(
                 name='Authorization',
@@ -53,13 +80,15 @@ class UserListAPIView(APIView):
                     }
                 }
             )
-        ],
+        ] + list_query_parameters('batch', 'activity'),
     )
     def get(self, request):
         try:
-            users = User.objects.all()
-            serializer = UserSerializer(users, many=True)
-            return Response(serializer.data)
+            return paginated_list_response(
+                request, User.objects.prefetch_related('groups', 'user_permissions'), UserSerializer,
+                filter_fields={
+                    'batch': 'participating_batch',
+                    'activity': 'participating_activities'})
         except Exception as e:
             return Response({'error': str(e)},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -271,20 +300,21 @@ class SignInAPIView(APIView):
         email = request.data.get('email')
         password = request.data.get('password')
         try:
-            user = User.objects.get(email=email)
+            user = User.objects.select_related('current_batch').get(email=email)
         except User.DoesNotExist:
             return Response({'error': 'User not found'},
                             status=status.HTTP_404_NOT_FOUND)
 
-        try:
-            latest_user_batch = UserBatch.objects.filter(
-                user=user).order_by('updated_at').first()
-            batch_id = latest_user_batch.batch.id
-            batch_name = latest_user_batch.batch.name
-        except UserBatch.DoesNotExist:
-            return JsonResponse({'error': 'UserBatch not found'}, status=404)
+        if user.current_batch is None:
+            # Not maintained for rows written without signals; settle it once
+            User.objects.refresh_current_batch(user.id)
+            user.refresh_from_db(fields=['current_batch'])
+            if user.current_batch is None:
+                return JsonResponse({'error': 'UserBatch not found'}, status=404)
+        batch_id = user.current_batch.id
+        batch_name = user.current_batch.name
 
-        if (user.check_password(password)):
+        if user.check_password(password):
             refresh = RefreshToken.for_user(user)
             return Response({
                 'refresh': str(refresh),
@@ -304,7 +334,7 @@ class BatchListCreateAPIView(APIView):
     permission_classes = [IsAuthenticatedVerifiedActive, IsAdminOrOrganizer]
 
     @swagger_auto_schema(operation_description="List all batches",
-                         responses={200: BatchSerializer(many=True),
+                         responses={200: paginated_list_schema(BatchSerializer),
                                     500: openapi.Response(description='Internal Server Error')},
                         manual_parameters=[
         openapi.Parameter(
@@ -319,12 +349,13 @@ class BatchListCreateAPIView(APIView):
                     }
                 }
             )
-        ],)
+        ] + list_query_parameters('user'),)
     def get(self, request):
         try:
-            batches = Batch.objects.all()
-            serializer = BatchSerializer(batches, many=True)
-            return Response(serializer.data)
+            return paginated_list_response(
+                request, Batch.objects.all(), BatchSerializer,
+                filter_fields={
+                    'user': 'users'})
         except Exception as e:
             return Response({'error': str(e)},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -489,8 +520,7 @@ class UserBatchListCreateAPIView(APIView):
 
     @swagger_auto_schema(
         operation_description="List all user batches", responses={
-            200: UserBatchSerializer(
-                many=True), 500: openapi.Response(
+            200: paginated_list_schema(UserBatchSerializer), 500: openapi.Response(
                 description='Internal Server Error')},
                 manual_parameters=[
         openapi.Parameter(
@@ -505,12 +535,15 @@ class UserBatchListCreateAPIView(APIView):
                     }
                 }
             )
-        ],)
+        ] + list_query_parameters('batch', 'user', 'status'),)
     def get(self, request):
         try:
-            user_batches = UserBatch.objects.all()
-            serializer = UserBatchSerializer(user_batches, many=True)
-            return Response(serializer.data)
+            return paginated_list_response(
+                request, UserBatch.objects.all(), UserBatchSerializer,
+                filter_fields={
+                    'batch': 'batch_id',
+                    'user': 'user_id',
+                    'status': 'status'})
         except Exception as e:
             return Response({'error': str(e)},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -734,13 +767,15 @@ class ActivityListCreateAPIView(APIView):
     permission_classes = [IsAuthenticatedVerifiedActive, IsAdminOrOrganizer]
 
     @swagger_auto_schema(operation_description="List all activities",
-                         responses={200: ActivitySerializer(many=True),
-                                    500: openapi.Response(description='Internal Server Error')})
+                         responses={200: paginated_list_schema(ActivitySerializer),
+                                    500: openapi.Response(description='Internal Server Error')},
+                         manual_parameters=list_query_parameters('batch'))
     def get(self, request):
         try:
-            activities = Activity.objects.all()
-            serializer = ActivitySerializer(activities, many=True)
-            return Response(serializer.data)
+            return paginated_list_response(
+                request, Activity.objects.all(), ActivitySerializer,
+                filter_fields={
+                    'batch': 'batch_id'})
         except Exception as e:
             return Response({'error': str(e)},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -848,14 +883,18 @@ class UserActivityListCreateAPIView(APIView):
 
     @swagger_auto_schema(
         operation_description="List all user activities", responses={
-            200: UserActivitySerializer(
-                many=True), 500: openapi.Response(
-                description='Internal Server Error')})
+            200: paginated_list_schema(UserActivitySerializer), 500: openapi.Response(
+                description='Internal Server Error')},
+        manual_parameters=list_query_parameters('batch', 'activity', 'user', 'status'))
     def get(self, request):
         try:
-            user_activities = UserActivity.objects.all()
-            serializer = UserActivitySerializer(user_activities, many=True)
-            return Response(serializer.data)
+            return paginated_list_response(
+                request, UserActivity.objects.all(), UserActivitySerializer,
+                filter_fields={
+                    'batch': 'activity__batch_id',
+                    'activity': 'activity_id',
+                    'user': 'user_id',
+                    'status': 'status'})
         except Exception as e:
             return Response({'error': str(e)},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -963,13 +1002,16 @@ class CardListCreateAPIView(APIView):
     permission_classes = [IsAuthenticatedVerifiedActive, IsAdminOrOrganizer]
 
     @swagger_auto_schema(operation_description="List all cards",
-                         responses={200: CardSerializer(many=True),
-                                    500: openapi.Response(description='Internal Server Error')})
+                         responses={200: paginated_list_schema(CardSerializer),
+                                    500: openapi.Response(description='Internal Server Error')},
+                         manual_parameters=list_query_parameters('batch', 'activity'))
     def get(self, request):
         try:
-            cards = Card.objects.all()
-            serializer = CardSerializer(cards, many=True)
-            return Response(serializer.data)
+            return paginated_list_response(
+                request, Card.objects.all(), CardSerializer,
+                filter_fields={
+                    'batch': 'activity__batch_id',
+                    'activity': 'activity_id'})
         except Exception as e:
             return Response({'error': str(e)},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1077,13 +1119,18 @@ class UserCardListCreateAPIView(APIView):
     permission_classes = [IsAuthenticatedVerifiedActive, IsAdminOrOrganizer]
 
     @swagger_auto_schema(operation_description="List all user card",
-                         responses={200: UserCardSerializer(many=True),
-                                    500: openapi.Response(description='Internal Server Error')})
+                         responses={200: paginated_list_schema(UserCardSerializer),
+                                    500: openapi.Response(description='Internal Server Error')},
+                         manual_parameters=list_query_parameters('activity', 'card', 'user', 'status'))
     def get(self, request):
         try:
-            user_cards = UserCard.objects.all()
-            serializer = UserCardSerializer(user_cards, many=True)
-            return Response(serializer.data)
+            return paginated_list_response(
+                request, UserCard.objects.all(), UserCardSerializer,
+                filter_fields={
+                    'activity': 'card__activity_id',
+                    'card': 'card_id',
+                    'user': 'user_id',
+                    'status': 'status'})
         except Exception as e:
             return Response({'error': str(e)},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1190,13 +1237,16 @@ class QuestionListCreateAPIView(APIView):
     permission_classes = [IsAuthenticatedVerifiedActive, IsAdminOrOrganizer]
 
     @swagger_auto_schema(operation_description="List all questions",
-                         responses={200: QuestionSerializer(many=True),
-                                    500: openapi.Response(description='Internal Server Error')})
+                         responses={200: paginated_list_schema(QuestionSerializer),
+                                    500: openapi.Response(description='Internal Server Error')},
+                         manual_parameters=list_query_parameters('activity', 'card'))
     def get(self, request):
         try:
-            questions = Question.objects.all()
-            serializer = QuestionSerializer(questions, many=True)
-            return Response(serializer.data)
+            return paginated_list_response(
+                request, Question.objects.all(), QuestionSerializer,
+                filter_fields={
+                    'activity': 'card__activity_id',
+                    'card': 'card_id'})
         except Exception as e:
             return Response({'error': str(e)},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1303,13 +1353,17 @@ class OptionListCreateAPIView(APIView):
     permission_classes = [IsAuthenticatedVerifiedActive, IsAdminOrOrganizer]
 
     @swagger_auto_schema(operation_description="List all options",
-                         responses={200: OptionSerializer(many=True),
-                                    500: openapi.Response(description='Internal Server Error')})
+                         responses={200: paginated_list_schema(OptionSerializer),
+                                    500: openapi.Response(description='Internal Server Error')},
+                         manual_parameters=list_query_parameters('activity', 'card', 'question'))
     def get(self, request):
         try:
-            options = Option.objects.all()
-            serializer = OptionSerializer(options, many=True)
-            return Response(serializer.data)
+            return paginated_list_response(
+                request, Option.objects.all(), OptionSerializer,
+                filter_fields={
+                    'activity': 'question__card__activity_id',
+                    'card': 'question__card_id',
+                    'question': 'question_id'})
         except Exception as e:
             return Response({'error': str(e)},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1420,13 +1474,19 @@ class AnswerListCreateAPIView(APIView):
     
 
     @swagger_auto_schema(operation_description="List all answers",
-                         responses={200: AnswerSerializer(many=True),
-                                    500: openapi.Response(description='Internal Server Error')})
+                         responses={200: paginated_list_schema(AnswerSerializer),
+                                    500: openapi.Response(description='Internal Server Error')},
+                         manual_parameters=list_query_parameters('batch', 'activity', 'card', 'question', 'user'))
     def get(self, request):
         try:
-            answers = Answer.objects.all()
-            serializer = AnswerSerializer(answers, many=True)
-            return Response(serializer.data)
+            return paginated_list_response(
+                request, Answer.objects.all(), AnswerSerializer,
+                filter_fields={
+                    'batch': 'question__card__activity__batch_id',
+                    'activity': 'question__card__activity_id',
+                    'card': 'question__card_id',
+                    'question': 'question_id',
+                    'user': 'user_id'})
         except Exception as e:
             return Response({'error': str(e)},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1537,6 +1597,234 @@ class AnswerDetailAPIView(APIView):
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class AnswerExportAPIView(APIView):
+
+    permission_classes = [IsAuthenticatedVerifiedActive, IsAdminOrOrganizer]
+
+    # Denormalized in SQL so every exported row is a single flat tuple
+    EXPORT_COLUMNS = [
+        'id', 'user_id', 'user__email',
+        'question__card__activity__batch_id', 'question__card__activity_id', 'question__card_id',
+        'question_id', 'question__text', 'option_id', 'option__value', 'answer',
+        'created_at', 'updated_at',
+    ]
+    EXPORT_FILTERS = {
+        'batch': 'question__card__activity__batch_id',
+        'activity': 'question__card__activity_id',
+        'card': 'question__card_id',
+    }
+    CHUNK_SIZE = 2000
+
+    @swagger_auto_schema(
+        operation_description="Stream the answers of a batch, activity or card as CSV or NDJSON",
+        manual_parameters=[
+            openapi.Parameter('batch', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="ID of the batch"),
+            openapi.Parameter('activity', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="ID of the activity"),
+            openapi.Parameter('card', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="ID of the card"),
+            openapi.Parameter('file_format', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=['csv', 'ndjson'], description="Export format, csv by default"),
+        ],
+        responses={
+            200: 'Streamed export',
+            400: openapi.Response(description='Bad Request'),
+        }
+    )
+    def get(self, request):
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in ('csv', 'ndjson'):
+            return Response({'error': 'file_format must be csv or ndjson'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        filters = {}
+        for param, lookup in self.EXPORT_FILTERS.items():
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            try:
+                filters[lookup] = int(value)
+            except ValueError:
+                return Response({'error': f'Invalid {param}'},
+                                status=status.HTTP_400_BAD_REQUEST)
+        if not filters:
+            return Response({'error': 'One of batch, activity or card must be provided'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # iterator() streams through a server-side cursor on PostgreSQL, so
+        # memory stays flat regardless of how many answers are exported
+        rows = Answer.objects.filter(**filters).order_by('id').values_list(
+            *self.EXPORT_COLUMNS).iterator(chunk_size=self.CHUNK_SIZE)
+
+        if file_format == 'csv':
+            content = self.csv_lines(rows)
+            content_type = 'text/csv'
+        else:
+            content = self.ndjson_lines(rows)
+            content_type = 'application/x-ndjson'
+
+        scope = '-'.join(f'{param}-{request.query_params[param]}'
+                         for param in self.EXPORT_FILTERS if param in request.query_params)
+        if settings.ASGI:
+            # Django would buffer a sync iterator in full under ASGI
+            content = self.async_lines(content)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="answers-{scope}.{file_format}"'
+        return response
+
+    async def async_lines(self, lines):
+        # Pulled a chunk at a time on the thread that holds the cursor
+        next_chunk = sync_to_async(lambda: list(islice(lines, self.CHUNK_SIZE)))
+        while chunk := await next_chunk():
+            for line in chunk:
+                yield line
+
+    def csv_lines(self, rows):
+        buffer = _EchoBuffer()
+        writer = csv.writer(buffer)
+        yield writer.writerow(self.EXPORT_COLUMNS)
+        for row in rows:
+            yield writer.writerow(
+                value.isoformat() if isinstance(value, datetime) else value for value in row)
+
+    def ndjson_lines(self, rows):
+        for row in rows:
+            yield json.dumps(dict(zip(self.EXPORT_COLUMNS, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+class CardAnswerSubmitAPIView(APIView):
+
+    permission_classes = [IsAuthenticatedVerifiedActive, IsAdminOrOrganizerOrUser]
+
+    @swagger_auto_schema(
+        operation_description="Submit the answers for every question of a card in one request",
+        request_body=CardAnswerSubmissionSerializer,
+        responses={
+            201: AnswerSerializer(many=True),
+            400: openapi.Response(description='Invalid input'),
+            404: openapi.Response(description='Not Found'),
+            500: openapi.Response(description='Internal Server Error')
+        }
+    )
+    def post(self, request, card_id):
+        try:
+            card = Card.objects.get(pk=card_id)
+        except Card.DoesNotExist:
+            return Response({'error': 'Card not found'},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            serializer = CardAnswerSubmissionSerializer(
+                data=request.data,
+                context={'card': card, 'user': request.user})
+            if serializer.is_valid():
+                answers = serializer.save()
+                return Response(
+                    AnswerSerializer(answers, many=True).data,
+                    status=status.HTTP_201_CREATED)
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST)
+        except IntegrityError as e:
+            return Response({'error': str(e)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({'error': str(e)},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class PollResultsStreamAPIView(APIView):
+    """
+    Server-Sent Events stream of a POLL card's tallies for the presenter
+    screen. Reads PollTally, never the answers, and sends an event only when
+    the tallies change; its id identifies the tallies sent.
+
+    Under ASGI the stream stays open, re-reading the tallies every
+    POLL_STREAM_INTERVAL seconds until the poll ends or POLL_STREAM_MAX_SECONDS
+    pass. A sync worker cannot be held that long, so under WSGI each response
+    holds the current tallies only: EventSource reconnects after the `retry`
+    interval, sends the last event id, and gets no event while nothing changed.
+    """
+
+    permission_classes = [IsAuthenticatedVerifiedActive, IsAdminOrOrganizer]
+
+    KEEP_ALIVE_SECONDS = 15
+
+    @swagger_auto_schema(
+        operation_description="Stream the live tallies of a POLL card as Server-Sent Events",
+        responses={
+            200: 'text/event-stream of tally events, then an end event once the poll is over',
+            400: openapi.Response(description='Not a poll card'),
+            404: openapi.Response(description='Not Found'),
+        }
+    )
+    def get(self, request, card_id):
+        try:
+            card = Card.objects.get(pk=card_id)
+        except Card.DoesNotExist:
+            return Response({'error': 'Card not found'},
+                            status=status.HTTP_404_NOT_FOUND)
+        if card.type != CardType.POLL:
+            return Response({'error': 'Card is not a poll'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        last_event_id = request.headers.get('Last-Event-ID')
+        if settings.ASGI:
+            events = self.live_events(card, last_event_id)
+        else:
+            events = self.snapshot_events(card, last_event_id)
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def retry_event(self):
+        return f"retry: {int(settings.POLL_STREAM_INTERVAL * 1000)}\n\n"
+
+    def tally_event(self, card):
+        """
+        (event id, event) of the card's current tallies.
+        """
+        data = json.dumps(poll_results(card.id))
+        event_id = hashlib.sha256(data.encode()).hexdigest()[:16]
+        return event_id, f"id: {event_id}\nevent: tally\ndata: {data}\n\n"
+
+    def end_event(self, card):
+        return f"event: end\ndata: {json.dumps({'card_id': card.id})}\n\n"
+
+    def snapshot_events(self, card, last_event_id):
+        events = [self.retry_event()]
+        event_id, event = self.tally_event(card)
+        if event_id != last_event_id:
+            events.append(event)
+        if card.end_time <= timezone.now():
+            events.append(self.end_event(card))
+        return events
+
+    async def live_events(self, card, last_event_id):
+        interval = settings.POLL_STREAM_INTERVAL
+        deadline = time.monotonic() + settings.POLL_STREAM_MAX_SECONDS
+        tally_event = sync_to_async(self.tally_event)
+        last_sent = time.monotonic()
+        yield self.retry_event()
+        while True:
+            event_id, event = await tally_event(card)
+            if event_id != last_event_id:
+                last_event_id = event_id
+                last_sent = time.monotonic()
+                yield event
+            elif time.monotonic() - last_sent >= self.KEEP_ALIVE_SECONDS:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+
+            if card.end_time <= timezone.now() or time.monotonic() >= deadline:
+                yield self.end_event(card)
+                return
+            await asyncio.sleep(interval)
+
+
 class UserRegister(APIView):
     
     permission_classes = [IsAuthenticatedVerifiedActive, IsAdminOrOrganizer]
@@ -1550,13 +1838,16 @@ class UserRegister(APIView):
         consumes=["multipart/form-data"],
         responses={
             201: openapi.Response(
-                description='Users registered and emails sent',
+                description='Users registered and emails queued',
                 schema=openapi.Schema(
                     type=openapi.TYPE_OBJECT,
                     properties={
                         'success': openapi.Schema(
                             type=openapi.TYPE_STRING,
-                            description='Message indicating successful registration and email sending')})),
+                            description='Message indicating successful registration'),
+                        'job_id': openapi.Schema(
+                            type=openapi.TYPE_INTEGER,
+                            description='Registration job tracking the verification emails')})),
             400: 'Invalid input',
             415: 'Unsupported Media Type',
         })
@@ -1573,87 +1864,38 @@ class UserRegister(APIView):
 
         try:
             data = file.read().decode('utf-8')
-            io_string = io.StringIO(data)
-            csv_reader = csv.reader(io_string, delimiter=',')
-            header = next(csv_reader)
+            job, errors = register_users(
+                data, request.user, get_current_site(request).domain)
         except Exception as e:
             return Response({'error': str(e)},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        success_count = 0
-        errors = []
-
-        for row in csv_reader:
-            try:
-                email, username, name, role, gender, phone_number = row
-
-                # Process each row
-                name = name or ''
-                role = role or 'USER'
-                gender = gender or ''
-                phone_number = phone_number or None
-
-                user = User.objects.create_user(
-                    email=email,
-                    username=username,
-                    name=name,
-                    role=role,
-                    gender=gender,
-                    password='proleap',
-                    phoneNumber=phone_number,
-                    is_verified=False
-                )
-
-                user.set_password('string')
-                user.save()
-
-                # Generate JWT token for verification
-                token_payload = {
-                    'user_id': user.id,
-                    'email': user.email,
-                    'exp': datetime.now() + timedelta(hours=24)  # Token valid for 24 hours
-                }
-                token = jwt.encode(
-                    token_payload,
-                    settings.SECRET_KEY,
-                    algorithm='HS256')
-
-                # Build verification URL
-                current_site = get_current_site(request)
-                domain = current_site.domain
-                verification_url = f"http://{domain}/apis/verify/{token}/"
-
-                # Send email with verification link
-                subject = 'Activate your account'
-                # message = render_to_string('verification_email.html', {
-                #     'user': user,
-                #     'verification_url': verification_url,
-                # })
-                message = f'Please click the following link to verify your account: {
-                    verification_url}'
-
-                email = EmailMessage(
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [user.email],
-                )
-                email.send()
-
-                success_count += 1
-            except Exception as e:
-                errors.append(f'Error processing row: {str(e)}')
-
         if errors:
             return Response({'errors': errors},
                             status=status.HTTP_400_BAD_REQUEST)
         else:
             return Response(
                 {
-                    'success': f'{success_count} users have been registered and emails sent'},
+                    'success': f'{job.total_users} users have been registered and emails queued',
+                    'job_id': job.id},
                 status=status.HTTP_201_CREATED)
 
 
+class RegistrationJobDetailAPIView(APIView):
+
+    permission_classes = [IsAuthenticatedVerifiedActive, IsAdminOrOrganizer]
+
+
+    @swagger_auto_schema(
+        operation_summary="Registration job status",
+        operation_description="Progress of the verification emails of a CSV upload.",
+        responses={200: RegistrationJobSerializer, 404: 'Not Found'})
+    def get(self, request, job_id):
+        job = get_object_or_404(RegistrationJob, pk=job_id)
+        serializer = RegistrationJobSerializer(job)
+        return Response(serializer.data)
+
+
 class VerifyEmail(APIView):
 
     permission_classes = [AllowAny]
@@ -1661,20 +1903,21 @@ class VerifyEmail(APIView):
 
     def get(self, request, token):
         try:
-            payload = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=['HS256'])
-            user = get_object_or_404(User, id=payload['user_id'])
+            user = read_verification_token(token)
         except jwt.ExpiredSignatureError:
             return JsonResponse(
                 {'error': 'Verification link has expired'}, status=400)
         except jwt.InvalidTokenError:
             return JsonResponse(
                 {'error': 'Invalid verification link'}, status=400)
-        except User.ObjectDoesNotExist:
+        except User.DoesNotExist:
             return JsonResponse({'error': 'User not found'}, status=404)
 
+        if not user.has_usable_password():
+            # CSV registered accounts verify by choosing a password: the
+            # frontend page POSTs it back here with the same token
+            return redirect(f"{settings.FRONTEND_SET_PASSWORD_URL}?{urlencode({'token': token})}")
+
         user.is_verified = True
         user.save(update_fields=['is_verified'])
 
@@ -1695,7 +1938,43 @@ class VerifyEmail(APIView):
         # }
 
         # return JsonResponse(response_data)
-        return redirect('http://127.0.0.1:3000/')
+        return redirect(settings.FRONTEND_URL)
+
+    @swagger_auto_schema(
+        operation_summary="Set password and verify email",
+        operation_description="Sets the password of an account from its verification link and marks it verified. The link stops working once used.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['password'],
+            properties={'password': openapi.Schema(type=openapi.TYPE_STRING)}),
+        responses={200: 'Password set', 400: 'Invalid password or link', 404: 'Not Found'})
+    def post(self, request, token):
+        try:
+            user = read_verification_token(token)
+        except jwt.ExpiredSignatureError:
+            return Response({'error': 'Verification link has expired'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        except jwt.InvalidTokenError:
+            return Response({'error': 'Invalid verification link'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        except User.DoesNotExist:
+            return Response({'error': 'User not found'},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        password = request.data.get('password')
+        if not password:
+            return Response({'error': 'Password is required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            validate_password(password, user)
+        except ValidationError as e:
+            return Response({'error': e.messages},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        user.set_password(password)
+        user.is_verified = True
+        user.save(update_fields=['password', 'is_verified'])
+        return Response({'message': 'Password set and email verified'})
 
 
 class UserCardQuestionProgress(APIView):
@@ -1727,61 +2006,23 @@ class UserCardQuestionProgress(APIView):
         )
     def get(self, request, user_id, activity_id):
         try:
-            latest_user_card = UserCard.objects.filter(
-                user_id=user_id, card__activity_id=activity_id).order_by('-updated_at').first()
-            first_user_card = Card.objects.filter(activity=activity_id).order_by('created_at').first()
-            last_card_id = latest_user_card.card.id if latest_user_card else (
-                first_user_card.id if first_user_card else None)
-
-            if not last_card_id:
+            latest_user_card_id = UserCard.objects.filter(
+                user_id=user_id, card__activity_id=activity_id).order_by('-updated_at').values_list(
+                'card_id', flat=True).first()
+            # Shared, cached cards -> questions -> options structure
+            content_tree = get_content_tree(activity_id)
+
+            # Overlay this user's progress and answers onto the tree
+            response_data = card_progress_data(
+                latest_user_card_id,
+                content_tree,
+                UserCard.objects.filter(card__activity_id=activity_id, user_id=user_id),
+                Answer.objects.filter(user_id=user_id, question__card__activity_id=activity_id))
+
+            if response_data is None:
                 return Response(
                     {'error': 'No UserCard found for the user'}, status=status.HTTP_404_NOT_FOUND)
 
-            try:
-                activity = Activity.objects.get(id=activity_id)
-            except Activity.DoesNotExist:
-                return Response({'error': 'Activity not found'},
-                                status=status.HTTP_404_NOT_FOUND)
-
-            cards = Card.objects.filter(activity=activity)
-            user_cards = UserCard.objects.filter(
-                card__in=cards, user_id=user_id)
-
-            response_data = {
-                'recent_card_id': last_card_id,
-                'cards': []
-            }
-
-            for card in cards:
-                serialized_card = CardSerializer(card).data
-
-                user_card = user_cards.filter(card=card).first()
-                if user_card:
-                    serialized_user_card = UserCardSerializer(user_card).data
-                    serialized_card['user_card_progress'] = serialized_user_card
-
-                questions = Question.objects.filter(card=card)
-                serialized_questions = []
-                for question in questions:
-                    serialized_question = QuestionSerializer(question).data
-
-                    options = Option.objects.filter(question=question)
-                    serialized_options = OptionSerializer(
-                        options, many=True).data
-                    if serialized_options:
-                        serialized_question['options'] = serialized_options
-
-                    answers = Answer.objects.filter(
-                        question=question, user_id=user_id)
-                    serialized_answers = AnswerSerializer(
-                        answers, many=True).data
-                    serialized_question['answers'] = serialized_answers
-
-                    serialized_questions.append(serialized_question)
-
-                serialized_card['questions'] = serialized_questions
-                response_data['cards'].append(serialized_card)
-
             return Response(response_data, status=status.HTTP_200_OK)
 
         except Exception as e:
@@ -1823,45 +2064,88 @@ class UserActivityProgressList(APIView):
                     {'error': 'Invalid Authentication Credentials'} 
                 )
             
-            latest_user_activity = UserActivity.objects.filter(
-                user_id=user_id, activity__batch_id=batch_id).order_by('-updated_at').first()
-            first_user_activity = Activity.objects.filter(
-                batch_id=batch_id).order_by('created_at').first()
-            last_activity_id = latest_user_activity.activity.id if latest_user_activity else (
-                first_user_activity.id if first_user_activity else None)
-
-            if not last_activity_id:
+            # Activities joined with this user's UserActivity rows in two
+            # queries; the current-activity pointer comes out of the same pass
+            activities = list(Activity.objects.filter(batch_id=batch_id).prefetch_related(
+                Prefetch(
+                    'useractivity_set',
+                    queryset=UserActivity.objects.filter(user_id=user_id),
+                    to_attr='user_progress')))
+
+            response_data = activity_progress_data(activities)
+            if response_data is None:
                 return Response(
                     {'error': 'No UserActivity found for the user'}, status=status.HTTP_404_NOT_FOUND)
 
-            try:
-                batch = Batch.objects.get(id=batch_id)
-            except Batch.DoesNotExist:
-                return Response({'error': 'Batch not found'},
-                                status=status.HTTP_404_NOT_FOUND)
+            return Response(response_data, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({'error': str(e)},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            activities = Activity.objects.filter(batch=batch)
 
-            response_data = {
-                'current_activity_id': last_activity_id,
-                'activities': []
-            }
+class MetricsAPIView(APIView):
+    """
+    Prometheus text exposition of apis/metrics.py, covering every gunicorn
+    worker when PROMETHEUS_MULTIPROC_DIR is set.
+    """
 
-            user_activities = UserActivity.objects.filter(
-                user_id=user_id, activity__in=activities)
-            for activity in activities:
-                serialized_activity = ActivitySerializer(activity).data
+    # Without a METRICS_TOKEN only signed-in admins may read the metrics
+    permission_classes = [IsAuthenticatedVerifiedActive, IsAdmin]
 
-                user_activity = user_activities.filter(
-                    activity=activity).first()
-                if user_activity:
-                    serialized_user_activity = UserActivitySerializer(
-                        user_activity).data
-                    serialized_activity['user_activity_progress'] = serialized_user_activity
+    def get_authenticators(self):
+        # Scrapers send METRICS_TOKEN, not a JWT
+        if settings.METRICS_TOKEN:
+            return []
+        return super().get_authenticators()
 
-                response_data['activities'].append(serialized_activity)
+    def get_permissions(self):
+        if settings.METRICS_TOKEN:
+            return [AllowAny()]
+        return super().get_permissions()
 
-            return Response(response_data, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({'error': str(e)},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    @swagger_auto_schema(
+        operation_description=(
+            "Prometheus metrics; send 'Authorization: Bearer <METRICS_TOKEN>' when it is set, "
+            "else an admin's JWT"),
+        responses={
+            200: 'Prometheus text format',
+            401: openapi.Response(description='Unauthorized'),
+            403: openapi.Response(description='Forbidden'),
+        }
+    )
+    def get(self, request):
+        token = settings.METRICS_TOKEN
+        if token and not constant_time_compare(
+                request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return Response({'error': 'Invalid metrics token'},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        body, content_type = render_metrics()
+        return HttpResponse(body, content_type=content_type)
+
+
+class SchemaAPIView(APIView):
+    """
+    The OpenAPI document from apis/schema.py, generated once per deploy
+    rather than per request. Answers 304 when If-None-Match matches.
+    """
+
+    schema = None   # not part of the schema itself
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    # Not `format`, which DRF would take as a renderer suffix
+    def get(self, request, extension):
+        if extension not in SCHEMA_FORMATS:
+            raise Http404()
+        schema = get_schema(extension)
+        if schema is None:
+            return Response({'error': 'The API schema is not available'}, status=status.HTTP_404_NOT_FOUND)
+        body, etag = schema
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type=SCHEMA_FORMATS[extension][1])
+        response['ETag'] = etag
+        # Clients revalidate every time; an unchanged schema costs a 304
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
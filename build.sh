@@ -9,4 +9,7 @@ python3.12 manage.py makemigrations --noinput
 python3.12 manage.py migrate --noinput
 
 echo "Collecting Static..."
-python3.9 manage.py collectstatic --noinput --clear
\ No newline at end of file
+python3.9 manage.py collectstatic --noinput --clear
+
+echo "Generating the OpenAPI schema..."
+python3.12 manage.py generate_openapi_schema
\ No newline at end of file
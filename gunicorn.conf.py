@@ -0,0 +1,23 @@
+# Loaded by gunicorn from the working directory
+import os
+import shutil
+
+
+def on_starting(server):
+    # Samples of a previous run would otherwise be reported again
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+    # Write the poll votes this worker still buffers before it goes
+    from apis.polls import flush_poll_votes
+    flush_poll_votes()
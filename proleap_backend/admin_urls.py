@@ -0,0 +1,11 @@
+"""
+The admin site's URLs. proleap_backend/urls.py includes this module lazily,
+so the ModelAdmins are registered on the first request under admin/, not at
+startup.
+"""
+from django.contrib import admin
+
+# Imports each app's admin.py, unless django.contrib.admin's AppConfig already did
+admin.autodiscover()
+
+urlpatterns = admin.site.get_urls()
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'proleap_backend.settings')
+# Lets settings turn off persistent connections, see DATABASES
+os.environ['DJANGO_ASGI'] = 'true'
 
 application = get_asgi_application()
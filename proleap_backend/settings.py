@@ -13,10 +13,12 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 # NOTE: export DJANGO_SETTINGS_MODULE=proleap_backend.settings_production 
 
 from datetime import timedelta
+from importlib.util import find_spec
 import os
 from pathlib import Path
 from django.conf import settings
 import environ
+from django.core.exceptions import ImproperlyConfigured
 from django.core.management.utils import get_random_secret_key
 import dj_database_url
 
@@ -26,10 +28,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 root = environ.Path(__file__) - 3  # get root of the project
 env = environ.Env()
-environ.Env.read_env()  # reading .env file
-
-ENV_FILE = '.env'
-environ.Env.read_env(env_file=ENV_FILE)
+# Read once, from the project root; variables already set in the environment win
+environ.Env.read_env(BASE_DIR / '.env')
 
 
 SITE_ROOT = root()
@@ -55,24 +55,39 @@ TEMPLATE_DEBUG = DEBUG
 #ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', default=['proleap.in', 'ewhizard.works', '.vercal.app'])
 ALLOWED_HOSTS = ['*']#env.list('ALLOWED_HOSTS', default=[,'proleap.in', 'ewhizard.works', '.vercal.app'])
 
+# Serverless deployments (Vercel sets VERCEL) pay for every import on each
+# cold start, so there the admin and the drf_yasg docs load lazily: their URL
+# modules are imported on the first request under them, drf_yasg is not an
+# installed app, and the swagger_auto_schema decorators in apis/views.py are
+# only applied when the schema is first generated (apis/docs.py).
+# ADMIN_ENABLED / API_DOCS turn them off altogether.
+SERVERLESS = env.bool('SERVERLESS', default='VERCEL' in os.environ)
+API_DOCS = env.bool('API_DOCS', default=True)
+ADMIN_ENABLED = env.bool('ADMIN_ENABLED', default=True)
+
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'apis',
-    'drf_yasg',
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'rest_framework'
 ]
+if ADMIN_ENABLED:
+    # SimpleAdminConfig leaves the admin.py imports to proleap_backend/admin_urls.py
+    INSTALLED_APPS.insert(0, 'django.contrib.admin.apps.SimpleAdminConfig' if SERVERLESS else 'django.contrib.admin')
+if API_DOCS and not SERVERLESS:
+    INSTALLED_APPS.append('drf_yasg')
 
 MIDDLEWARE = [
+    # First, so request latency includes the rest; inert unless METRICS_ENABLED
+    'apis.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,6 +96,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    # Last, so its view timing covers only the view; inert unless REQUEST_PROFILING
+    'apis.middleware.RequestProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'proleap_backend.urls'
@@ -127,8 +144,43 @@ DATABASES = {
         'PORT': '5432',
     }
 }
-DATABASES['default'] = dj_database_url.config()
+# Set by proleap_backend/asgi.py when served by an ASGI server
+ASGI = env.bool('DJANGO_ASGI', default=False)
+
+# Persistent connections: each worker keeps its connection for
+# DB_CONN_MAX_AGE seconds (0 closes it after every request) and pings it
+# before reuse when DB_CONN_HEALTH_CHECKS is on. Always 0 under ASGI, where
+# every request runs its ORM calls in a thread of its own and persistent
+# connections would pile up instead of being reused.
+DATABASES['default'] = dj_database_url.config(
+    conn_max_age=0 if ASGI else env.int('DB_CONN_MAX_AGE', default=600),
+    conn_health_checks=env.bool('DB_CONN_HEALTH_CHECKS', default=True),
+)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# e.g. CACHE_URL=filecache:///var/tmp/proleap_cache to share across workers
+
+CACHES = {
+    'default': env.cache_url('CACHE_URL', default='locmemcache://'),
+}
 
+# Cached activity content trees are keyed by a version kept in the database
+# (ContentVersion) and bumped by signals, so even per-process caches never
+# serve a stale tree; the timeout only bounds how long unused trees linger
+CONTENT_TREE_CACHE_TIMEOUT = env.int('CONTENT_TREE_CACHE_TIMEOUT', default=3600)
+
+# Seconds an authenticated User stays cached between requests (0 disables).
+# Only with a cache every process shares: with a per-process one a user
+# deactivated on one worker or instance would stay signed in on the others
+_PROCESS_LOCAL_CACHE = CACHES['default']['BACKEND'] in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+) or (SERVERLESS and CACHES['default']['BACKEND'] == 'django.core.cache.backends.filebased.FileBasedCache')
+AUTH_USER_CACHE_TIMEOUT = env.int('AUTH_USER_CACHE_TIMEOUT', default=0 if _PROCESS_LOCAL_CACHE else 60)
+if AUTH_USER_CACHE_TIMEOUT and _PROCESS_LOCAL_CACHE:
+    raise ImproperlyConfigured('AUTH_USER_CACHE_TIMEOUT needs a shared cache; set CACHE_URL')
 
 
 # Password validation
@@ -168,6 +220,24 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / "staticfiles_build" / "static"
 
+if API_DOCS and SERVERLESS:
+    # drf_yasg's templates and static files, found without importing it
+    _DRF_YASG_DIR = Path(find_spec('drf_yasg').submodule_search_locations[0])
+    TEMPLATES[0]['DIRS'].append(_DRF_YASG_DIR / 'templates')
+    STATICFILES_DIRS = [_DRF_YASG_DIR / 'static']
+
+# `manage.py generate_openapi_schema` (build.sh) writes the OpenAPI document
+# here; without it apis/schema.py generates it once per process
+OPENAPI_SCHEMA_DIR = env('OPENAPI_SCHEMA_DIR', default=str(BASE_DIR / 'staticfiles_build' / 'openapi'))
+
+# The docs pages load the precomputed document instead of regenerating it
+SWAGGER_SETTINGS = {
+    'SPEC_URL': ('schema-json', {'extension': '.json'}),
+}
+REDOC_SETTINGS = {
+    'SPEC_URL': ('schema-json', {'extension': '.json'}),
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -179,11 +249,14 @@ AUTH_USER_MODEL = 'apis.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apis.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Keyset pagination used by every list endpoint (see apis.listing)
+    'DEFAULT_PAGINATION_CLASS': 'apis.pagination.CreatedAtCursorPagination',
+    'PAGE_SIZE': 100,
 }
 
 
@@ -220,7 +293,7 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
 
     "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "apis.serializers.CachedTokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
@@ -228,7 +301,53 @@ SIMPLE_JWT = {
 }
 
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Serve the progress endpoints from apis/async_views.py. Meant for ASGI:
+# gunicorn proleap_backend.asgi:application -k uvicorn.workers.UvicornWorker
+# Under ASGI DB_CONN_MAX_AGE is ignored (connections close after every
+# request, see DATABASES), and streaming responses must be fed by async
+# iterators, which Django would otherwise buffer in full: the answer export
+# switches to one when ASGI is set.
+ASYNC_PROGRESS_VIEWS = env.bool('ASYNC_PROGRESS_VIEWS', default=False)
+
+# 'inline' rolls progress up when the answer's transaction commits,
+# 'deferred' queues it for `python manage.py drain_progress`, which then has
+# to run as a worker process (add `worker: python manage.py drain_progress`
+# to the Procfile)
+PROGRESS_ROLLUP_MODE = env('PROGRESS_ROLLUP_MODE', default='inline')
+
+# Prometheus metrics at apis/metrics/ (apis/metrics.py). Set
+# PROMETHEUS_MULTIPROC_DIR in the environment to aggregate gunicorn workers,
+# and METRICS_TOKEN to let scrapers in with 'Authorization: Bearer <token>';
+# without a token only admins, signed in with a JWT, can read them.
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=True)
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+
+# Per-request query count and DB/view/serializer time in Server-Timing
+# headers and 'apis.requests' log lines (apis/middleware.py). Requests slower
+# than REQUEST_PROFILING_SLOW_MS have their SQL and an EXPLAIN of the slowest
+# query written to REQUEST_PROFILING_SPOOL_DIR.
+REQUEST_PROFILING = env.bool('REQUEST_PROFILING', default=False)
+REQUEST_PROFILING_SLOW_MS = env.float('REQUEST_PROFILING_SLOW_MS', default=500)
+REQUEST_PROFILING_SPOOL_DIR = env('REQUEST_PROFILING_SPOOL_DIR', default=str(BASE_DIR / 'tmp' / 'slow_requests'))
+
+# Poll votes are buffered per process and written to PollTally every
+# POLL_TALLY_FLUSH_INTERVAL seconds, one F() increment per option (0 = on
+# every answer's commit). Votes still buffered when a process is killed are
+# lost until rebuild_poll_tallies runs; gunicorn workers flush on a graceful
+# exit. A serverless instance can be frozen at any time, so it never buffers.
+# The presenter stream re-reads the tallies every POLL_STREAM_INTERVAL
+# seconds; under ASGI it stays open until the poll ends or for
+# POLL_STREAM_MAX_SECONDS, under WSGI the browser reconnects that often.
+POLL_TALLY_FLUSH_INTERVAL = 0 if SERVERLESS else env.float('POLL_TALLY_FLUSH_INTERVAL', default=1.0)
+POLL_STREAM_INTERVAL = env.float('POLL_STREAM_INTERVAL', default=1.0)
+POLL_STREAM_MAX_SECONDS = env.int('POLL_STREAM_MAX_SECONDS', default=900)
+
+
+# e.g. django.core.mail.backends.console.EmailBackend or
+# django.core.mail.backends.filebased.EmailBackend (with EMAIL_FILE_PATH) locally
+EMAIL_BACKEND = env('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = env('EMAIL_FILE_PATH', default=str(BASE_DIR / 'tmp' / 'emails'))
+EMAIL_TIMEOUT = env.int('EMAIL_TIMEOUT', default=30)
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -237,6 +356,27 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 PASSWORD_RESET_TIMEOUT = 172800     # 2 days
 
+# Bulk mail dispatch (apis/mail.py): messages per progress batch, sends per
+# second (0 = unlimited) and reconnect attempts with exponential backoff
+EMAIL_BATCH_SIZE = env.int('EMAIL_BATCH_SIZE', default=50)
+EMAIL_RATE_LIMIT = env.float('EMAIL_RATE_LIMIT', default=0)
+EMAIL_MAX_RETRIES = env.int('EMAIL_MAX_RETRIES', default=3)
+EMAIL_RETRY_BACKOFF = env.float('EMAIL_RETRY_BACKOFF', default=1.0)
+
+# Where verification links land: verified accounts go to FRONTEND_URL, CSV
+# registered ones to FRONTEND_SET_PASSWORD_URL?token=<token>, whose page
+# POSTs the chosen password to apis/verify/<token>/
+FRONTEND_URL = env('FRONTEND_URL', default='http://127.0.0.1:3000/')
+FRONTEND_SET_PASSWORD_URL = env('FRONTEND_SET_PASSWORD_URL', default=FRONTEND_URL + 'set-password/')
+
+# CSV registration emails are queued in the database (PendingVerificationEmail)
+# and sent by `python manage.py drain_registration_emails` (the Procfile's
+# mailer), which also resumes jobs left SENDING for
+# REGISTRATION_JOB_STALE_SECONDS by a killed sender. 'inline' is for
+# development without a mailer: the upload request sends them itself.
+REGISTRATION_EMAIL_MODE = env('REGISTRATION_EMAIL_MODE', default='deferred')
+REGISTRATION_JOB_STALE_SECONDS = env.int('REGISTRATION_JOB_STALE_SECONDS', default=600)
+
 
 CORS_ALLOW_ALL_ORIGINS = True
 
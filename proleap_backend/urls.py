@@ -14,10 +14,14 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.conf import settings
 from django.urls import include, path
 
+from apis.lazy_urls import lazy_include
+
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path("apis/", include("apis.urls")),
 ]
+
+if settings.ADMIN_ENABLED:
+    urlpatterns.append(lazy_include('admin/', 'proleap_backend.admin_urls', namespace='admin'))